@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic media fixtures for the native reader tests
+
+Builders for the few structures the readers look at (parameter sets, boxes, EBML
+elements, TS packets, KLV packets), with the field values ffprobe would report
+for them kept in the tests.
+"""
+import os
+import struct
+import tempfile
+import unittest
+
+
+class BitWriter:
+    """Big-endian bit writer with Exp-Golomb codes"""
+
+    def __init__(self):
+        self.bits = []
+
+    def u(self, count, value):
+        self.bits.extend((value >> shift) & 1 for shift in range(count - 1, -1, -1))
+
+    def ue(self, value):
+        code = value + 1
+        self.u(code.bit_length() - 1, 0)
+        self.u(code.bit_length(), code)
+
+    def se(self, value):
+        self.ue(2 * value - 1 if value > 0 else -2 * value)
+
+    def rbsp(self):
+        """Bytes with the rbsp trailing bits"""
+        bits = self.bits + [1]
+        bits += [0] * (-len(bits) % 8)
+        return bytes(int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8))
+
+
+def escape_rbsp(data):
+    """Insert the emulation prevention bytes of a NAL unit payload"""
+    out = bytearray()
+    zeros = 0
+    for byte in data:
+        if zeros >= 2 and byte <= 3:
+            out.append(3)
+            zeros = 0
+        out.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+    return bytes(out)
+
+
+def write_vui_signal(writer, colors, full_range):
+    if colors is None and full_range is None:
+        writer.u(1, 0)  # video_signal_type_present_flag
+        return
+    writer.u(1, 1)
+    writer.u(3, 5)  # video_format
+    writer.u(1, bool(full_range))
+    writer.u(1, colors is not None)
+    if colors is not None:
+        for code in colors:
+            writer.u(8, code)
+
+
+def h264_sps(width, height, profile=100, chroma_format=1, bit_depth=8, interlaced=False, colors=None,
+             full_range=None, timing=None):
+    """
+    H.264 SPS NAL unit (header included).
+    colors: (primaries, transfer, matrix) codes of the VUI; timing: (num_units_in_tick, time_scale)
+    """
+    w = BitWriter()
+    w.u(8, profile)
+    w.u(8, 0)  # constraint flags
+    w.u(8, 40)  # level_idc
+    w.ue(0)  # seq_parameter_set_id
+    if profile in (100, 110, 122, 244):
+        w.ue(chroma_format)
+        if chroma_format == 3:
+            w.u(1, 0)  # separate_colour_plane_flag
+        w.ue(bit_depth - 8)
+        w.ue(bit_depth - 8)
+        w.u(1, 0)  # qpprime_y_zero_transform_bypass_flag
+        w.u(1, 0)  # seq_scaling_matrix_present_flag
+    w.ue(0)  # log2_max_frame_num_minus4
+    w.ue(0)  # pic_order_cnt_type
+    w.ue(0)  # log2_max_pic_order_cnt_lsb_minus4
+    w.ue(1)  # max_num_ref_frames
+    w.u(1, 0)  # gaps_in_frame_num_value_allowed_flag
+    frame_mbs_only = 0 if interlaced else 1
+    map_unit_height = 16 * (2 - frame_mbs_only)
+    width_in_mbs = -(-width // 16)
+    height_in_map_units = -(-height // map_unit_height)
+    w.ue(width_in_mbs - 1)
+    w.ue(height_in_map_units - 1)
+    w.u(1, frame_mbs_only)
+    if not frame_mbs_only:
+        w.u(1, 0)  # mb_adaptive_frame_field_flag
+    w.u(1, 1)  # direct_8x8_inference_flag
+    crop_x = 2 if chroma_format in (1, 2) else 1
+    crop_y = (2 if chroma_format == 1 else 1) * (2 - frame_mbs_only)
+    crop_right = (width_in_mbs * 16 - width) // crop_x
+    crop_bottom = (height_in_map_units * map_unit_height - height) // crop_y
+    w.u(1, bool(crop_right or crop_bottom))
+    if crop_right or crop_bottom:
+        for value in (0, crop_right, 0, crop_bottom):
+            w.ue(value)
+    has_vui = colors is not None or full_range is not None or timing is not None
+    w.u(1, has_vui)
+    if has_vui:
+        w.u(1, 0)  # aspect_ratio_info_present_flag
+        w.u(1, 0)  # overscan_info_present_flag
+        write_vui_signal(w, colors, full_range)
+        w.u(1, 0)  # chroma_loc_info_present_flag
+        w.u(1, timing is not None)
+        if timing is not None:
+            w.u(32, timing[0])
+            w.u(32, timing[1])
+            w.u(1, 1)  # fixed_frame_rate_flag
+        w.u(1, 0)  # nal_hrd_parameters_present_flag
+        w.u(1, 0)  # vcl_hrd_parameters_present_flag
+        w.u(1, 0)  # pic_struct_present_flag
+        w.u(1, 0)  # bitstream_restriction_flag
+    return b'\x67' + escape_rbsp(w.rbsp())
+
+
+def hevc_sps(width, height, chroma_format=1, bit_depth=10, colors=None, full_range=None, timing=None):
+    """HEVC SPS NAL unit (header included), same arguments as h264_sps"""
+    w = BitWriter()
+    w.u(4, 0)  # sps_video_parameter_set_id
+    w.u(3, 0)  # sps_max_sub_layers_minus1
+    w.u(1, 1)  # sps_temporal_id_nesting_flag
+    w.u(8, 2)  # general profile space, tier, profile_idc (Main 10)
+    w.u(32, 0x20000000)  # general_profile_compatibility_flags
+    w.u(48, 0)  # constraint flags
+    w.u(8, 153)  # general_level_idc
+    w.ue(0)  # sps_seq_parameter_set_id
+    w.ue(chroma_format)
+    if chroma_format == 3:
+        w.u(1, 0)  # separate_colour_plane_flag
+    coded_width = -(-width // 8) * 8
+    coded_height = -(-height // 8) * 8
+    w.ue(coded_width)
+    w.ue(coded_height)
+    sub_width = 2 if chroma_format in (1, 2) else 1
+    sub_height = 2 if chroma_format == 1 else 1
+    crop_right = (coded_width - width) // sub_width
+    crop_bottom = (coded_height - height) // sub_height
+    w.u(1, bool(crop_right or crop_bottom))
+    if crop_right or crop_bottom:
+        for value in (0, crop_right, 0, crop_bottom):
+            w.ue(value)
+    w.ue(bit_depth - 8)
+    w.ue(bit_depth - 8)
+    w.ue(4)  # log2_max_pic_order_cnt_lsb_minus4
+    w.u(1, 1)  # sps_sub_layer_ordering_info_present_flag
+    for value in (4, 2, 0):
+        w.ue(value)
+    for value in (0, 3, 0, 3, 0, 0):
+        w.ue(value)  # block sizes, transform hierarchy depths
+    w.u(1, 0)  # scaling_list_enabled_flag
+    w.u(1, 0)  # amp_enabled_flag
+    w.u(1, 1)  # sample_adaptive_offset_enabled_flag
+    w.u(1, 0)  # pcm_enabled_flag
+    w.ue(1)  # num_short_term_ref_pic_sets
+    w.ue(1)  # num_negative_pics
+    w.ue(0)  # num_positive_pics
+    w.ue(0)  # delta_poc_s0_minus1
+    w.u(1, 1)  # used_by_curr_pic_s0_flag
+    w.u(1, 0)  # long_term_ref_pics_present_flag
+    w.u(1, 1)  # sps_temporal_mvp_enabled_flag
+    w.u(1, 1)  # strong_intra_smoothing_enabled_flag
+    has_vui = colors is not None or full_range is not None or timing is not None
+    w.u(1, has_vui)
+    if has_vui:
+        w.u(1, 0)  # aspect_ratio_info_present_flag
+        w.u(1, 0)  # overscan_info_present_flag
+        write_vui_signal(w, colors, full_range)
+        w.u(1, 0)  # chroma_loc_info_present_flag
+        w.u(1, 0)  # neutral_chroma_indication_flag
+        w.u(1, 0)  # field_seq_flag
+        w.u(1, 0)  # frame_field_info_present_flag
+        w.u(1, 0)  # default_display_window_flag
+        w.u(1, timing is not None)
+        if timing is not None:
+            w.u(32, timing[0])
+            w.u(32, timing[1])
+            w.u(1, 0)  # vui_poc_proportional_to_timing_flag
+            w.u(1, 0)  # vui_hrd_parameters_present_flag
+        w.u(1, 0)  # bitstream_restriction_flag
+    w.u(1, 0)  # sps_extension_present_flag
+    return b'\x42\x01' + escape_rbsp(w.rbsp())
+
+
+H264_PPS = b'\x68\xee\x3c\x80'
+HEVC_PPS = b'\x44\x01\xc1\x72\xb4\x62\x40'
+
+
+def h264_slice(size=16):
+    """IDR slice NAL unit with first_mb_in_slice 0, padded to size bytes"""
+    return b'\x65\x88' + b'\xaa' * (size - 2)
+
+
+def hevc_slice(size=16):
+    """Slice NAL unit (TRAIL_R) with first_slice_segment_in_pic_flag set"""
+    return b'\x02\x01\xd0' + b'\xaa' * (size - 3)
+
+
+def annex_b(*nal_units):
+    """Byte stream of NAL units with 4 byte start codes"""
+    return b''.join(b'\x00\x00\x00\x01' + nal for nal in nal_units)
+
+
+def avcc(sps, pps=H264_PPS):
+    """AVCDecoderConfigurationRecord holding one SPS (none for an empty sps) and one PPS"""
+    record = bytes([1, 100, 0, 40, 0xff, 0xe0 | (1 if sps else 0)])
+    if sps:
+        record += struct.pack('>H', len(sps)) + sps
+    return record + b'\x01' + struct.pack('>H', len(pps)) + pps
+
+
+def hvcc(sps, pps=HEVC_PPS):
+    """HEVCDecoderConfigurationRecord holding one SPS and one PPS"""
+    record = bytes([1, 2]) + bytes(19) + b'\x0f' + b'\x02'
+    for nal in (sps, pps):
+        nal_type = (nal[0] >> 1) & 0x3f
+        record += bytes([0x80 | nal_type]) + struct.pack('>HH', 1, len(nal)) + nal
+    return record
+
+
+def dovi_record(profile, level, rpu=1, el=0, bl=1, compatibility_id=0, version=(1, 0)):
+    """DOVIDecoderConfigurationRecord (dvcC/dvvC payload)"""
+    flags = profile << 9 | level << 3 | rpu << 2 | el << 1 | bl
+    return struct.pack('>BBHB', version[0], version[1], flags, compatibility_id << 4) + bytes(19)
+
+
+def dovi_side_data(profile, level, rpu=1, el=0, bl=1, compatibility_id=0, version=(1, 0)):
+    """DOVI side data entry ffprobe prints for a configuration record"""
+    return {
+        'side_data_type': 'DOVI configuration record',
+        'dv_version_major': version[0],
+        'dv_version_minor': version[1],
+        'dv_profile': profile,
+        'dv_level': level,
+        'rpu_present_flag': rpu,
+        'el_present_flag': el,
+        'bl_present_flag': bl,
+        'dv_bl_signal_compatibility_id': compatibility_id,
+        'dv_md_compression': 0,
+    }
+
+
+# ISO-BMFF
+
+def box(box_type, *payload):
+    data = b''.join(payload)
+    return struct.pack('>I4s', 8 + len(data), box_type.encode('latin-1')) + data
+
+
+def full_box(box_type, *payload, version=0):
+    return box(box_type, struct.pack('>I', version << 24), *payload)
+
+
+def visual_sample_entry(tag, width, height, *children):
+    fields = bytes(6) + struct.pack('>H', 1) + bytes(16) + struct.pack('>HH', width, height)
+    fields += struct.pack('>IIIH', 0x00480000, 0x00480000, 0, 1) + bytes(32) + struct.pack('>Hh', 24, -1)
+    return box(tag, fields, *children)
+
+
+def colr_nclx(primaries, transfer, matrix, full_range=False):
+    return box('colr', b'nclx', struct.pack('>HHHB', primaries, transfer, matrix, 0x80 if full_range else 0))
+
+
+def mp4_file(sample_entry, timescale, stts, handler='vide', mdat=b''):
+    """
+    ftyp, moov with a single track and mdat; stts: [(sample_count, sample_delta)].
+    The stco chunk offset points to the start of the mdat payload.
+    """
+    def build(chunk_offset):
+        stbl = box('stbl',
+                   full_box('stsd', struct.pack('>I', 1), sample_entry),
+                   full_box('stts', struct.pack('>I', len(stts)),
+                            *(struct.pack('>II', count, delta) for count, delta in stts)),
+                   full_box('stco', struct.pack('>II', 1, chunk_offset)))
+        mdia = box('mdia',
+                   full_box('mdhd', struct.pack('>IIIIHH', 0, 0, timescale, 0, 0x55c4, 0)),
+                   full_box('hdlr', struct.pack('>I4s', 0, handler.encode()), bytes(12), b'\0'),
+                   box('minf', stbl))
+        return box('ftyp', b'isom', struct.pack('>I', 512), b'isomiso2') + box('moov', box('trak', mdia))
+    head = build(0)
+    return build(len(head) + 8) + box('mdat', mdat)
+
+
+def prores_frame(chroma_444, primaries, transfer, matrix, alpha=False):
+    """Start of a ProRes frame: frame size, 'icpf' and the frame header"""
+    header = struct.pack('>HH4sHH', 148, 0, b'apl0', 1920, 1080)
+    header += bytes([0xc0 if chroma_444 else 0x80, 0, primaries, transfer, matrix, 2 if alpha else 0])
+    return struct.pack('>I', 1000) + b'icpf' + header + bytes(64)
+
+
+# Matroska
+
+def ebml_size(size):
+    for length in range(1, 8):
+        if size < (1 << (7 * length)) - 1:
+            return ((1 << (7 * length)) | size).to_bytes(length, 'big')
+    raise ValueError(size)
+
+
+def ebml(element_id, *payload):
+    data = b''.join(payload)
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + ebml_size(len(data)) + data
+
+
+def ebml_uint(element_id, value):
+    return ebml(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+# TS
+
+def ts_timestamp(prefix, timestamp):
+    return bytes([
+        prefix << 4 | ((timestamp >> 29) & 0x0e) | 1,
+        (timestamp >> 22) & 0xff,
+        ((timestamp >> 14) & 0xfe) | 1,
+        (timestamp >> 7) & 0xff,
+        ((timestamp << 1) & 0xfe) | 1,
+    ])
+
+
+def pes_packet(es_data, pts, dts):
+    header = b'\x00\x00\x01\xe0\x00\x00\x80\xc0\x0a' + ts_timestamp(3, pts) + ts_timestamp(1, dts)
+    return header + es_data
+
+
+def ts_packets(pid, payload, packet_size=188):
+    """TS packets carrying payload, the first with payload_unit_start, the last padded with stuffing"""
+    packets = []
+    counter = 0
+    while True:
+        chunk, payload = payload[:184], payload[184:]
+        header = struct.pack('>BH', 0x47, (0x4000 if not packets else 0) | pid)
+        if len(chunk) < 184:
+            stuffing = 184 - len(chunk) - 1
+            adaptation = bytes([stuffing]) + (b'\x00' + b'\xff' * (stuffing - 1) if stuffing else b'')
+            packet = header + bytes([0x30 | counter]) + adaptation + chunk
+        else:
+            packet = header + bytes([0x10 | counter]) + chunk
+        prefix = bytes(packet_size - 188)
+        packets.append(prefix + packet)
+        counter = (counter + 1) & 0x0f
+        if not payload:
+            return b''.join(packets)
+
+
+def psi_section(table_id, table_id_extension, body):
+    section_length = 5 + len(body) + 4
+    return (bytes([table_id, 0xb0 | section_length >> 8, section_length & 0xff])
+            + struct.pack('>HBBB', table_id_extension, 0xc1, 0, 0) + body + bytes(4))
+
+
+def pat_section(pmt_pid, program_number=1):
+    return psi_section(0x00, 1, struct.pack('>HH', program_number, 0xe000 | pmt_pid))
+
+
+def pmt_section(streams, pcr_pid=0x100):
+    """streams: [(stream_type, pid, descriptors bytes)]"""
+    body = struct.pack('>HH', 0xe000 | pcr_pid, 0xf000)
+    for stream_type, pid, descriptors in streams:
+        body += struct.pack('>BHH', stream_type, 0xe000 | pid, 0xf000 | len(descriptors)) + descriptors
+    return psi_section(0x02, 1, body)
+
+
+# MXF
+
+def ber(length):
+    return bytes([length]) if length < 0x80 else b'\x83' + length.to_bytes(3, 'big')
+
+
+def klv(key, value):
+    return key + ber(len(value)) + value
+
+
+def local_item(tag, value):
+    return struct.pack('>HH', tag, len(value)) + value
+
+
+class TempFileTestCase(unittest.TestCase):
+    """Test case writing fixtures to a temporary directory"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
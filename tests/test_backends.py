@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import mock
+
+from tests.fixtures import TempFileTestCase
+from videometareport import backends
+
+
+class BackendRouterTest(TempFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        self.router = backends.BackendRouter([
+            backends.ProbeBackend('native', self.backend('native', None), backends.NATIVE_COST,
+                                  extensions=['.mp4'], magic=[(4, b'ftyp')]),
+            backends.ProbeBackend('tool', self.backend('tool', 'tool record'), backends.SUBPROCESS_COST),
+        ])
+        patcher = mock.patch.object(backends, 'read_header', wraps=backends.read_header)
+        self.read_header = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def backend(self, name, record):
+        def probe(request):
+            self.calls.append((name, request.header))
+            return record
+        return probe
+
+    def test_known_extension_reads_no_header(self):
+        path = self.write_file('clip.mp4', b'\x00\x00\x00\x18ftypisom')
+        self.assertEqual(self.router.probe(backends.ProbeRequest(path)), 'tool record')
+        self.read_header.assert_not_called()
+        self.assertEqual(self.calls, [('native', None), ('tool', None)])
+
+    def test_header_read_once_and_passed_on(self):
+        path = self.write_file('clip.bin', b'\x00\x00\x00\x18ftypisom' + bytes(100))
+        request = backends.ProbeRequest(path)
+        self.router.probe(request)
+        self.router.probe(request)
+        self.read_header.assert_called_once_with(path)
+        header = b'\x00\x00\x00\x18ftypisom' + bytes(4)
+        self.assertEqual(self.calls, [('native', header), ('tool', header)] * 2)
+
+    def test_no_magic_match(self):
+        path = self.write_file('clip.avi', b'RIFF' + bytes(100))
+        self.assertEqual(self.router.probe(backends.ProbeRequest(path)), 'tool record')
+        self.assertEqual([name for name, _ in self.calls], ['tool'])
+
+    def test_no_header_read_without_magic_backend(self):
+        path = self.write_file('clip.avi', b'RIFF' + bytes(100))
+        self.router.probe(backends.ProbeRequest(path), exclude=['native'])
+        self.read_header.assert_not_called()
+
+    def test_unreadable_file(self):
+        request = backends.ProbeRequest(self.temp_dir.name + '/missing.bin')
+        self.assertEqual(self.router.route(request)[0].name, 'tool')
+        self.assertEqual(request.header, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
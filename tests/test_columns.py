@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import random
+import time
+import unittest
+from unittest import mock
+
+from videometareport import columns
+from videometareport.analysis import compute_statistics
+from videometareport.records import DOLBY_VISION, RAW_VIDEO, VideoResult
+
+SIZES = [(1280, 720), (1919, 1080), (1920, 1079), (1920, 1080), (1080, 1920), (3839, 2160), (3840, 2160),
+         (2160, 3840), (4096, 2160), (8192, 4320), (0, 0)]
+FRAMERATES = [0, 23.976, 25, 27.99, 28, 28.5, 29, 29.97, 30, 31, 31.5, 50, 55, 59.94, 60, 65, 65.1, 120]
+TRANSFERS = [None, 'bt709', 'smpte2084', 'arib-std-b67', 'bt2020-10', 'smpte170m', 'linear']
+PRIMARIES = [None, 'bt709', 'bt2020', 'smpte170m', 'smpte432']
+PIX_FMTS = [None, 'yuv420p', 'yuv420p10le', 'yuv422p10le', 'yuv444p12le', 'gbrp']
+
+
+def random_results(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        VideoResult(f'/videos/clip{index}.mov', *rng.choice(SIZES), rng.choice(FRAMERATES), None,
+                    rng.choice(TRANSFERS), rng.choice(PRIMARIES), None, rng.choice(PIX_FMTS),
+                    rng.choice([0, DOLBY_VISION, RAW_VIDEO]))
+        for index in range(count)
+    ]
+
+
+def count_statistics_scalar(results):
+    """The per-result counters the column code replaced"""
+    statistics = dict.fromkeys(columns.STATISTICS_COUNTERS, 0)
+    for result in results:
+        if result['resolutionLabel'] == 'low':
+            statistics['lowResolutionCount'] += 1
+        elif result['resolutionLabel'] == 'excellent':
+            statistics['excellentResolutionCount'] += 1
+        else:
+            statistics['goodResolutionCount'] += 1
+
+        if result['framerateCategory'] == 'Low':
+            statistics['lowFramerateCount'] += 1
+        elif result['framerateCategory'] == 'High':
+            statistics['highFramerateCount'] += 1
+        elif result['framerateCategory'] == 'Normal':
+            statistics['normalFramerateCount'] += 1
+
+        if result['colorCategory'] == 'HDR':
+            statistics['hdrCount'] += 1
+        elif result['colorCategory'] not in ['SDR']:
+            statistics['otherColorSpaceCount'] += 1
+    return statistics
+
+
+class CountStatisticsTest(unittest.TestCase):
+
+    def check_matches_scalar(self):
+        for results in ([], random_results(1), random_results(2000)):
+            with self.subTest(count=len(results)):
+                statistics = columns.ResultColumns(results).count_statistics()
+                self.assertEqual(statistics, count_statistics_scalar(results))
+
+    def test_without_numpy(self):
+        with mock.patch.object(columns, 'numpy', None):
+            self.check_matches_scalar()
+
+    def test_with_numpy(self):
+        if columns.numpy is None:
+            self.skipTest("NumPy is not installed")
+        self.check_matches_scalar()
+
+    def test_empty_slots_skipped(self):
+        results = random_results(10)
+        self.assertEqual(len(columns.ResultColumns([None] + results + [None])), 10)
+
+    def test_other_thresholds(self):
+        # 2.7K counting as 4K, 24-26 fps as normal, 48-52 fps as high
+        thresholds = columns.Thresholds((1280, 720), (2704, 1520), 24, (48, 52), (24, 26))
+        results = [
+            VideoResult('/videos/a.mp4', 2704, 1520, 25, None),
+            VideoResult('/videos/b.mp4', 1920, 1080, 50, None),
+            VideoResult('/videos/c.mp4', 1280, 720, 23.976, None),
+            VideoResult('/videos/d.mp4', 640, 480, 30, None),
+        ]
+        expected = {
+            'lowResolutionCount': 1, 'goodResolutionCount': 2, 'excellentResolutionCount': 1,
+            'lowFramerateCount': 1, 'normalFramerateCount': 1, 'highFramerateCount': 1,
+            'hdrCount': 0, 'otherColorSpaceCount': 0,
+        }
+        store = columns.ResultColumns(results)
+        self.assertEqual(store.count_statistics_loop(thresholds), expected)
+        if columns.numpy is not None:
+            self.assertEqual(store.count_statistics(thresholds), expected)
+        self.assertEqual(store.count_statistics(), count_statistics_scalar(results))
+
+    def test_loop_faster_than_scalar_counters(self):
+        results = random_results(20000)
+        store = columns.ResultColumns(results)
+        started = time.perf_counter()
+        count_statistics_scalar(results)
+        scalar_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        store.count_statistics_loop()
+        self.assertLess(time.perf_counter() - started, scalar_seconds)
+
+
+class ResultRowsTest(unittest.TestCase):
+
+    def test_rows_by_key(self):
+        results = random_results(50)
+        store = columns.ResultColumns()
+        for result in results:
+            store.append(result, result.full_path)
+        # Replace, remove (the last row moving into its place) and rename rows
+        replaced = random_results(10, seed=2)
+        for result, replacement in zip(results[:10], replaced):
+            store.set(result.full_path, replacement)
+        for result in results[10:20] + results[-3:]:
+            store.set(result.full_path, None)
+        store.rename(results[20].full_path, '/videos/renamed.mov')
+        store.set('/videos/missing.mov', None)
+        expected = replaced + results[20:-3]
+        self.assertEqual(len(store), len(expected))
+        self.assertEqual(store.count_statistics(), count_statistics_scalar(expected))
+        self.assertEqual(store.count_statistics(), columns.ResultColumns(expected).count_statistics())
+        keys = [result.full_path for result in results[:10] + results[21:-3]] + ['/videos/renamed.mov']
+        self.assertEqual(sorted(store.rows), sorted(keys))
+        for key, row in store.rows.items():
+            self.assertEqual(store.keys[row], key)
+
+    def test_value_columns(self):
+        store = columns.ResultColumns([
+            VideoResult('/videos/a.mp4', 3840, 2160, 25, '800', 'smpte2084', 'bt2020', flags=DOLBY_VISION),
+            VideoResult('/videos/b.mp4', 1920, 1080, 25, 'Auto', 'bt709', 'bt709'),
+            VideoResult('/videos/c.mp4', 1920, 1080, 25, 3200, 'bt709'),
+        ])
+        self.assertEqual(store.count_values('color_transfer'), {'smpte2084': 1, 'bt709': 2})
+        self.assertEqual(store.count_values('color_primaries'), {'bt2020': 1, 'bt709': 1, None: 1})
+        self.assertEqual(list(store.iso), [800, 0, 3200])
+        self.assertEqual(list(store.flags), [DOLBY_VISION, 0, 0])
+
+
+class StatisticsTest(unittest.TestCase):
+
+    def test_empty(self):
+        statistics = compute_statistics([], 3)
+        self.assertEqual(statistics['totalFiles'], 3)
+        # Files that failed to analyze count as SDR
+        self.assertEqual(statistics['sdrCount'], 3)
+        self.assertEqual(columns.compute_percentages(compute_statistics([], 0))['sdrCount'], 0)
+
+    def test_from_session_columns(self):
+        results = random_results(300)
+        store = columns.ResultColumns(results)
+        self.assertEqual(compute_statistics(results, 320, store), compute_statistics(results, 320))
+        thresholds = columns.DEFAULT_THRESHOLDS._replace(framerate_low_below=24)
+        statistics = compute_statistics(results, 320, store, thresholds)
+        self.assertEqual(statistics['lowFramerateCount'],
+                         sum(1 for result in results if 0 < result.framerate < 24))
+
+
+if __name__ == '__main__':
+    unittest.main()
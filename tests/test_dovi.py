@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import struct
+import unittest
+
+from tests.fixtures import (
+    TempFileTestCase, box, dovi_record, dovi_side_data, hevc_sps, hvcc, mp4_file, visual_sample_entry,
+)
+from videometareport.native import dovi, isobmff
+
+
+class ParseConfigRecordTest(unittest.TestCase):
+
+    def test_profile_8(self):
+        record = dovi_record(8, 6, compatibility_id=1)
+        self.assertEqual(dovi.parse_dovi_config_record(record), dovi_side_data(8, 6, compatibility_id=1))
+
+    def test_all_fields(self):
+        # version 2.1, profile 7, level 13, rpu + el + bl, compatibility 6, md_compression 2
+        record = struct.pack('>BBHB', 2, 1, 7 << 9 | 13 << 3 | 0x07, 6 << 4 | 2 << 2)
+        self.assertEqual(dovi.parse_dovi_config_record(record), {
+            'side_data_type': 'DOVI configuration record',
+            'dv_version_major': 2,
+            'dv_version_minor': 1,
+            'dv_profile': 7,
+            'dv_level': 13,
+            'rpu_present_flag': 1,
+            'el_present_flag': 1,
+            'bl_present_flag': 1,
+            'dv_bl_signal_compatibility_id': 6,
+            'dv_md_compression': 2,
+        })
+
+    def test_without_compatibility_byte(self):
+        self.assertEqual(dovi.parse_dovi_config_record(dovi_record(5, 9)[:4]), dovi_side_data(5, 9))
+
+    def test_too_short(self):
+        self.assertIsNone(dovi.parse_dovi_config_record(dovi_record(5, 9)[:3]))
+
+
+class ParseDescriptorTest(unittest.TestCase):
+
+    def test_with_base_layer(self):
+        payload = dovi_record(8, 6, compatibility_id=4)[:5]
+        self.assertEqual(dovi.parse_dovi_descriptor(payload), dovi_side_data(8, 6, compatibility_id=4))
+
+    def test_without_base_layer_skips_dependency_pid(self):
+        record = dovi_record(7, 6, el=1, bl=0, compatibility_id=6)
+        payload = record[:4] + struct.pack('>H', 0x1011 << 3) + record[4:5]
+        self.assertEqual(dovi.parse_dovi_descriptor(payload), dovi_side_data(7, 6, el=1, bl=0, compatibility_id=6))
+
+    def test_too_short(self):
+        self.assertIsNone(dovi.parse_dovi_descriptor(b'\x01\x00\x10'))
+
+
+class ContainerTest(TempFileTestCase):
+
+    def test_truncated_dvcc_falls_back(self):
+        entry = visual_sample_entry('dvh1', 1920, 1080, box('hvcC', hvcc(hevc_sps(1920, 1080))),
+                                    box('dvcC', dovi_record(5, 4)[:3]))
+        path = self.write_file('clip.mp4', mp4_file(entry, 24000, [(48, 1001)]))
+        self.assertIsNone(isobmff.read_stream_info(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
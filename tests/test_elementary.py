@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import mock
+
+from tests.fixtures import H264_PPS, HEVC_PPS, TempFileTestCase, annex_b, h264_slice, h264_sps, hevc_slice, hevc_sps
+from videometareport.native import elementary
+
+
+def h264_stream(sps, pictures=20, picture_size=300):
+    return annex_b(sps, H264_PPS, *[h264_slice(picture_size)] * pictures)
+
+
+class ReadStreamInfoTest(TempFileTestCase):
+
+    def read(self, data, codec_name='h264'):
+        return elementary.read_stream_info(self.write_file('clip.' + codec_name, data), codec_name)
+
+    def test_h264_default_frame_rate(self):
+        self.assertEqual(self.read(h264_stream(h264_sps(1920, 1080, colors=(1, 1, 1)))), {
+            'r_frame_rate': '25/1',
+            'codec_name': 'h264',
+            'codec_tag_string': '[0][0][0][0]',
+            'width': 1920,
+            'height': 1080,
+            'pix_fmt': 'yuv420p',
+            'color_primaries': 'bt709',
+            'color_transfer': 'bt709',
+            'color_space': 'bt709',
+        })
+
+    def test_h264_vui_frame_rate(self):
+        stream = self.read(h264_stream(h264_sps(1280, 720, timing=(1001, 60000))))
+        self.assertEqual(stream['r_frame_rate'], '30000/1001')
+
+    def test_hevc(self):
+        sps = hevc_sps(3840, 2160, colors=(9, 16, 9), timing=(1001, 24000))
+        data = annex_b(sps, HEVC_PPS, *[hevc_slice(300)] * 20)
+        self.assertEqual(self.read(data, 'hevc'), {
+            'r_frame_rate': '24000/1001',
+            'codec_name': 'hevc',
+            'codec_tag_string': '[0][0][0][0]',
+            'width': 3840,
+            'height': 2160,
+            'pix_fmt': 'yuv420p10le',
+            'color_primaries': 'bt2020',
+            'color_transfer': 'smpte2084',
+            'color_space': 'bt2020nc',
+        })
+
+    def test_hevc_without_vui_timing_falls_back(self):
+        data = annex_b(hevc_sps(1920, 1080), HEVC_PPS, *[hevc_slice(300)] * 20)
+        self.assertIsNone(self.read(data, 'hevc'))
+
+    def test_too_few_pictures_fall_back(self):
+        self.assertIsNone(self.read(h264_stream(h264_sps(1920, 1080), pictures=16)))
+
+    def test_interlaced_falls_back(self):
+        self.assertIsNone(self.read(h264_stream(h264_sps(1920, 1080, interlaced=True))))
+
+    def test_no_leading_start_code(self):
+        self.assertIsNone(self.read(b'\x01' + h264_stream(h264_sps(1920, 1080))))
+
+    def test_nal_units_across_chunks(self):
+        data = h264_stream(h264_sps(1920, 1080), picture_size=100000)
+        self.assertGreater(len(data), 3 * elementary.READ_CHUNK_SIZE)
+        expected = self.read(data)
+        self.assertEqual(expected['width'], 1920)
+        # Chunk sizes that split the SPS and the start codes at every offset
+        for chunk_size in (5, 7, 64):
+            with self.subTest(chunk_size=chunk_size), mock.patch.object(elementary, 'READ_CHUNK_SIZE', chunk_size):
+                self.assertEqual(self.read(h264_stream(h264_sps(1920, 1080), picture_size=50)), expected)
+
+    def test_pictures_past_read_limit_fall_back(self):
+        data = h264_stream(h264_sps(1920, 1080), pictures=20, picture_size=elementary.MAX_READ_SIZE // 10)
+        self.assertIsNone(self.read(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import os
+import stat
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tests.fixtures import TempFileTestCase
+from videometareport import tools
+
+# Stand-in for 'exiftool -stay_open True -@ -': logs every request as "pid args...", answers
+# with multi-line JSON, hangs on files named hang*, exits on die* (once per flag file)
+FAKE_EXIFTOOL = '''
+import json, os, sys, time
+log = open(os.path.join(os.path.dirname(sys.argv[0]), 'requests.log'), 'a')
+args = []
+for line in sys.stdin:
+    line = line.rstrip('\\n')
+    if line.startswith('-execute'):
+        log.write(f"{os.getpid()} {' '.join(args)}\\n")
+        log.flush()
+        name = os.path.basename(args[-1])
+        if name.startswith('hang'):
+            time.sleep(60)
+        if name.startswith('die'):
+            flag = args[-1] + '.died'
+            if not os.path.exists(flag) or name.startswith('dieall'):
+                open(flag, 'w').close()
+                sys.exit(1)
+        print(json.dumps([{'SourceFile': args[-1], 'ISO': 800}], indent=1))
+        print('{ready' + line[len('-execute'):] + '}', flush=True)
+        args = []
+    elif args[-1:] == ['-stay_open'] and line == 'False':
+        sys.exit(0)
+    else:
+        args.append(line)
+'''
+
+
+@unittest.skipIf(sys.platform == 'win32', "the fake exiftool is a script run through its shebang")
+class ExifToolSessionTest(TempFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tool_path = self.write_file('exiftool', f'#!{sys.executable}\n{FAKE_EXIFTOOL}'.encode())
+        os.chmod(self.tool_path, os.stat(self.tool_path).st_mode | stat.S_IEXEC)
+
+    def session(self, timeout=30):
+        session = tools.ExifToolSession(self.tool_path, timeout)
+        self.addCleanup(session.close)
+        return session
+
+    def requests(self):
+        """(pid, file name) of the requests exiftool received"""
+        with open(os.path.join(self.temp_dir.name, 'requests.log')) as f:
+            return [(line.split()[0], os.path.basename(line.split()[-1])) for line in f]
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def execute(self, session, name):
+        return session.execute('-json', '-ISO', self.path(name))
+
+    def test_replies_framed_by_ready_marker(self):
+        session = self.session()
+        for name in ('a.mov', 'b.mov'):
+            self.assertEqual(tools.parse_exiftool_iso(self.execute(session, name)), '800')
+        # Same process for both requests
+        self.assertEqual(len({pid for pid, _ in self.requests()}), 1)
+
+    def test_hang_is_not_retried(self):
+        session = self.session(timeout=0.5)
+        started = time.monotonic()
+        self.assertIsNone(self.execute(session, 'hang.mov'))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([name for _, name in self.requests()], ['hang.mov'])
+        # Restarted, the next file is answered by a new process
+        self.assertTrue(session.is_alive())
+        self.assertEqual(tools.parse_exiftool_iso(self.execute(session, 'a.mov')), '800')
+        pids = [pid for pid, _ in self.requests()]
+        self.assertNotEqual(pids[0], pids[1])
+
+    def test_dead_process_restarted_and_retried(self):
+        session = self.session()
+        self.assertEqual(tools.parse_exiftool_iso(self.execute(session, 'die.mov')), '800')
+        requests = self.requests()
+        self.assertEqual([name for _, name in requests], ['die.mov', 'die.mov'])
+        self.assertNotEqual(requests[0][0], requests[1][0])
+
+    def test_process_dying_twice(self):
+        session = self.session()
+        with self.assertRaises(EOFError):
+            self.execute(session, 'dieall.mov')
+        self.assertEqual(len(self.requests()), 2)
+
+    def test_close_sessions_of_threads(self):
+        self.addCleanup(tools.close_exiftool_sessions)
+        sessions = {}
+
+        def start(name):
+            sessions[name] = tools.get_exiftool_session()
+
+        with mock.patch.object(tools, 'get_external_tool_path', return_value=self.tool_path):
+            threads = [threading.Thread(target=start, args=(name,)) for name in ('run', 'other')]
+            for thread in threads:
+                thread.start()
+                thread.join()
+        tools.close_exiftool_sessions(threads[:1])
+        self.assertFalse(sessions['run'].is_alive())
+        self.assertTrue(sessions['other'].is_alive())
+        tools.close_exiftool_sessions()
+        self.assertFalse(sessions['other'].is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
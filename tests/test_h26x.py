@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from tests.fixtures import BitWriter, avcc, escape_rbsp, h264_sps, hevc_sps, hvcc
+from videometareport.native import h26x
+
+
+class BitReaderTest(unittest.TestCase):
+
+    def test_exp_golomb(self):
+        writer = BitWriter()
+        values = [0, 1, 2, 7, 254, 65535]
+        signed = [0, 1, -1, 5, -300]
+        for value in values:
+            writer.ue(value)
+        for value in signed:
+            writer.se(value)
+        reader = h26x.BitReader(writer.rbsp())
+        self.assertEqual([reader.read_ue() for _ in values], values)
+        self.assertEqual([reader.read_se() for _ in signed], signed)
+
+    def test_read_past_end(self):
+        reader = h26x.BitReader(b'\x00')
+        with self.assertRaises(ValueError):
+            reader.read_ue()
+
+    def test_unescape_rbsp(self):
+        data = bytes([0, 0, 0, 1, 0, 0, 3, 0, 0, 2])
+        self.assertEqual(h26x.unescape_rbsp(escape_rbsp(data)), data)
+
+
+class ParseSpsTest(unittest.TestCase):
+
+    def test_h264_cropped_size_and_vui(self):
+        sps = h26x.parse_h264_sps(h264_sps(1920, 1080, colors=(1, 1, 1), full_range=False, timing=(1001, 60000)))
+        self.assertEqual(sps, {
+            'width': 1920,
+            'height': 1080,
+            'chroma_format': 1,
+            'bit_depth': 8,
+            'interlaced': False,
+            'full_range': False,
+            'color_primaries': 1,
+            'color_transfer': 1,
+            'color_space': 1,
+            'frame_rate': (60000, 2002),
+        })
+
+    def test_h264_baseline_defaults(self):
+        sps = h26x.parse_h264_sps(h264_sps(1280, 720, profile=66))
+        self.assertEqual((sps['chroma_format'], sps['bit_depth'], sps['full_range']), (1, 8, None))
+        self.assertNotIn('frame_rate', sps)
+
+    def test_h264_interlaced(self):
+        sps = h26x.parse_h264_sps(h264_sps(1920, 1080, interlaced=True))
+        self.assertEqual((sps['width'], sps['height'], sps['interlaced']), (1920, 1080, True))
+
+    def test_hevc(self):
+        sps = h26x.parse_hevc_sps(hevc_sps(3840, 2160, chroma_format=2, bit_depth=12, colors=(9, 16, 9),
+                                            timing=(1001, 24000)))
+        self.assertEqual(sps, {
+            'width': 3840,
+            'height': 2160,
+            'chroma_format': 2,
+            'bit_depth': 12,
+            'interlaced': False,
+            'full_range': False,
+            'color_primaries': 9,
+            'color_transfer': 16,
+            'color_space': 9,
+            'frame_rate': (24000, 1001),
+        })
+
+    def test_hevc_conformance_window(self):
+        sps = h26x.parse_hevc_sps(hevc_sps(1916, 1076))
+        self.assertEqual((sps['width'], sps['height']), (1916, 1076))
+
+    def test_config_records(self):
+        self.assertEqual(h26x.get_avcc_sps(avcc(h264_sps(640, 480))), h264_sps(640, 480))
+        self.assertIsNone(h26x.get_avcc_sps(avcc(b'')))
+        self.assertEqual(h26x.get_hvcc_sps(hvcc(hevc_sps(640, 480))), hevc_sps(640, 480))
+
+
+class PixFmtTest(unittest.TestCase):
+
+    def sps(self, chroma_format=1, bit_depth=8, full_range=None, **colors):
+        return dict(width=16, height=16, chroma_format=chroma_format, bit_depth=bit_depth, interlaced=False,
+                    full_range=full_range, **colors)
+
+    def test_pix_fmt(self):
+        cases = [
+            ('h264', self.sps(), None, 'yuv420p'),
+            ('h264', self.sps(), True, 'yuvj420p'),
+            ('h264', self.sps(full_range=False), True, 'yuv420p'),
+            ('h264', self.sps(2, 10), None, 'yuv422p10le'),
+            ('h264', self.sps(0), None, None),
+            ('hevc', self.sps(0, 10), None, 'gray10le'),
+            ('hevc', self.sps(full_range=True), None, 'yuvj420p'),
+            ('hevc', self.sps(3, full_range=True), None, 'yuv444p'),
+            ('hevc', self.sps(), True, 'yuv420p'),
+            ('hevc', self.sps(3, 10, color_space=0), None, 'gbrp10le'),
+            ('hevc', self.sps(1, 8, color_space=0), None, None),
+        ]
+        for codec_name, sps, full_range, pix_fmt in cases:
+            with self.subTest(codec_name=codec_name, sps=sps, full_range=full_range):
+                self.assertEqual(h26x.get_sps_pix_fmt(codec_name, sps, full_range), pix_fmt)
+
+
+if __name__ == '__main__':
+    unittest.main()
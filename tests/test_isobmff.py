@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import struct
+import unittest
+
+from tests.fixtures import (
+    TempFileTestCase, avcc, box, colr_nclx, dovi_record, dovi_side_data, full_box, h264_sps, hevc_sps, hvcc, mp4_file,
+    prores_frame, visual_sample_entry,
+)
+from videometareport.native import get_native_reader, isobmff
+
+
+class ReadStreamInfoTest(TempFileTestCase):
+
+    def read(self, data, name='clip.mp4'):
+        return isobmff.read_stream_info(self.write_file(name, data))
+
+    def test_h264_colours_from_colr(self):
+        entry = visual_sample_entry('avc1', 1920, 1088, box('avcC', avcc(h264_sps(1920, 1080))), colr_nclx(1, 1, 1))
+        self.assertEqual(self.read(mp4_file(entry, 30000, [(100, 1001)])), {
+            'width': 1920,
+            'height': 1080,
+            'r_frame_rate': '30000/1001',
+            'codec_tag_string': 'avc1',
+            'codec_name': 'h264',
+            'pix_fmt': 'yuv420p',
+            'color_primaries': 'bt709',
+            'color_transfer': 'bt709',
+            'color_space': 'bt709',
+        })
+
+    def test_h264_vui_colours_override_colr(self):
+        sps = h264_sps(3840, 2160, bit_depth=10, colors=(9, 14, 9))
+        entry = visual_sample_entry('avc1', 3840, 2160, box('avcC', avcc(sps)), colr_nclx(1, 1, 1))
+        self.assertEqual(self.read(mp4_file(entry, 25, [(250, 1)]), 'clip.mov'), {
+            'width': 3840,
+            'height': 2160,
+            'r_frame_rate': '25/1',
+            'codec_tag_string': 'avc1',
+            'codec_name': 'h264',
+            'pix_fmt': 'yuv420p10le',
+            'color_primaries': 'bt2020',
+            'color_transfer': 'bt2020-10',
+            'color_space': 'bt2020nc',
+        })
+
+    def test_h264_full_range_from_colr(self):
+        entry = visual_sample_entry('avc1', 1280, 720, box('avcC', avcc(h264_sps(1280, 720))),
+                                    colr_nclx(1, 1, 1, full_range=True))
+        stream = self.read(mp4_file(entry, 60000, [(10, 1001), (1, 500)]))
+        self.assertEqual(stream['pix_fmt'], 'yuvj420p')
+        # A different last sample duration doesn't make the rate variable
+        self.assertEqual(stream['r_frame_rate'], '60000/1001')
+
+    def test_hevc_dolby_vision(self):
+        sps = hevc_sps(3840, 2160, colors=(9, 16, 9), timing=(1001, 60000))
+        entry = visual_sample_entry('hvc1', 3840, 2160, box('hvcC', hvcc(sps)), colr_nclx(1, 1, 1),
+                                    box('dvvC', dovi_record(8, 6, compatibility_id=1)))
+        self.assertEqual(self.read(mp4_file(entry, 60000, [(120, 1001)])), {
+            'width': 3840,
+            'height': 2160,
+            'r_frame_rate': '60000/1001',
+            'codec_tag_string': 'hvc1',
+            'codec_name': 'hevc',
+            'pix_fmt': 'yuv420p10le',
+            'color_primaries': 'bt2020',
+            'color_transfer': 'smpte2084',
+            'color_space': 'bt2020nc',
+            'side_data_list': [dovi_side_data(8, 6, compatibility_id=1)],
+        })
+
+    def test_hevc_colours_only_from_sps(self):
+        # The HEVC decoder ignores colr: no colour description in the SPS means no colours
+        entry = visual_sample_entry('dvh1', 1920, 1080, box('hvcC', hvcc(hevc_sps(1920, 1080))), colr_nclx(1, 1, 1),
+                                    box('dvcC', dovi_record(5, 4)))
+        self.assertEqual(self.read(mp4_file(entry, 24000, [(48, 1001)])), {
+            'width': 1920,
+            'height': 1080,
+            'r_frame_rate': '24000/1001',
+            'codec_tag_string': 'dvh1',
+            'codec_name': 'hevc',
+            'pix_fmt': 'yuv420p10le',
+            'side_data_list': [dovi_side_data(5, 4)],
+        })
+
+    def test_prores_colours_from_frame_header(self):
+        entry = visual_sample_entry('apch', 1920, 1080, colr_nclx(9, 1, 9))
+        self.assertEqual(self.read(mp4_file(entry, 2500, [(25, 100)], mdat=prores_frame(False, 1, 1, 1)), 'c.mov'), {
+            'width': 1920,
+            'height': 1080,
+            'r_frame_rate': '25/1',
+            'codec_tag_string': 'apch',
+            'codec_name': 'prores',
+            'pix_fmt': 'yuv422p10le',
+            'color_primaries': 'bt709',
+            'color_transfer': 'bt709',
+            'color_space': 'bt709',
+        })
+
+    def test_prores_4444_alpha(self):
+        entry = visual_sample_entry('ap4h', 1920, 1080)
+        stream = self.read(mp4_file(entry, 24, [(24, 1)], mdat=prores_frame(True, 2, 2, 2, alpha=True)), 'c.mov')
+        self.assertEqual(stream['pix_fmt'], 'yuva444p12le')
+        self.assertNotIn('color_primaries', stream)
+
+    def test_prores_raw_tag_only(self):
+        entry = visual_sample_entry('aprn', 5760, 3240)
+        self.assertEqual(self.read(mp4_file(entry, 25, [(25, 1)]), 'c.mov'), {
+            'width': 5760,
+            'height': 3240,
+            'r_frame_rate': '25/1',
+            'codec_tag_string': 'aprn',
+        })
+
+    def test_camera_raw_sample_entry(self):
+        entry = visual_sample_entry('CRAW', 5952, 3140)
+        path = self.write_file('A001.CRM', mp4_file(entry, 24000, [(24, 1001)]))
+        self.assertEqual(isobmff.read_raw_stream_info(path), {
+            'width': 5952,
+            'height': 3140,
+            'r_frame_rate': '24000/1001',
+            'codec_tag_string': 'CRAW',
+        })
+
+    def test_reader_found_by_signature(self):
+        entry = visual_sample_entry('avc1', 1920, 1088, box('avcC', avcc(h264_sps(1920, 1080))))
+        data = mp4_file(entry, 30000, [(100, 1001)])
+        self.assertIs(get_native_reader('clip.bin', data[:16]), isobmff.read_stream_info)
+
+    def test_variable_frame_rate_falls_back(self):
+        entry = visual_sample_entry('avc1', 1920, 1088, box('avcC', avcc(h264_sps(1920, 1080))))
+        self.assertIsNone(self.read(mp4_file(entry, 30000, [(50, 1001), (50, 2002)])))
+
+    def test_unknown_codec_falls_back(self):
+        entry = visual_sample_entry('mp4v', 1920, 1080)
+        self.assertIsNone(self.read(mp4_file(entry, 25, [(25, 1)])))
+
+    def test_in_band_parameter_sets_fall_back(self):
+        entry = visual_sample_entry('avc3', 1920, 1080, box('avcC', avcc(b'')))
+        self.assertIsNone(self.read(mp4_file(entry, 25, [(25, 1)])))
+
+    def test_prores_without_frame_header_falls_back(self):
+        entry = visual_sample_entry('apcn', 1920, 1080)
+        self.assertIsNone(self.read(mp4_file(entry, 25, [(25, 1)], mdat=bytes(64)), 'c.mov'))
+
+    def test_no_video_track(self):
+        entry = visual_sample_entry('avc1', 1920, 1088, box('avcC', avcc(h264_sps(1920, 1080))))
+        self.assertIsNone(self.read(mp4_file(entry, 25, [(25, 1)], handler='soun')))
+
+    def test_no_moov(self):
+        self.assertIsNone(self.read(box('ftyp', b'isom', bytes(4)) + box('mdat', bytes(100))))
+
+
+
+NRTM_XML = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<NonRealTimeMeta xmlns="urn:schemas-professionalDisc:nonRealTimeMeta:ver.2.20">\n'
+            b'<AcquisitionRecord><Group name="CameraUnitMetadataSet">\n'
+            b'<Item name="ISOSensitivity" value="3200"/>\n'
+            b'</Group></AcquisitionRecord></NonRealTimeMeta>\n')
+
+SONY_UUID = bytes.fromhex('50524f4621d24fcebb88695cfac9c740')
+
+
+def nrtm_meta(xml=NRTM_XML, quicktime=False):
+    """meta box holding an nrtm handler and the XML document"""
+    hdlr = full_box('hdlr', struct.pack('>I4s', 0, b'nrtm'), bytes(12), b'\0')
+    children = hdlr + full_box('xml ', xml)
+    return box('meta', children) if quicktime else full_box('meta', children)
+
+
+class ReadIsoMetadataTest(TempFileTestCase):
+
+    def read(self, *boxes):
+        moov = box('moov', *boxes)
+        return isobmff.read_iso_metadata(self.write_file('C0001.MP4', box('ftyp', b'mp42', bytes(4)) + moov))
+
+    def test_sony_xml_in_moov_meta(self):
+        self.assertEqual(self.read(nrtm_meta()), {'ISOSensitivity': 3200})
+
+    def test_sony_xml_in_quicktime_meta(self):
+        self.assertEqual(self.read(nrtm_meta(quicktime=True)), {'ISOSensitivity': 3200})
+
+    def test_sony_xml_in_uuid(self):
+        path = self.write_file('C0001.MP4', box('ftyp', b'mp42', bytes(4)) + box('uuid', SONY_UUID, NRTM_XML) +
+                               box('moov', box('mvhd', bytes(100))))
+        self.assertEqual(isobmff.read_iso_metadata(path), {'ISOSensitivity': 3200})
+
+    def test_other_xml_ignored(self):
+        xml = b'<?xml version="1.0"?><Clip><Item name="ISOSensitivity" value="3200"/></Clip>'
+        self.assertIsNone(self.read(nrtm_meta(xml)))
+
+    def test_no_metadata(self):
+        self.assertIsNone(self.read(box('mvhd', bytes(100))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import types
+from fractions import Fraction
+import unittest
+from unittest import mock
+
+from videometareport import libav
+
+
+def video_stream(codec_name, **stream_fields):
+    """Stub of a PyAV video stream: 1080p 25 fps BT.709, as its codec context holds it"""
+    context = types.SimpleNamespace(
+        codec=types.SimpleNamespace(canonical_name=codec_name), codec_tag='apcn', width=1920, height=1080,
+        pix_fmt='yuv422p10le', color_primaries=1, color_trc=1, colorspace=1)
+    return types.SimpleNamespace(codec_context=context, base_rate=Fraction(25), **stream_fields)
+
+
+def fake_av(*video_streams):
+    """Stub of the av module, opening a container with video_streams"""
+    container = mock.MagicMock()
+    container.__enter__.return_value.streams.video = list(video_streams)
+    return types.SimpleNamespace(open=mock.Mock(return_value=container))
+
+
+class IsAvailableTest(unittest.TestCase):
+
+    def test_not_installed(self):
+        with mock.patch.object(libav, 'av', None):
+            self.assertFalse(libav.is_available())
+
+    def test_installed(self):
+        # Whatever the PyAV version: streams without side data are checked per codec
+        with mock.patch.object(libav, 'av', fake_av()):
+            self.assertTrue(libav.is_available())
+
+
+class ProbeStreamTest(unittest.TestCase):
+
+    def probe(self, *video_streams):
+        with mock.patch.object(libav, 'av', fake_av(*video_streams)):
+            return libav.probe_stream('/videos/clip.mov', timeout=5)
+
+    def test_stream_fields(self):
+        self.assertEqual(self.probe(video_stream('prores')), {
+            'codec_name': 'prores',
+            'codec_tag_string': 'apcn',
+            'width': 1920,
+            'height': 1080,
+            'r_frame_rate': '25/1',
+            'pix_fmt': 'yuv422p10le',
+            'color_transfer': 'bt709',
+            'color_primaries': 'bt709',
+            'color_space': 'bt709',
+        })
+
+    def test_without_side_data_attributes(self):
+        # PyAV 14+: only a codec that may carry Dolby Vision is left to ffprobe
+        self.assertIsNone(self.probe(video_stream('hevc')))
+        self.assertEqual(self.probe(video_stream('prores'))['codec_name'], 'prores')
+
+    def test_with_side_data(self):
+        stream = video_stream('hevc', side_data={'DISPLAYMATRIX': b''}, nb_side_data=1)
+        self.assertEqual(self.probe(stream)['side_data_list'], [{'side_data_type': 'Display Matrix'}])
+
+    def test_no_video_stream(self):
+        self.assertIsNone(self.probe())
+
+
+class SideDataListTest(unittest.TestCase):
+
+    def stream(self, side_data, nb_side_data):
+        return types.SimpleNamespace(side_data=side_data, nb_side_data=nb_side_data)
+
+    def test_display_matrix(self):
+        stream = self.stream({'DISPLAYMATRIX': b''}, 1)
+        self.assertEqual(libav.get_side_data_list(stream, 'hevc'), [{'side_data_type': 'Display Matrix'}])
+
+    def test_missing_attributes(self):
+        stream = types.SimpleNamespace()
+        self.assertIsNone(libav.get_side_data_list(stream, 'av1'))
+        self.assertEqual(libav.get_side_data_list(stream, 'vp9'), [])
+
+    def test_hidden_side_data(self):
+        stream = self.stream({}, 1)
+        self.assertIsNone(libav.get_side_data_list(stream, 'hevc'))
+        self.assertEqual(libav.get_side_data_list(stream, 'prores'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from tests.fixtures import TempFileTestCase, avcc, dovi_record, dovi_side_data, ebml, ebml_uint, h264_sps, hevc_sps, hvcc
+from videometareport.native import matroska
+
+
+def ebml_header(doc_type=b'matroska'):
+    return ebml(matroska.EBML_ID, ebml_uint(0x4286, 1), ebml(matroska.DOC_TYPE_ID, doc_type))
+
+
+def video_track(codec_id, codec_private, width, height, default_duration=40000000, colour=None, extra=b''):
+    """TrackEntry of a video track; colour: (primaries, transfer, matrix, range)"""
+    video = [ebml_uint(matroska.PIXEL_WIDTH_ID, width), ebml_uint(matroska.PIXEL_HEIGHT_ID, height)]
+    if colour is not None:
+        ids = (matroska.PRIMARIES_ID, matroska.TRANSFER_CHARACTERISTICS_ID, matroska.MATRIX_COEFFICIENTS_ID,
+               matroska.RANGE_ID)
+        video.append(ebml(matroska.COLOUR_ID, *(ebml_uint(element_id, value) for element_id, value in zip(ids, colour))))
+    children = [
+        ebml_uint(0xD7, 1),  # TrackNumber
+        ebml_uint(matroska.TRACK_TYPE_ID, matroska.TRACK_TYPE_VIDEO),
+        ebml(matroska.CODEC_ID_ID, codec_id.encode()),
+        ebml(matroska.CODEC_PRIVATE_ID, codec_private),
+        ebml(matroska.VIDEO_ID, *video),
+        extra,
+    ]
+    if default_duration is not None:
+        children.append(ebml_uint(matroska.DEFAULT_DURATION_ID, default_duration))
+    return ebml(matroska.TRACK_ENTRY_ID, *children)
+
+
+def audio_track():
+    return ebml(matroska.TRACK_ENTRY_ID, ebml_uint(0xD7, 2), ebml_uint(matroska.TRACK_TYPE_ID, 2),
+                ebml(matroska.CODEC_ID_ID, b'A_OPUS'))
+
+
+def mkv_file(*tracks, doc_type=b'matroska'):
+    return ebml_header(doc_type) + ebml(matroska.SEGMENT_ID, ebml(matroska.TRACKS_ID, *tracks))
+
+
+def dovi_mapping(record, id_type=b'dvvC'):
+    return ebml(matroska.BLOCK_ADDITION_MAPPING_ID,
+                ebml(matroska.BLOCK_ADD_ID_TYPE_ID, id_type),
+                ebml(matroska.BLOCK_ADD_ID_EXTRA_DATA_ID, record))
+
+
+H264_TRACK = ('V_MPEG4/ISO/AVC', avcc(h264_sps(1920, 1080)), 1920, 1080)
+
+
+class ReadStreamInfoTest(TempFileTestCase):
+
+    def read(self, data, name='clip.mkv'):
+        return matroska.read_stream_info(self.write_file(name, data))
+
+    def test_h264_with_colour(self):
+        track = video_track(*H264_TRACK, default_duration=33366667, colour=(1, 1, 1, 1))
+        self.assertEqual(self.read(mkv_file(audio_track(), track)), {
+            'width': 1920,
+            'height': 1080,
+            'r_frame_rate': '30000/1001',
+            'codec_name': 'h264',
+            'codec_tag_string': '[0][0][0][0]',
+            'pix_fmt': 'yuv420p',
+            'color_primaries': 'bt709',
+            'color_transfer': 'bt709',
+            'color_space': 'bt709',
+        })
+
+    def test_h264_full_range_colour(self):
+        track = video_track(*H264_TRACK, colour=(1, 1, 1, 2))
+        stream = self.read(mkv_file(track), 'clip.webm')
+        self.assertEqual(stream['pix_fmt'], 'yuvj420p')
+        self.assertEqual(stream['r_frame_rate'], '25/1')
+
+    def test_hevc_dolby_vision(self):
+        sps = hevc_sps(3840, 2160, colors=(9, 18, 9))
+        track = video_track('V_MPEGH/ISO/HEVC', hvcc(sps), 3840, 2160, default_duration=41708333,
+                            extra=dovi_mapping(dovi_record(8, 9, compatibility_id=4)))
+        self.assertEqual(self.read(mkv_file(track)), {
+            'width': 3840,
+            'height': 2160,
+            'r_frame_rate': '24000/1001',
+            'codec_name': 'hevc',
+            'codec_tag_string': '[0][0][0][0]',
+            'pix_fmt': 'yuv420p10le',
+            'color_primaries': 'bt2020',
+            'color_transfer': 'arib-std-b67',
+            'color_space': 'bt2020nc',
+            'side_data_list': [dovi_side_data(8, 9, compatibility_id=4)],
+        })
+
+    def test_other_block_additions_ignored(self):
+        track = video_track(*H264_TRACK, extra=dovi_mapping(b'\x00' * 8, id_type=b'itut'))
+        self.assertNotIn('side_data_list', self.read(mkv_file(track)))
+
+    def test_tracks_after_cluster_found_through_seek_head(self):
+        tracks = ebml(matroska.TRACKS_ID, video_track(*H264_TRACK))
+        cluster = ebml(matroska.CLUSTER_ID, ebml_uint(0xE7, 0), bytes(1000))
+        # SeekPosition is relative to the Segment payload; the SeekHead has a fixed size here
+        seek_head_size = len(self.seek_head(0))
+        segment = self.seek_head(seek_head_size + len(cluster)) + cluster + tracks
+        stream = self.read(ebml_header() + ebml(matroska.SEGMENT_ID, segment))
+        self.assertEqual((stream['width'], stream['height']), (1920, 1080))
+
+    @staticmethod
+    def seek_head(tracks_position):
+        return ebml(matroska.SEEK_HEAD_ID, ebml(
+            matroska.SEEK_ID,
+            ebml_uint(matroska.SEEK_ELEMENT_ID, matroska.TRACKS_ID),
+            ebml(matroska.SEEK_POSITION_ID, tracks_position.to_bytes(4, 'big'))))
+
+    def test_frame_rate_bounds(self):
+        # matroskadec only sets r_frame_rate from DefaultDuration between 5 and 1000 fps
+        for default_duration, frame_rate in ((166666667, '6/1'), (200000000, None), (250000000, None),
+                                             (1000000, None), (1001000, '999/1')):
+            with self.subTest(default_duration=default_duration):
+                stream = self.read(mkv_file(video_track(*H264_TRACK, default_duration=default_duration)))
+                self.assertEqual(stream['r_frame_rate'] if stream else None, frame_rate)
+
+    def test_no_default_duration_falls_back(self):
+        self.assertIsNone(self.read(mkv_file(video_track(*H264_TRACK, default_duration=None))))
+
+    def test_unknown_codec_falls_back(self):
+        self.assertIsNone(self.read(mkv_file(video_track('V_VP9', b'', 1920, 1080))))
+
+    def test_compressed_headers_fall_back(self):
+        track = video_track(*H264_TRACK, extra=ebml(matroska.CONTENT_ENCODINGS_ID, ebml(0x6240)))
+        self.assertIsNone(self.read(mkv_file(track)))
+
+    def test_undecodable_dovi_mapping_falls_back(self):
+        track = video_track(*H264_TRACK, extra=dovi_mapping(b'\x01'))
+        self.assertIsNone(self.read(mkv_file(track)))
+
+    def test_other_doc_type(self):
+        self.assertIsNone(self.read(mkv_file(video_track(*H264_TRACK), doc_type=b'other')))
+
+
+if __name__ == '__main__':
+    unittest.main()
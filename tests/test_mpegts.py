@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import struct
+import unittest
+
+from tests.fixtures import (
+    H264_PPS, HEVC_PPS, TempFileTestCase, annex_b, dovi_record, dovi_side_data, h264_slice, h264_sps, hevc_slice,
+    hevc_sps, pat_section, pes_packet, pmt_section, ts_packets,
+)
+from videometareport.native import mpegts
+
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+
+
+def ts_file(sps, stream_type=0x1B, frames=20, delta=3003, descriptors=b'', packet_size=188):
+    """PAT, PMT (audio, then video) and one PES packet per frame, the first one starting with the SPS"""
+    streams = [(0x0F, AUDIO_PID, b''), (stream_type, VIDEO_PID, descriptors)]
+    data = ts_packets(0, b'\x00' + pat_section(PMT_PID), packet_size)
+    data += ts_packets(PMT_PID, b'\x00' + pmt_section(streams), packet_size)
+    hevc = stream_type == 0x24
+    pps, picture = (HEVC_PPS, hevc_slice(300)) if hevc else (H264_PPS, h264_slice(300))
+    for index in range(frames):
+        es_data = annex_b(sps, pps, picture) if index == 0 else annex_b(picture)
+        dts = 126000 + index * delta
+        data += ts_packets(VIDEO_PID, pes_packet(es_data, dts + delta, dts), packet_size)
+    return data
+
+
+def descriptor(tag, payload):
+    return bytes([tag, len(payload)]) + payload
+
+
+class ReadStreamInfoTest(TempFileTestCase):
+
+    def read(self, data, name='clip.ts'):
+        return mpegts.read_stream_info(self.write_file(name, data))
+
+    def test_h264(self):
+        sps = h264_sps(1920, 1080, colors=(1, 1, 1), timing=(1001, 60000))
+        self.assertEqual(self.read(ts_file(sps)), {
+            'r_frame_rate': '30000/1001',
+            'codec_name': 'h264',
+            'codec_tag_string': '[27][0][0][0]',
+            'width': 1920,
+            'height': 1080,
+            'pix_fmt': 'yuv420p',
+            'color_primaries': 'bt709',
+            'color_transfer': 'bt709',
+            'color_space': 'bt709',
+        })
+
+    def test_m2ts_packets(self):
+        stream = self.read(ts_file(h264_sps(1440, 1080), delta=3600, packet_size=192), 'clip.m2ts')
+        self.assertEqual((stream['width'], stream['height'], stream['r_frame_rate']), (1440, 1080, '25/1'))
+        self.assertNotIn('color_primaries', stream)
+
+    def test_hevc_dolby_vision(self):
+        sps = hevc_sps(3840, 2160, colors=(9, 16, 9))
+        dovi = descriptor(mpegts.DOVI_VIDEO_STREAM_DESCRIPTOR, dovi_record(8, 6, compatibility_id=1)[:5])
+        registration = descriptor(mpegts.REGISTRATION_DESCRIPTOR, b'HEVC')
+        data = ts_file(sps, stream_type=0x24, delta=1500, descriptors=registration + dovi)
+        self.assertEqual(self.read(data), {
+            'r_frame_rate': '60/1',
+            'codec_name': 'hevc',
+            'codec_tag_string': 'HEVC',
+            'width': 3840,
+            'height': 2160,
+            'pix_fmt': 'yuv420p10le',
+            'color_primaries': 'bt2020',
+            'color_transfer': 'smpte2084',
+            'color_space': 'bt2020nc',
+            'side_data_list': [dovi_side_data(8, 6, compatibility_id=1)],
+        })
+
+    def test_interlaced_falls_back(self):
+        self.assertIsNone(self.read(ts_file(h264_sps(1920, 1080, interlaced=True))))
+
+    def test_other_codec_falls_back(self):
+        self.assertIsNone(self.read(ts_file(h264_sps(1920, 1080), stream_type=0x02)))
+
+    def test_too_few_timestamps_fall_back(self):
+        self.assertIsNone(self.read(ts_file(h264_sps(1920, 1080), frames=10)))
+
+    def test_vui_timing_mismatch_falls_back(self):
+        # Two frames per PES packet would make the DTS deltas twice the frame duration
+        sps = h264_sps(1920, 1080, timing=(1001, 120000))
+        self.assertIsNone(self.read(ts_file(sps)))
+
+    def test_not_a_transport_stream(self):
+        self.assertIsNone(self.read(bytes(188 * 4)))
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_parse_pat_skips_network_pid(self):
+        section = pat_section(0x10, program_number=0)[:-4] + struct.pack('>HH', 1, 0xe000 | PMT_PID) + bytes(4)
+        section = section[:1] + bytes([0xb0, len(section) - 3]) + section[3:]
+        self.assertEqual(mpegts.parse_pat(section), PMT_PID)
+
+    def test_parse_pmt_first_video_stream(self):
+        section = pmt_section([(0x0F, AUDIO_PID, b''), (0x1B, VIDEO_PID, b''), (0x24, 0x102, b'')])
+        self.assertEqual(mpegts.parse_pmt(section), (VIDEO_PID, 0x1B, 0x1B, None))
+
+    def test_timestamp_frame_rate(self):
+        timestamps = [i * 1800 for i in range(20)]
+        self.assertEqual(mpegts.get_timestamp_frame_rate(timestamps), (50, 1))
+        # ffmpeg needs more than 15 deltas
+        self.assertEqual(mpegts.get_timestamp_frame_rate(timestamps[:17]), (50, 1))
+        self.assertIsNone(mpegts.get_timestamp_frame_rate(timestamps[:16]))
+
+
+if __name__ == '__main__':
+    unittest.main()
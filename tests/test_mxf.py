@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import struct
+import unittest
+
+from tests.fixtures import (
+    H264_PPS, BitWriter, TempFileTestCase, annex_b, h264_slice, h264_sps, klv, local_item,
+)
+from videometareport.native import get_native_reader, mpeg2, mxf
+
+PARTITION_KEY = bytes.fromhex('060e2b34020501010d01020101020400')
+ESSENCE_KEY = bytes.fromhex('060e2b34010201010d01030115010501')
+SYSTEM_ITEM_KEY = bytes.fromhex('060e2b34025301010d01030104010100')
+
+
+def ul(prefix, code):
+    """Registry UL with bytes 8-12 prefix and byte 13 code"""
+    return bytes.fromhex('060e2b34040101') + b'\x0d' + bytes.fromhex(prefix) + bytes([code, 0, 0])
+
+
+def descriptor_key(set_type=0x28):
+    return mxf.LOCAL_SET_KEY + bytes([0x01, set_type, 0x00])
+
+
+def descriptor_items(coding=0x31, rate=(25, 1), frame_layout=0, colors=(0x03, 0x02, 0x02), extra=b''):
+    """CDCI descriptor items; colors: primaries, transfer and coding equations UL codes"""
+    items = local_item(mxf.SAMPLE_RATE_TAG, struct.pack('>II', *rate))
+    items += local_item(mxf.PICTURE_ESSENCE_CODING_TAG, ul('0401020201', coding))
+    items += local_item(mxf.FRAME_LAYOUT_TAG, bytes([frame_layout]))
+    for tag, code in zip((mxf.COLOR_PRIMARIES_TAG, mxf.TRANSFER_CHARACTERISTIC_TAG, mxf.CODING_EQUATIONS_TAG), colors):
+        if code is not None:
+            items += local_item(tag, ul(mxf.COLOR_UL_TABLES[tag][0].hex(), code))
+    return items + extra
+
+
+def reference_levels(depth, black, white, color_range):
+    return b''.join(local_item(tag, struct.pack('>I', value)) for tag, value in (
+        (mxf.COMPONENT_DEPTH_TAG, depth), (mxf.BLACK_REF_LEVEL_TAG, black),
+        (mxf.WHITE_REF_LEVEL_TAG, white), (mxf.COLOR_RANGE_TAG, color_range)))
+
+
+def primer_pack(*entries):
+    """Primer pack mapping (local tag, UL) entries"""
+    value = struct.pack('>II', len(entries), 18) + b''.join(struct.pack('>H', tag) + key for tag, key in entries)
+    return klv(mxf.PRIMER_PACK_KEY, value)
+
+
+def mxf_file(items, essence, primer=None, descriptor_count=1, status=4):
+    """Header partition, header metadata, a system item and the first picture element"""
+    header = primer if primer is not None else primer_pack()
+    header += klv(descriptor_key(), items) * descriptor_count
+    partition = bytearray(88 + 8)
+    struct.pack_into('>HHI', partition, 0, 1, 3, 1)
+    struct.pack_into('>QQ', partition, 32, len(header), 0)
+    key = PARTITION_KEY[:14] + bytes([status]) + PARTITION_KEY[15:]
+    return (klv(key, bytes(partition)) + header + klv(SYSTEM_ITEM_KEY, bytes(28)) +
+            klv(ESSENCE_KEY, essence))
+
+
+def mpeg2_sequence(width, height, progressive=True, chroma_format=1, colors=None):
+    """Sequence header, sequence extension, optional display extension and a picture start code"""
+    writer = BitWriter()
+    writer.u(12, width)
+    writer.u(12, height)
+    writer.u(4, 3)  # aspect_ratio_information
+    writer.u(4, 3)  # frame_rate_code
+    writer.u(32, 0)
+    data = b'\x00\x00\x01\xb3' + writer.rbsp()
+    writer = BitWriter()
+    writer.u(4, mpeg2.SEQUENCE_EXTENSION_ID)
+    writer.u(8, 0x44)
+    writer.u(1, progressive)
+    writer.u(2, chroma_format)
+    writer.u(4, 0)  # size extensions
+    writer.u(13, 1)
+    data += b'\x00\x00\x01\xb5' + writer.rbsp()
+    if colors is not None:
+        data += b'\x00\x00\x01\xb5' + bytes([mpeg2.SEQUENCE_DISPLAY_EXTENSION_ID << 4 | 0x03, *colors]) + bytes(4)
+    return data + b'\x00\x00\x01\x00' + bytes(8)
+
+
+H264_ESSENCE = annex_b(h264_sps(1920, 1080), H264_PPS, h264_slice(300))
+
+
+class ReadStreamInfoTest(TempFileTestCase):
+
+    def read(self, data):
+        return mxf.read_stream_info(self.write_file('clip.mxf', data))
+
+    def test_h264(self):
+        items = descriptor_items(extra=reference_levels(8, 16, 235, 225))
+        self.assertEqual(self.read(mxf_file(items, H264_ESSENCE)), {
+            'r_frame_rate': '25/1',
+            'codec_name': 'h264',
+            'codec_tag_string': '[0][0][0][0]',
+            'color_primaries': 'bt709',
+            'color_transfer': 'bt709',
+            'color_space': 'bt709',
+            'width': 1920,
+            'height': 1080,
+            'pix_fmt': 'yuv420p',
+        })
+
+    def test_h264_full_range_from_reference_levels(self):
+        items = descriptor_items(extra=reference_levels(8, 0, 255, 256))
+        self.assertEqual(self.read(mxf_file(items, H264_ESSENCE))['pix_fmt'], 'yuvj420p')
+
+    def test_dynamic_tag_through_primer(self):
+        primaries_ul = bytes.fromhex('060e2b34010101090401020101060100')
+        primaries = local_item(0x8001, ul('0401010103', 0x04))
+        items = descriptor_items(rate=(30000, 1001), colors=(None, 0x02, 0x02), extra=primaries)
+        stream = self.read(mxf_file(items, H264_ESSENCE, primer=primer_pack((0x8001, primaries_ul))))
+        self.assertEqual((stream['r_frame_rate'], stream['color_primaries']), ('30000/1001', 'bt2020'))
+
+    def test_mpeg2_display_extension_overrides_colours(self):
+        essence = mpeg2_sequence(1920, 1080, colors=(5, 6, 5))
+        stream = self.read(mxf_file(descriptor_items(coding=0x04), essence))
+        self.assertEqual(stream, {
+            'r_frame_rate': '25/1',
+            'codec_name': 'mpeg2video',
+            'codec_tag_string': '[0][0][0][0]',
+            'color_primaries': 'bt470bg',
+            'color_transfer': 'smpte170m',
+            'color_space': 'bt470bg',
+            'width': 1920,
+            'height': 1080,
+            'pix_fmt': 'yuv420p',
+        })
+
+    def test_mpeg2_without_display_extension(self):
+        essence = mpeg2_sequence(720, 576, chroma_format=2)
+        stream = self.read(mxf_file(descriptor_items(coding=0x04), essence))
+        self.assertEqual((stream['width'], stream['pix_fmt'], stream['color_space']), (720, 'yuv422p', 'bt709'))
+
+    def test_reader_found_by_signature(self):
+        data = mxf_file(descriptor_items(), H264_ESSENCE)
+        self.assertIs(get_native_reader('clip.bin', data[:16]), mxf.read_stream_info)
+
+    def test_fallbacks(self):
+        cases = {
+            'open partition': mxf_file(descriptor_items(), H264_ESSENCE, status=1),
+            'two descriptors': mxf_file(descriptor_items(), H264_ESSENCE, descriptor_count=2),
+            'separate fields': mxf_file(descriptor_items(frame_layout=1), H264_ESSENCE),
+            'interlaced sps': mxf_file(descriptor_items(),
+                                       annex_b(h264_sps(1920, 1080, interlaced=True), h264_slice(300))),
+            'interlaced mpeg-2': mxf_file(descriptor_items(coding=0x04), mpeg2_sequence(1920, 1080, False)),
+            'unmapped colour ul': mxf_file(descriptor_items(colors=(0x7f, 0x02, 0x02)), H264_ESSENCE),
+            'other coding': mxf_file(descriptor_items(coding=0x7f), H264_ESSENCE),
+            'no sps': mxf_file(descriptor_items(), annex_b(h264_slice(300))),
+        }
+        for name, data in cases.items():
+            with self.subTest(name):
+                self.assertIsNone(self.read(data))
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_ber_length(self):
+        self.assertEqual(mxf.read_ber_length(b'\x7f', 0), (127, 1))
+        self.assertEqual(mxf.read_ber_length(b'\x83\x01\x00\x00', 0), (65536, 4))
+        with self.assertRaises(ValueError):
+            mxf.read_ber_length(b'\x84\x00', 0)
+
+    def test_full_range_needs_known_levels(self):
+        self.assertIsNone(mxf.get_full_range({}))
+        levels = {tag: struct.pack('>I', value) for tag, value in (
+            (mxf.COMPONENT_DEPTH_TAG, 10), (mxf.BLACK_REF_LEVEL_TAG, 64),
+            (mxf.WHITE_REF_LEVEL_TAG, 940), (mxf.COLOR_RANGE_TAG, 897))}
+        self.assertIs(mxf.get_full_range(levels), False)
+        levels[mxf.WHITE_REF_LEVEL_TAG] = struct.pack('>I', 1000)
+        self.assertIsNone(mxf.get_full_range(levels))
+
+    def test_mpeg1_sequence(self):
+        self.assertIsNone(mpeg2.parse_sequence(b'\x00\x00\x01\xb3\x16\x01\x20\x33' + bytes(4) + b'\x00\x00\x01\x00'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from videometareport.planner import ProbePlanner
+from videometareport.records import DOLBY_VISION, ISO_SKIPPED, VideoResult
+
+STREAM = {'codec_name': 'hevc', 'width': 3840, 'height': 2160, 'r_frame_rate': '25/1'}
+
+
+class NeedsIsoTest(unittest.TestCase):
+
+    def test_dolby_vision_skipped_for_html_only(self):
+        planner = ProbePlanner(['html'])
+        self.assertFalse(planner.needs_iso(STREAM, True))
+        self.assertTrue(planner.needs_iso(STREAM, False))
+        self.assertEqual(planner.skipped, {'iso': 1})
+
+    def test_iso_value_shown(self):
+        for report_formats in (None, ['json'], ['csv'], ['html', 'csv'], ['html', 'json']):
+            with self.subTest(report_formats=report_formats):
+                planner = ProbePlanner(report_formats)
+                self.assertTrue(planner.needs_iso(STREAM, True))
+                self.assertTrue(planner.needs_iso(STREAM, False))
+                self.assertEqual(planner.skipped, {'iso': 0})
+
+    def test_no_stream(self):
+        planner = ProbePlanner(['json'])
+        self.assertFalse(planner.needs_iso(None, False))
+        self.assertFalse(planner.needs_iso({}, True))
+        # A file dropped from the results isn't counted as a skipped probe
+        self.assertEqual(planner.skipped, {'iso': 0})
+
+
+class ReusesResultTest(unittest.TestCase):
+
+    def results(self):
+        """A complete and an ISO skipped result, as cached raw data and as analysis results"""
+        return [
+            ({'stream': STREAM, 'iso': 800}, True),
+            ({'stream': STREAM, 'iso': None, 'isoSkipped': True}, False),
+            (VideoResult('/videos/a.mp4', 3840, 2160, 25, 800), True),
+            (VideoResult('/videos/b.mp4', 3840, 2160, 25, None, flags=DOLBY_VISION | ISO_SKIPPED), False),
+        ]
+
+    def test_html_only(self):
+        planner = ProbePlanner(['html'])
+        for result, _ in self.results():
+            with self.subTest(result=result):
+                self.assertTrue(planner.reuses_result(result))
+
+    def test_iso_skipped_reprobed_for_iso_value(self):
+        for report_formats in (None, ['json'], ['html', 'csv']):
+            planner = ProbePlanner(report_formats)
+            for result, complete in self.results():
+                with self.subTest(report_formats=report_formats, result=result):
+                    self.assertEqual(planner.reuses_result(result), complete)
+
+
+if __name__ == '__main__':
+    unittest.main()
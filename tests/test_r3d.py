@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import struct
+import unittest
+
+from tests.fixtures import TempFileTestCase
+from videometareport.native import get_native_reader, r3d
+
+
+def r3d_header(header_type, width, height, frame_rate, iso=None, size=None):
+    """Header block of an R3D file, with an ISO metadata entry after the fixed fields"""
+    width_offset, height_offset, size_format, frame_rate_offset = r3d.HEADER_LAYOUTS[header_type]
+    data = bytearray(0x80)
+    data[4:8] = header_type
+    struct.pack_into(size_format, data, width_offset, width)
+    struct.pack_into(size_format, data, height_offset, height)
+    struct.pack_into('>HH', data, frame_rate_offset, *frame_rate)
+    if iso is not None:
+        data += r3d.ISO_ENTRY + struct.pack('>H', iso)
+    data += bytes(16)
+    struct.pack_into('>I', data, 0, len(data) if size is None else size)
+    return bytes(data)
+
+
+class ReadStreamInfoTest(TempFileTestCase):
+
+    def read(self, data):
+        return r3d.read_stream_info(self.write_file('A001_C001.R3D', data + bytes(4096)))
+
+    def test_red1(self):
+        self.assertEqual(self.read(r3d_header(b'RED1', 4096, 2160, (24000, 1001))), {
+            'width': 4096,
+            'height': 2160,
+            'r_frame_rate': '24000/1001',
+        })
+
+    def test_red2(self):
+        self.assertEqual(self.read(r3d_header(b'RED2', 8192, 4320, (50, 2))), {
+            'width': 8192,
+            'height': 4320,
+            'r_frame_rate': '25/1',
+        })
+
+    def test_reader_found_by_signature(self):
+        self.assertIs(get_native_reader('clip.bin', r3d_header(b'RED2', 8192, 4320, (25, 1))[:16]),
+                      r3d.read_stream_info)
+
+    def test_invalid_fields(self):
+        for header in (r3d_header(b'RED2', 0, 4320, (25, 1)), r3d_header(b'RED2', 8192, 40000, (25, 1)),
+                       r3d_header(b'RED1', 4096, 2160, (24, 0))):
+            with self.subTest(header=header):
+                self.assertIsNone(self.read(header))
+
+    def test_header_size(self):
+        for size in (0, 7, r3d.MAX_HEADER_SIZE + 1):
+            with self.subTest(size=size):
+                self.assertIsNone(self.read(r3d_header(b'RED2', 8192, 4320, (25, 1), size=size)))
+
+    def test_header_shorter_than_fields(self):
+        self.assertIsNone(self.read(r3d_header(b'RED2', 8192, 4320, (25, 1), size=0x50)))
+
+    def test_other_file(self):
+        self.assertIsNone(self.read(b'\x00\x00\x00\x80RED3' + bytes(0x80)))
+
+
+class ReadIsoMetadataTest(TempFileTestCase):
+
+    def read(self, data):
+        return r3d.read_iso_metadata(self.write_file('A001_C001.R3D', data))
+
+    def test_iso(self):
+        self.assertEqual(self.read(r3d_header(b'RED2', 8192, 4320, (25, 1), iso=800)), {'ISO': 800})
+        self.assertEqual(self.read(r3d_header(b'RED1', 4096, 2160, (24, 1), iso=65535)), {'ISO': 65535})
+
+    def test_iso_below_minimum(self):
+        self.assertIsNone(self.read(r3d_header(b'RED2', 8192, 4320, (25, 1), iso=0)))
+
+    def test_iso_outside_header_block(self):
+        # Only the header block is searched, not what follows it
+        self.assertIsNone(self.read(r3d_header(b'RED2', 8192, 4320, (25, 1), iso=800, size=0x80)))
+
+    def test_no_iso_entry(self):
+        self.assertIsNone(self.read(r3d_header(b'RED2', 8192, 4320, (25, 1))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from videometareport.records import DOLBY_VISION, ISO_SKIPPED, RESULT_KEYS, VideoResult
+
+
+class VideoResultMappingTest(unittest.TestCase):
+
+    def test_iso_skipped_flag_not_a_key(self):
+        result = VideoResult('/videos/a.mp4', 3840, 2160, 25, None, 'smpte2084', 'bt2020',
+                             flags=DOLBY_VISION | ISO_SKIPPED)
+        self.assertTrue(result.iso_skipped)
+        self.assertEqual(list(result), list(RESULT_KEYS))
+        self.assertEqual(len(result), len(RESULT_KEYS))
+        self.assertNotIn('isoSkipped', result)
+        self.assertNotIn('isoSkipped', json.loads(json.dumps(dict(result))))
+
+    def test_same_keys_for_all_results(self):
+        result = VideoResult('/videos/a.mp4', 1920, 1080, 25, 800)
+        self.assertEqual(dict(result)['iso'], 800)
+        self.assertEqual(list(result), list(RESULT_KEYS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import os
+import types
+import unittest
+from unittest import mock
+
+from tests.fixtures import TempFileTestCase
+from videometareport import analysis
+from videometareport.cache import ScanSnapshotStore
+from videometareport.columns import ResultColumns
+from videometareport.records import VideoResult
+from videometareport.scanner import diff_scan
+
+
+def file_info(size, mtime_ns, dev=1, ino=0):
+    return {'size': size, 'mtime_ns': mtime_ns, 'dev': dev, 'ino': ino, 'result': None}
+
+
+def stat(size, mtime_ns, dev=1, ino=0):
+    return types.SimpleNamespace(st_size=size, st_mtime_ns=mtime_ns, st_dev=dev, st_ino=ino)
+
+
+class DiffScanTest(unittest.TestCase):
+
+    def test_added_removed_modified(self):
+        previous = {'/v/a.mp4': file_info(10, 1, ino=1), '/v/b.mp4': file_info(20, 2, ino=2),
+                    '/v/c.mp4': file_info(30, 3, ino=3)}
+        entries = [('/v/a.mp4', stat(10, 1, ino=1)), ('/v/b.mp4', stat(20, 5, ino=2)),
+                   ('/v/d.mp4', stat(40, 4, ino=4))]
+        self.assertEqual(diff_scan(previous, entries), {
+            'added': ['/v/d.mp4'],
+            'removed': ['/v/c.mp4'],
+            'modified': ['/v/b.mp4'],
+            'renamed': [],
+        })
+
+    def test_rename_by_file_id(self):
+        # Same size and mtime, only the file id tells which file went where
+        previous = {'/v/a.mp4': file_info(10, 1, ino=1), '/v/b.mp4': file_info(10, 1, ino=2)}
+        entries = [('/v/c.mp4', stat(10, 1, ino=2)), ('/v/d.mp4', stat(10, 1, ino=1))]
+        changes = diff_scan(previous, entries)
+        self.assertEqual(sorted(changes['renamed']), [('/v/a.mp4', '/v/d.mp4'), ('/v/b.mp4', '/v/c.mp4')])
+        self.assertEqual((changes['added'], changes['removed']), ([], []))
+
+    def test_rename_needs_same_device(self):
+        previous = {'/v/a.mp4': file_info(10, 1, dev=1, ino=1)}
+        changes = diff_scan(previous, [('/w/a.mp4', stat(10, 1, dev=2, ino=1))])
+        self.assertEqual((changes['added'], changes['removed'], changes['renamed']), (['/w/a.mp4'], ['/v/a.mp4'], []))
+
+    def test_rename_without_file_id(self):
+        # ino 0 (Windows scandir): size + mtime must be unique on both sides
+        previous = {'/v/a.mp4': file_info(10, 1), '/v/b.mp4': file_info(20, 2), '/v/c.mp4': file_info(20, 2)}
+        entries = [('/v/x.mp4', stat(10, 1)), ('/v/y.mp4', stat(20, 2)), ('/v/z.mp4', stat(20, 2))]
+        changes = diff_scan(previous, entries)
+        self.assertEqual(changes['renamed'], [('/v/a.mp4', '/v/x.mp4')])
+        self.assertEqual(changes['added'], ['/v/y.mp4', '/v/z.mp4'])
+        self.assertEqual(changes['removed'], ['/v/b.mp4', '/v/c.mp4'])
+
+
+def fake_slots(video_files, columns=None, **kwargs):
+    """analyze_video_file_slots for files holding 'width height fps [color_transfer]' (or 'fail')"""
+    slots = []
+    for file_path in video_files:
+        with open(file_path) as f:
+            fields = f.read().split()
+        if fields == ['fail']:
+            slots.append(None)
+            continue
+        transfer = fields[3] if len(fields) > 3 else None
+        slots.append(VideoResult(file_path, int(fields[0]), int(fields[1]), float(fields[2]), None, transfer))
+        if columns is not None:
+            columns.set(str(file_path), slots[-1])
+    return slots
+
+
+class RescanTest(TempFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(analysis, 'analyze_video_file_slots', side_effect=fake_slots)
+        self.analyze = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.root = os.path.join(self.temp_dir.name, 'videos')
+        os.makedirs(os.path.join(self.root, 'day1'))
+        self.store = self.open_store('snapshots.sqlite3')
+        self.full_scans = 0
+        self.write('day1/a.mp4', '1920 1080 25')
+        self.write('day1/b.mov', '3840 2160 60 smpte2084')
+        self.write('day1/c.mkv', '1280 720 30')
+        self.write('day1/d.mp4', 'fail')
+        self.write('e.mxf', '3840 2160 50 arib-std-b67')
+        results, statistics, changes = analysis.rescan_video_files(self.root, self.store)
+        self.assertIsNone(changes)
+        self.assertEqual(statistics, analysis.compute_statistics(results, 5))
+
+    def open_store(self, name):
+        store = ScanSnapshotStore(os.path.join(self.temp_dir.name, name))
+        self.addCleanup(store.close)
+        return store
+
+    def write(self, name, content):
+        with open(os.path.join(self.root, name), 'w') as f:
+            f.write(content)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def rescan(self, columns=None):
+        """Incremental rescan, checked against a full scan of the same tree"""
+        if columns is None:
+            columns = ResultColumns()
+        results, statistics, changes = analysis.rescan_video_files(self.root, self.store, columns=columns)
+        self.full_scans += 1
+        full_store = self.open_store(f'full{self.full_scans}.sqlite3')
+        full_results, full_statistics, full_changes = analysis.rescan_video_files(self.root, full_store)
+        self.assertIsNone(full_changes)
+        self.assertEqual(statistics, full_statistics)
+        self.assertEqual([dict(result) for result in results], [dict(result) for result in full_results])
+        # One row per result, under its path
+        self.assertEqual(sorted(columns.rows), sorted(result.full_path for result in results))
+        for result in results:
+            row = columns.rows[result.full_path]
+            self.assertEqual((columns.width[row], columns.height[row], columns.framerate[row]),
+                             (result.width, result.height, result.framerate))
+        return changes
+
+    def test_no_changes(self):
+        self.assertEqual(self.rescan(), {'added': [], 'removed': [], 'modified': [], 'renamed': []})
+
+    def test_added_removed_modified(self):
+        self.write('day1/f.mp4', '3840 2160 60')
+        os.remove(self.path('day1/b.mov'))
+        self.write('day1/a.mp4', '1280 720 60 smpte2084')
+        self.write('day1/d.mp4', '1920 1080 30')
+        changes = self.rescan()
+        self.assertEqual(changes['added'], [self.path('day1/f.mp4')])
+        self.assertEqual(changes['removed'], [self.path('day1/b.mov')])
+        self.assertEqual(sorted(changes['modified']), [self.path('day1/a.mp4'), self.path('day1/d.mp4')])
+
+    def test_renamed_files_keep_their_result(self):
+        os.makedirs(self.path('day2'))
+        os.rename(self.path('day1/b.mov'), self.path('day2/b2.mov'))
+        os.rename(self.path('day1/d.mp4'), self.path('day2/d.mp4'))
+        self.analyze.reset_mock()
+        changes = self.rescan()
+        self.assertEqual(sorted(changes['renamed']), [(self.path('day1/b.mov'), self.path('day2/b2.mov')),
+                                                      (self.path('day1/d.mp4'), self.path('day2/d.mp4'))])
+        # Nothing analyzed again by the incremental rescan
+        self.assertEqual(self.analyze.call_args_list[0].args[0], [])
+
+    def test_successive_rescans(self):
+        self.write('day1/c.mkv', '1920 1080 60 smpte2084 ')
+        # The columns of a session are patched by every rescan
+        columns = ResultColumns()
+        self.rescan(columns)
+        os.remove(self.path('e.mxf'))
+        self.write('g.mp4', 'fail')
+        self.rescan(columns)
+        self.assertEqual(self.store.load(self.root)[0]['totalFiles'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import struct
+import unittest
+
+from tests.fixtures import TempFileTestCase
+from videometareport.native import sidecar
+from videometareport.scanner import scan_video_files
+
+SONY_XML = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<NonRealTimeMeta xmlns="urn:schemas-professionalDisc:nonRealTimeMeta:ver.2.20">\n'
+            b'<AcquisitionRecord><Group name="CameraUnitMetadataSet">\n'
+            b'<Item name="ExposureIndexOfPhotoMeter" value="640"/>\n'
+            b'<Item name="ISOSensitivity" value="800"/>\n'
+            b'</Group></AcquisitionRecord></NonRealTimeMeta>\n')
+
+ELEMENT_XML = b'<?xml version="1.0"?>\n<Clip><Camera><ISOSensitivity> 1600 </ISOSensitivity></Camera></Clip>\n'
+
+XMP = (b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+       b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+       b'<rdf:Description xmlns:exif="http://ns.adobe.com/exif/1.0/">\n'
+       b'<exif:ISOSpeedRatings><rdf:Seq><rdf:li>400</rdf:li></rdf:Seq></exif:ISOSpeedRatings>\n'
+       b'</rdf:Description></rdf:RDF></x:xmpmeta>\n<?xpacket end="w"?>')
+
+
+def thm_jpeg(iso):
+    """JPEG with an Exif APP1 segment: IFD0 pointing to an Exif IFD holding the ISO tag"""
+    tiff = b'II*\x00' + struct.pack('<I', 8)
+    tiff += struct.pack('<H', 1) + struct.pack('<HHII', 0x8769, 4, 1, 26) + struct.pack('<I', 0)
+    tiff += struct.pack('<H', 1) + struct.pack('<HHIHH', 0x8827, 3, 1, iso, 0) + struct.pack('<I', 0)
+    app1 = b'Exif\x00\x00' + tiff
+    return b'\xff\xd8\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + b'\xff\xda' + bytes(16)
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_xml_item_style(self):
+        self.assertEqual(sidecar.read_xml_iso_tags(SONY_XML), {'RecommendedExposureIndex': 640, 'ISOSensitivity': 800})
+
+    def test_xml_element_style(self):
+        self.assertEqual(sidecar.read_xml_iso_tags(ELEMENT_XML), {'ISOSensitivity': 1600})
+
+    def test_xml_holding_xmp(self):
+        self.assertEqual(sidecar.read_xml_iso_tags(XMP), {'ISO': 400})
+
+    def test_xml_without_iso(self):
+        self.assertEqual(sidecar.read_xml_iso_tags(b'<Clip><Item name="Gain" value="6"/></Clip>'), {})
+
+
+class ReadSidecarTest(TempFileTestCase):
+
+    def test_by_extension(self):
+        cases = [
+            ('C0001M01.XML', SONY_XML, {'RecommendedExposureIndex': 640, 'ISOSensitivity': 800}),
+            ('MVI_0001.THM', thm_jpeg(3200), {'ISO': 3200}),
+            ('clip.MOV.xmp', XMP, {'ISO': 400}),
+            ('clip.Xmp', b'<x:xmpmeta', None),
+            ('clip.txt', SONY_XML, None),
+        ]
+        for name, data, tags in cases:
+            with self.subTest(name):
+                self.assertEqual(sidecar.read_sidecar_iso_metadata(self.write_file(name, data)), tags)
+
+
+class MatchSidecarsTest(TempFileTestCase):
+
+    def scan(self, *names):
+        for name in names:
+            path = os.path.join(self.temp_dir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x')
+        sidecars = {}
+        entries = scan_video_files(self.temp_dir.name, sidecars=sidecars)
+        root = self.temp_dir.name
+        return ([os.path.relpath(file_path, root) for file_path, _ in entries],
+                {os.path.relpath(video, root): [os.path.relpath(path, root) for path in paths]
+                 for video, paths in sidecars.items()})
+
+    def test_sony_suffix(self):
+        videos, sidecars = self.scan('C0001.MP4', 'C0001M01.XML', 'C0002.MP4', 'C0002.XML')
+        self.assertEqual(videos, ['C0001.MP4', 'C0002.MP4'])
+        self.assertEqual(sidecars, {'C0001.MP4': ['C0001M01.XML'], 'C0002.MP4': ['C0002.XML']})
+
+    def test_case_insensitive_extensions(self):
+        videos, sidecars = self.scan('MVI_0001.Mp4', 'mvi_0001.thm', 'clip.MOV', 'clip.mov.XMP', 'clip.Xmp')
+        self.assertEqual(videos, ['MVI_0001.Mp4', 'clip.MOV'])
+        # The full-name sidecar (clip.mov.xmp) comes before the stem one
+        self.assertEqual(sidecars, {'MVI_0001.Mp4': ['mvi_0001.thm'], 'clip.MOV': ['clip.mov.XMP', 'clip.Xmp']})
+
+    def test_unmatched_sidecars(self):
+        _, sidecars = self.scan('C0001.MP4', 'C0001M01.txt', 'C0002M01.XML', 'other/C0001M01.XML', 'C0001XM01.XML')
+        self.assertEqual(sidecars, {})
+
+    def test_no_sidecar_index_requested(self):
+        self.scan('C0001.MP4', 'C0001M01.XML')
+        self.assertEqual(len(scan_video_files(self.temp_dir.name)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Video Meta Report - 视频批量分析
+
+Core of the application, usable without a GUI (see videometareport.cli).
+Nothing in this package imports tkinter.
+"""
+
+__version__ = '1.0.0'
+
+from .analysis import (
+    DEFAULT_WORKERS, MAX_WORKERS,
+    analyze_video_file, analyze_video_files, compute_statistics, rescan_video_files,
+)
+from .report import generate_html_report, save_report
+from .scanner import RAW_EXTENSIONS, VIDEO_EXTENSIONS, get_video_files, scan_video_files
+
+__all__ = [
+    'DEFAULT_WORKERS', 'MAX_WORKERS', 'RAW_EXTENSIONS', 'VIDEO_EXTENSIONS',
+    'analyze_video_file', 'analyze_video_files', 'compute_statistics', 'rescan_video_files',
+    'generate_html_report', 'save_report', 'get_video_files', 'scan_video_files',
+]
@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+"""
+Probing and classifying video files
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .backends import ISO_ROUTER, STREAM_ROUTER, SUBPROCESS_COST, ProbeRequest
+from .columns import DEFAULT_THRESHOLDS, ResultColumns
+from .records import DOLBY_VISION, ISO_SKIPPED, RAW_VIDEO, VideoResult, parse_framerate
+from .scanner import RAW_EXTENSIONS, scan_video_files, diff_scan
+from .tools import DEFAULT_EXIFTOOL_MODE, EXIFTOOL_BATCH_SIZE, close_exiftool_sessions, get_iso_batch_from_exiftool
+
+
+# Number of files probed concurrently. Probing is dominated by waiting on
+# ffprobe/exiftool subprocesses and disk I/O, so we can go well beyond the core count.
+DEFAULT_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+MAX_WORKERS = 64
+
+# Probe engines: a thread pool, or asyncio subprocesses (see async_probe)
+ENGINES = ['threads', 'asyncio']
+DEFAULT_ENGINE = 'threads'
+# The asyncio engine has no per-probe thread, so it can keep many more probes in flight
+DEFAULT_ASYNC_CONCURRENCY = 64
+MAX_ASYNC_CONCURRENCY = 256
+
+
+def probe_video_stream(file_path):
+    """
+    Probe the first video stream with the cheapest backend that can read it: natively
+    when possible, else with a single ffprobe call (see backends.STREAM_ROUTER).
+    The returned stream dict includes 'side_data_list' when the stream has side data.
+    """
+    return STREAM_ROUTER.probe(ProbeRequest(file_path))
+
+
+def detect_dolby_vision(stream):
+    """Check the side data of a probed stream for Dolby Vision (DOVI)"""
+    for side_data in stream.get('side_data_list', []):
+        side_data_type = side_data.get('side_data_type', '')
+        dv_version_major = side_data.get('dv_version_major', 0)
+        dv_profile = side_data.get('dv_profile', 0)
+        rpu_present_flag = side_data.get('rpu_present_flag', 0)
+        
+        # Check DOVI conditions (OR logic)
+        if (('DOVI' in side_data_type or 'Dolby' in side_data_type) or
+            dv_version_major > 0 or
+            dv_profile > 0 or
+            rpu_present_flag == 1):
+            return True
+    
+    return False
+
+
+def get_native_iso(file_path, sidecar_paths=None):
+    """
+    ISO value read without exiftool: from the camera metadata of the file, else from
+    its sidecar files (see scan_video_files). None if not found.
+    """
+    return ISO_ROUTER.probe(ProbeRequest(file_path, sidecar_paths), max_cost=SUBPROCESS_COST - 1)
+
+
+def get_iso_batch(file_paths, sidecars=None):
+    """
+    ISO values for many files: from the camera metadata or sidecar files where possible,
+    the others with batched exiftool calls. sidecars: optional {str(video path): [sidecar paths]}.
+    Returns a dict mapping str(file_path) to the ISO value (or None).
+    """
+    sidecars = sidecars or {}
+    iso_values = {str(file_path): get_native_iso(file_path, sidecars.get(str(file_path)))
+                  for file_path in file_paths}
+    missing = [file_path for file_path in file_paths if iso_values[str(file_path)] is None]
+    if missing:
+        start = time.perf_counter()
+        iso_values.update(get_iso_batch_from_exiftool(missing))
+        found = sum(iso_values[str(file_path)] is not None for file_path in missing)
+        ISO_ROUTER.record('exiftool', hits=found, misses=len(missing) - found, seconds=time.perf_counter() - start)
+    return iso_values
+
+
+def probe_video_file(file_path, iso_values=None, sidecar_paths=None, planner=None):
+    """
+    Collect the raw metadata of a video file: the ffprobe stream dict and the ISO value.
+    iso_values: optional dict of ISO values looked up in advance (see get_iso_batch)
+    sidecar_paths: optional camera sidecar files of the video, tried before exiftool
+    planner: optional ProbePlanner, the ISO lookup is skipped when it isn't needed
+    Returns {'stream': ..., 'iso': ...} (with 'isoSkipped': True when the ISO
+    wasn't looked up) or None if the file can't be probed.
+    """
+    try:
+        # One ffprobe call returns both the stream info and the DOVI side data
+        stream = probe_video_stream(file_path)
+        
+        if not stream:
+            return None
+        
+        if planner is not None and not planner.needs_iso(stream, detect_dolby_vision(stream)):
+            return {'stream': stream, 'iso': None, 'isoSkipped': True}
+        
+        # Get ISO from the camera metadata or sidecar files, else from exiftool
+        if iso_values is not None:
+            iso_value = iso_values.get(str(file_path))
+        else:
+            iso_value = ISO_ROUTER.probe(ProbeRequest(file_path, sidecar_paths))
+        
+        return {'stream': stream, 'iso': iso_value}
+    except Exception as e:
+        print(f"Error analyzing {file_path}: {e}")
+        return None
+
+
+def build_video_result(file_path, raw):
+    """Classify the raw metadata returned by probe_video_file, as a VideoResult"""
+    try:
+        stream = raw['stream']
+        
+        try:
+            is_dolby_vision = detect_dolby_vision(stream)
+        except Exception as e:
+            # If DOVI detection fails, continue without it
+            print(f"Warning: Failed to detect DOVI for {file_path}: {e}")
+            is_dolby_vision = False
+        
+        # Check if file extension indicates RAW format
+        file_ext = Path(file_path).suffix.lower()
+        is_raw_video = file_ext in RAW_EXTENSIONS
+        
+        # Check for ProRes RAW in .mov files
+        codec_name = stream.get('codec_name', '').lower()
+        codec_tag = stream.get('codec_tag_string', '').lower()
+        if file_ext == '.mov':
+            # ProRes RAW codecs: prores_raw, ap4h (ProRes 4444), etc.
+            if 'prores' in codec_name and 'raw' in codec_name:
+                is_raw_video = True
+            elif codec_tag in ['aprh', 'aprn']:  # ProRes RAW HQ and ProRes RAW
+                is_raw_video = True
+        
+        flags = 0
+        if is_dolby_vision:
+            flags |= DOLBY_VISION
+        if is_raw_video:
+            flags |= RAW_VIDEO
+        if raw.get('isoSkipped'):
+            # Tells a later scan that needs the ISO value to analyze the file again
+            flags |= ISO_SKIPPED
+        
+        return VideoResult(
+            file_path,
+            int(stream.get('width', 0)), int(stream.get('height', 0)),
+            parse_framerate(stream.get('r_frame_rate', '0/1')),
+            raw['iso'],
+            color_transfer=stream.get('color_transfer'),
+            color_primaries=stream.get('color_primaries'),
+            color_space=stream.get('color_space'),
+            pix_fmt=stream.get('pix_fmt'),
+            flags=flags,
+        )
+    except Exception as e:
+        print(f"Error analyzing {file_path}: {e}")
+        return None
+
+
+def analyze_video_file(file_path, iso_values=None):
+    """
+    Analyze a single video file using ffprobe.
+    iso_values: optional dict of ISO values looked up in advance (see get_iso_batch)
+    """
+    raw = probe_video_file(file_path, iso_values=iso_values)
+    if raw is None:
+        return None
+    return build_video_result(file_path, raw)
+
+
+def _probe_chunk(file_paths, exiftool_mode, sidecars=None, planner=None):
+    """Probe a chunk of files; in batch mode the ISO values exiftool is needed for come from one call"""
+    sidecars = sidecars or {}
+    if exiftool_mode != 'batch':
+        return [probe_video_file(file_path, sidecar_paths=sidecars.get(str(file_path)), planner=planner)
+                for file_path in file_paths]
+    
+    # Streams first, so that the ISO values are only looked up for the files that need them
+    streams = []
+    for file_path in file_paths:
+        try:
+            streams.append(probe_video_stream(file_path))
+        except Exception as e:
+            print(f"Error analyzing {file_path}: {e}")
+            streams.append(None)
+    needed = [file_path for file_path, stream in zip(file_paths, streams)
+              if stream and (planner is None or planner.needs_iso(stream, detect_dolby_vision(stream)))]
+    iso_values = get_iso_batch(needed, sidecars)
+    raws = []
+    for file_path, stream in zip(file_paths, streams):
+        if not stream:
+            raws.append(None)
+        elif str(file_path) in iso_values:
+            raws.append({'stream': stream, 'iso': iso_values[str(file_path)]})
+        else:
+            raws.append({'stream': stream, 'iso': None, 'isoSkipped': True})
+    return raws
+
+
+def analyze_video_files(video_files, workers=DEFAULT_WORKERS, progress_callback=None,
+                        exiftool_mode=DEFAULT_EXIFTOOL_MODE, cache=None, file_stats=None,
+                        engine=DEFAULT_ENGINE, sidecars=None, planner=None, columns=None):
+    """
+    Analyze a list of video files with a pool of worker threads.
+    Results are returned in the same order as video_files (failed files are dropped),
+    so the report is identical to a sequential run.
+    See analyze_video_file_slots for the arguments.
+    """
+    slots = analyze_video_file_slots(video_files, workers=workers, progress_callback=progress_callback,
+                                     exiftool_mode=exiftool_mode, cache=cache, file_stats=file_stats,
+                                     engine=engine, sidecars=sidecars, planner=planner, columns=columns)
+    return [result for result in slots if result]
+
+
+def analyze_video_file_slots(video_files, workers=DEFAULT_WORKERS, progress_callback=None,
+                             exiftool_mode=DEFAULT_EXIFTOOL_MODE, cache=None, file_stats=None,
+                             engine=DEFAULT_ENGINE, sidecars=None, planner=None, columns=None):
+    """
+    Analyze a list of video files with a pool of worker threads.
+    Returns one result per entry of video_files, None for files that failed.
+    progress_callback(done, total, file_path) is called from the calling thread.
+    cache: optional ProbeCache; only files missing from it (or changed on disk) are probed.
+    file_stats: optional stat results matching video_files (as returned by scan_video_files).
+    engine: 'threads', or 'asyncio' to drive the tools from an event loop, in which case
+    workers is the number of probes in flight and ISO values are always looked up in batches.
+    sidecars: optional {str(video path): [sidecar paths]} (as filled by scan_video_files),
+    read for the ISO value before exiftool.
+    planner: optional ProbePlanner skipping the probes the reports don't need
+    (cached data missing what it needs is probed again).
+    columns: optional ResultColumns, a row is stored for every result (keyed by its path)
+    as it comes in.
+    """
+    total_files = len(video_files)
+    slots = [None] * total_files
+    if engine == 'asyncio':
+        workers = max(1, min(int(workers), MAX_ASYNC_CONCURRENCY))
+    else:
+        workers = max(1, min(int(workers), MAX_WORKERS))
+    done = 0
+    
+    # Serve unchanged files from the cache
+    to_probe = list(range(total_files))
+    if cache is not None:
+        if file_stats is None:
+            file_stats = []
+            for file_path in video_files:
+                try:
+                    file_stats.append(os.stat(file_path))
+                except OSError:
+                    file_stats.append(None)
+        
+        to_probe = []
+        for idx, file_path in enumerate(video_files):
+            raw = cache.get(file_path, file_stats[idx]) if file_stats[idx] else None
+            if raw is None or planner is not None and not planner.reuses_result(raw):
+                to_probe.append(idx)
+            else:
+                slots[idx] = build_video_result(file_path, raw)
+                if columns is not None and slots[idx]:
+                    columns.set(str(file_path), slots[idx])
+        
+        done = total_files - len(to_probe)
+        if done and progress_callback:
+            progress_callback(done, total_files, video_files[-1])
+    
+    def collect(indices, raws):
+        for idx, raw in zip(indices, raws):
+            if raw is None:
+                continue
+            file_path = video_files[idx]
+            slots[idx] = build_video_result(file_path, raw)
+            if columns is not None and slots[idx]:
+                columns.set(str(file_path), slots[idx])
+            if cache is not None and file_stats[idx]:
+                cache.put(file_path, file_stats[idx], raw)
+    
+    if engine == 'asyncio':
+        # Imported here as the asyncio engine builds on this module
+        from .async_probe import run_probe_video_files_async
+        
+        def on_probed(position, raw):
+            nonlocal done
+            idx = to_probe[position]
+            collect([idx], [raw])
+            done += 1
+            if progress_callback:
+                progress_callback(done, total_files, video_files[idx])
+        
+        run_probe_video_files_async([video_files[idx] for idx in to_probe], on_probed, concurrency=workers,
+                                    sidecars=sidecars, planner=planner)
+        if cache is not None:
+            cache.commit()
+        return slots
+    
+    # Work is handed out in chunks: single files normally, or batches sharing one
+    # exiftool call in batch mode (small enough to keep every worker busy)
+    if exiftool_mode == 'batch':
+        chunk_size = max(1, min(EXIFTOOL_BATCH_SIZE, -(-len(to_probe) // workers)))
+    else:
+        chunk_size = 1
+    chunks = [to_probe[start:start + chunk_size] for start in range(0, len(to_probe), chunk_size)]
+    
+    # Threads that started exiftool sessions for this run
+    pool_threads = []
+    
+    if workers == 1:
+        pool_threads.append(threading.current_thread())
+        for indices in chunks:
+            collect(indices, _probe_chunk([video_files[idx] for idx in indices], exiftool_mode, sidecars, planner))
+            done += len(indices)
+            if progress_callback:
+                progress_callback(done, total_files, video_files[indices[-1]])
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe',
+                                initializer=lambda: pool_threads.append(threading.current_thread())) as executor:
+            future_to_chunk = {
+                executor.submit(_probe_chunk, [video_files[idx] for idx in indices], exiftool_mode, sidecars,
+                                planner): indices
+                for indices in chunks
+            }
+            # Results are collected here only, so no locking is needed
+            for future in as_completed(future_to_chunk):
+                indices = future_to_chunk[future]
+                try:
+                    collect(indices, future.result())
+                except Exception as e:
+                    print(f"Error analyzing {video_files[indices[0]]}: {e}")
+                done += len(indices)
+                if progress_callback:
+                    progress_callback(done, total_files, video_files[indices[-1]])
+    
+    if cache is not None:
+        cache.commit()
+    
+    # The worker threads are gone, so are the exiftool sessions they used
+    close_exiftool_sessions(pool_threads)
+    
+    return slots
+
+
+def finalize_statistics(statistics, total_files):
+    """Set the total and derived counters"""
+    statistics['totalFiles'] = total_files
+    # Files that failed to analyze are still counted as SDR
+    statistics['sdrCount'] = total_files - statistics['hdrCount'] - statistics['otherColorSpaceCount']
+    return statistics
+
+
+def compute_statistics(results, total_files, columns=None, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Aggregate per-category counters over analysis results.
+    columns: optional ResultColumns already holding the rows of results, counted instead
+    thresholds: classification thresholds (see columns.Thresholds)
+    """
+    if columns is None:
+        columns = ResultColumns(results)
+    statistics = {'totalFiles': total_files}
+    statistics.update(columns.count_statistics(thresholds))
+    return finalize_statistics(statistics, total_files)
+
+
+def relocate_result(result, file_path):
+    """Copy of a result with its path fields pointing to file_path"""
+    return result.relocated(file_path)
+
+
+def rescan_video_files(path, store, workers=DEFAULT_WORKERS, progress_callback=None, cache=None,
+                       exiftool_mode=DEFAULT_EXIFTOOL_MODE, engine=DEFAULT_ENGINE, planner=None, columns=None):
+    """
+    Scan path and only analyze what changed since the last scan stored in store.
+    The rows of the previous results are patched with the changes and the statistics
+    counted again from them; without a previous scan everything is analyzed.
+    planner: optional ProbePlanner; unchanged files whose previous result misses what it
+    needs (e.g. an ISO value skipped for an HTML-only report) are analyzed again too.
+    columns: optional ResultColumns, empty or holding the rows of the last scan of path;
+    left with the rows of the returned results.
+    Returns (results, statistics, changes); changes is None after a full scan.
+    """
+    if columns is None:
+        columns = ResultColumns()
+    root = os.path.abspath(path)
+    sidecars = {}
+    entries = scan_video_files(path, sidecars=sidecars)
+    snapshot = store.load(root)
+    
+    if snapshot is None:
+        slots = analyze_video_file_slots([file_path for file_path, _ in entries], workers=workers,
+                                         progress_callback=progress_callback, cache=cache,
+                                         exiftool_mode=exiftool_mode, engine=engine,
+                                         file_stats=[stat for _, stat in entries], sidecars=sidecars,
+                                         planner=planner, columns=columns)
+        results = [result for result in slots if result]
+        statistics = compute_statistics(results, len(entries), columns)
+        store.save(root, entries, slots, statistics)
+        return results, statistics, None
+    
+    previous_files = snapshot[1]
+    changes = diff_scan(previous_files, entries)
+    stat_by_path = {str(file_path): stat for file_path, stat in entries}
+    if not columns.rows:
+        for file_path, info in previous_files.items():
+            if info['result']:
+                columns.append(info['result'], file_path)
+    
+    # Unchanged and renamed files whose previous result isn't complete enough for this scan
+    stale = []
+    renamed = changes['renamed']
+    if planner is not None:
+        changed = set(changes['added'] + changes['modified'] + [new for _, new in changes['renamed']])
+        stale = [str(file_path) for file_path, _ in entries
+                 if str(file_path) not in changed and previous_files[str(file_path)]['result']
+                 and not planner.reuses_result(previous_files[str(file_path)]['result'])]
+        renamed = [(old, new) for old, new in changes['renamed']
+                   if not previous_files[old]['result'] or planner.reuses_result(previous_files[old]['result'])]
+    stale_renamed = [pair for pair in changes['renamed'] if pair not in renamed]
+    
+    # Drop the rows of what is gone or analyzed again, move the rows of renamed files
+    for old_path in changes['removed'] + changes['modified'] + stale + [old for old, _ in stale_renamed]:
+        columns.set(old_path, None)
+    for old_path, new_path in renamed:
+        if old_path in columns.rows:
+            columns.rename(old_path, new_path)
+    
+    # Only the added and modified files are analyzed, their rows added as they come in
+    to_probe = changes['added'] + changes['modified'] + stale + [new for _, new in stale_renamed]
+    slots = analyze_video_file_slots([Path(p) for p in to_probe], workers=workers,
+                                     progress_callback=progress_callback, cache=cache,
+                                     exiftool_mode=exiftool_mode, engine=engine,
+                                     file_stats=[stat_by_path[p] for p in to_probe], sidecars=sidecars,
+                                     planner=planner, columns=columns)
+    new_results = dict(zip(to_probe, slots))
+    
+    # Patch the previous results, keeping the order of a full scan
+    results_by_path = {path: info['result'] for path, info in previous_files.items()}
+    for path in changes['removed'] + [old for old, _ in stale_renamed]:
+        del results_by_path[path]
+    updated_files = []
+    for old_path, new_path in renamed:
+        result = results_by_path.pop(old_path)
+        results_by_path[new_path] = relocate_result(result, new_path) if result else None
+        updated_files.append((new_path, stat_by_path[new_path], results_by_path[new_path]))
+    for path, result in new_results.items():
+        results_by_path[path] = result
+        updated_files.append((path, stat_by_path[path], result))
+    results = [results_by_path[str(file_path)] for file_path, _ in entries if results_by_path[str(file_path)]]
+    statistics = compute_statistics(results, len(entries), columns)
+    
+    store.update(root, changes['removed'] + [old for old, _ in changes['renamed']], updated_files, statistics)
+    return results, statistics, changes
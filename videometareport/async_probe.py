@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio probe engine: ffprobe and exiftool driven through asyncio subprocesses
+
+A thread pool ties up one thread per probe while it waits on subprocess.run.
+Here the waiting happens in one event loop, so hundreds of probes can be in
+flight (e.g. against high-latency SMB shares) without the thread overhead.
+"""
+import asyncio
+import subprocess
+import time
+
+from .analysis import detect_dolby_vision, get_native_iso
+from .backends import (
+    ISO_ROUTER, PROBE_TIMEOUT, STREAM_ROUTER, SUBPROCESS_COST,
+    ProbeRequest, build_ffprobe_command, parse_ffprobe_output,
+)
+from .tools import (
+    EXIFTOOL_BATCH_SIZE, SUBPROCESS_FLAGS,
+    build_exiftool_batch_command, get_iso_from_exiftool, is_batchable_path, parse_exiftool_batch_output,
+)
+
+
+async def run_tool_async(cmd, semaphore, timeout, input_data=None):
+    """
+    Run an external tool once a slot of semaphore is free.
+    Returns (returncode, stdout); the process is killed if it takes longer than timeout.
+    """
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            creationflags=SUBPROCESS_FLAGS
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(
+                process.communicate(input_data.encode('utf-8') if input_data is not None else None),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        return process.returncode, stdout.decode('utf-8', errors='replace')
+
+
+async def probe_video_stream_async(file_path, semaphore, timeout=PROBE_TIMEOUT):
+    """asyncio version of analysis.probe_video_stream"""
+    # The in-process backends are quick but blocking (network shares), keep them off the event loop
+    stream = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: STREAM_ROUTER.probe(ProbeRequest(file_path), max_cost=SUBPROCESS_COST - 1))
+    if stream is not None:
+        return stream
+    
+    start = time.perf_counter()
+    try:
+        returncode, output = await run_tool_async(build_ffprobe_command(file_path), semaphore, timeout)
+        stream = parse_ffprobe_output(output) if returncode == 0 else None
+    except Exception:
+        STREAM_ROUTER.record('ffprobe', errors=1, seconds=time.perf_counter() - start)
+        raise
+    STREAM_ROUTER.record('ffprobe', hits=int(stream is not None), misses=int(stream is None),
+                         seconds=time.perf_counter() - start)
+    return stream
+
+
+async def get_iso_batch_async(file_paths, semaphore, sidecars=None):
+    """asyncio version of analysis.get_iso_batch for a single chunk of files"""
+    chunk = [str(file_path) for file_path in file_paths]
+    sidecars = sidecars or {}
+    loop = asyncio.get_running_loop()
+    # Camera metadata and sidecars first, exiftool only runs for the files without them
+    native_iso = await loop.run_in_executor(
+        None, lambda: [get_native_iso(file_path, sidecars.get(file_path)) for file_path in chunk])
+    iso_values = dict(zip(chunk, native_iso))
+    missing = [file_path for file_path in chunk if iso_values[file_path] is None]
+    batchable = [file_path for file_path in missing if is_batchable_path(file_path)]
+
+    if batchable:
+        start = time.perf_counter()
+        try:
+            _, output = await run_tool_async(build_exiftool_batch_command(), semaphore, 30 + len(batchable),
+                                             input_data='\n'.join(batchable) + '\n')
+            iso_values.update(parse_exiftool_batch_output(batchable, output))
+        except Exception as e:
+            print(f"Warning: Failed to get ISO for {len(batchable)} files: {e}")
+        found = sum(iso_values[file_path] is not None for file_path in batchable)
+        ISO_ROUTER.record('exiftool', hits=found, misses=len(batchable) - found, seconds=time.perf_counter() - start)
+
+    for file_path in missing:
+        if not is_batchable_path(file_path):
+            # Rare enough to not bother making it async
+            iso_values[file_path] = await loop.run_in_executor(None, get_iso_from_exiftool, file_path)
+
+    return iso_values
+
+
+async def probe_video_files_async(file_paths, on_probed, concurrency, timeout=PROBE_TIMEOUT,
+                                  batch_size=EXIFTOOL_BATCH_SIZE, sidecars=None, planner=None):
+    """
+    Probe file_paths with at most concurrency tool processes running at once.
+    on_probed(index, raw) is called from the event loop as each file completes, raw being
+    the dict probe_video_file would return (or None).
+    ISO values are looked up once the stream is known, for the files planner (an optional
+    ProbePlanner) says need one: in batches of batch_size files, with one exiftool call
+    for the files whose camera metadata or sidecar files (sidecars: {str(video path):
+    [sidecar paths]}) give none.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # (index, stream) of the probed files waiting for the next ISO batch
+    iso_waiting = []
+    iso_tasks = set()
+
+    async def resolve_iso(batch):
+        try:
+            iso_values = await get_iso_batch_async([file_paths[idx] for idx, _ in batch], semaphore, sidecars)
+        except Exception as e:
+            print(f"Warning: Failed to get ISO for {len(batch)} files: {e}")
+            iso_values = {}
+        for idx, stream in batch:
+            on_probed(idx, {'stream': stream, 'iso': iso_values.get(str(file_paths[idx]))})
+
+    def flush_iso():
+        if iso_waiting:
+            task = asyncio.ensure_future(resolve_iso(list(iso_waiting)))
+            iso_tasks.add(task)
+            task.add_done_callback(iso_tasks.discard)
+            iso_waiting.clear()
+
+    async def probe_one(idx):
+        file_path = file_paths[idx]
+        stream = None
+        try:
+            stream = await probe_video_stream_async(file_path, semaphore, timeout)
+        except asyncio.TimeoutError:
+            print(f"Error analyzing {file_path}: ffprobe timed out after {timeout}s")
+        except Exception as e:
+            print(f"Error analyzing {file_path}: {e}")
+        if not stream:
+            on_probed(idx, None)
+        elif planner is not None and not planner.needs_iso(stream, detect_dolby_vision(stream)):
+            on_probed(idx, {'stream': stream, 'iso': None, 'isoSkipped': True})
+        else:
+            iso_waiting.append((idx, stream))
+            if len(iso_waiting) >= batch_size:
+                flush_iso()
+
+    # Bounded fan-out: only schedule a few more probes than can run, so the
+    # number of pending tasks doesn't grow with the number of files
+    pending = set()
+    for idx in range(len(file_paths)):
+        if len(pending) >= concurrency * 2:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        pending.add(asyncio.ensure_future(probe_one(idx)))
+    if pending:
+        await asyncio.wait(pending)
+    flush_iso()
+    if iso_tasks:
+        await asyncio.wait(iso_tasks)
+
+
+def run_probe_video_files_async(file_paths, on_probed, concurrency, timeout=PROBE_TIMEOUT, sidecars=None,
+                                planner=None):
+    """Run probe_video_files_async in a new event loop, blocking until all files are probed"""
+    if not file_paths:
+        return
+    asyncio.run(probe_video_files_async(file_paths, on_probed, concurrency, timeout, sidecars=sidecars,
+                                        planner=planner))
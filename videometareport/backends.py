@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Probe backends: the ways the raw metadata of a video file can be read
+
+Every backend of a router returns the same normalized record (an ffprobe-like stream
+dict for STREAM_ROUTER, an ISO value for ISO_ROUTER), whatever it is built on.
+The router tries the backends able to handle a file, picked by extension and magic
+bytes, cheapest first, falling back to the next one when a backend can't tell.
+Hit/miss/latency counters are kept per backend to show which path the files take.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+
+from . import libav
+from .native import (
+    ISO_READERS, NATIVE_MAGIC, NATIVE_READERS, MAGIC_SIZE,
+    probe_native_iso_metadata, probe_native_stream, probe_sidecar_iso_metadata,
+)
+from .tools import SUBPROCESS_FLAGS, get_external_tool_path, get_iso_from_exiftool, get_iso_from_metadata
+
+
+# Timeout of a single ffprobe call, in seconds
+PROBE_TIMEOUT = 30
+
+# Stream fields used for classification (codec_name/codec_tag_string for ProRes RAW detection)
+FFPROBE_STREAM_ENTRIES = 'width,height,r_frame_rate,color_transfer,color_primaries,color_space,pix_fmt,codec_name,codec_tag_string'
+
+# Dolby Vision (DOVI) configuration side data
+FFPROBE_SIDE_DATA_ENTRIES = 'side_data_type,dv_version_major,dv_version_minor,dv_profile,dv_level,rpu_present_flag,el_present_flag,bl_present_flag,dv_bl_signal_compatibility_id,dv_md_compression'
+
+# Relative cost of a backend call: header reads in Python, in-process libraries, external processes
+NATIVE_COST = 1
+LIBRARY_COST = 10
+SUBPROCESS_COST = 100
+
+
+def build_ffprobe_command(file_path):
+    """ffprobe command returning both the stream info and the DOVI side data"""
+    return [
+        get_external_tool_path('ffprobe'), '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', f'stream={FFPROBE_STREAM_ENTRIES}:stream_side_data={FFPROBE_SIDE_DATA_ENTRIES}',
+        '-of', 'json',
+        str(file_path)
+    ]
+
+
+def parse_ffprobe_output(output):
+    """Get the first stream from ffprobe -of json output, or None"""
+    video_info = json.loads(output)
+
+    if not video_info.get('streams'):
+        return None
+
+    return video_info['streams'][0]
+
+
+class ProbeRequest:
+    """
+    A file to probe and what is known about it.
+    header: first MAGIC_SIZE bytes of the file; None until the router reads them, which it
+    only does once per request and only if a backend needs them to recognise the format.
+    """
+
+    def __init__(self, file_path, sidecar_paths=None, header=None):
+        self.file_path = file_path
+        self.extension = os.path.splitext(str(file_path))[1].lower()
+        self.sidecar_paths = sidecar_paths or []
+        self.header = header
+
+
+class ProbeBackend:
+    """
+    One way to read a record. probe(request) returns the record, or None when the
+    backend can't tell and the next one should be tried.
+    extensions: extensions handled, None for any file
+    magic: (offset, bytes) header signatures handled whatever the extension
+    """
+
+    def __init__(self, name, probe, cost, extensions=None, magic=()):
+        self.name = name
+        self.probe = probe
+        self.cost = cost
+        self.extensions = frozenset(extensions) if extensions is not None else None
+        self.magic = tuple(magic)
+
+    def accepts_extension(self, request):
+        """Whether the backend handles files with the extension of request"""
+        return self.extensions is None or request.extension in self.extensions
+
+    def accepts(self, request):
+        """Whether the backend can handle the file of request (its header must be read if magic is used)"""
+        if self.accepts_extension(request):
+            return True
+        header = request.header or b''
+        return any(header[offset:offset + len(signature)] == signature for offset, signature in self.magic)
+
+
+def read_header(file_path):
+    """First MAGIC_SIZE bytes of a file (empty if it can't be read)"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(MAGIC_SIZE)
+    except OSError:
+        return b''
+
+
+class BackendRouter:
+    """Tries backends by increasing cost and counts their hits, misses, errors and time"""
+
+    def __init__(self, backends=()):
+        self.backends = []
+        self.lock = threading.Lock()
+        self.counters = {}
+        for backend in backends:
+            self.register(backend)
+
+    def register(self, backend):
+        """Add a backend, replacing any backend of the same name"""
+        self.backends = sorted([b for b in self.backends if b.name != backend.name] + [backend],
+                               key=lambda b: b.cost)
+        with self.lock:
+            self.counters.setdefault(backend.name, {'hits': 0, 'misses': 0, 'errors': 0, 'seconds': 0.0})
+
+    def route(self, request, max_cost=None, exclude=()):
+        """Backends to try for request, cheapest first"""
+        candidates = [backend for backend in self.backends
+                      if (max_cost is None or backend.cost <= max_cost) and backend.name not in exclude]
+        if request.header is None and any(backend.magic and not backend.accepts_extension(request)
+                                          for backend in candidates):
+            request.header = read_header(request.file_path)
+        return [backend for backend in candidates if backend.accepts(request)]
+
+    def record(self, name, hits=0, misses=0, errors=0, seconds=0.0):
+        """Add to the counters of a backend (also for calls made outside probe, e.g. batches)"""
+        with self.lock:
+            counters = self.counters.setdefault(name, {'hits': 0, 'misses': 0, 'errors': 0, 'seconds': 0.0})
+            counters['hits'] += hits
+            counters['misses'] += misses
+            counters['errors'] += errors
+            counters['seconds'] += seconds
+
+    def probe(self, request, max_cost=None, exclude=()):
+        """
+        Record of the first backend returning one, or None.
+        A backend raising counts as an error and the next one is tried; if none returns
+        a record, the last exception is raised again.
+        """
+        error = None
+        for backend in self.route(request, max_cost, exclude):
+            start = time.perf_counter()
+            try:
+                record = backend.probe(request)
+            except Exception as e:
+                self.record(backend.name, errors=1, seconds=time.perf_counter() - start)
+                error = e
+                continue
+            hit = record is not None
+            self.record(backend.name, hits=int(hit), misses=int(not hit), seconds=time.perf_counter() - start)
+            if hit:
+                return record
+        if error is not None:
+            raise error
+        return None
+
+    def get_stats(self):
+        """Copy of the counters: {backend name: {'hits', 'misses', 'errors', 'seconds'}}"""
+        with self.lock:
+            return {name: dict(counters) for name, counters in self.counters.items()}
+
+    def reset_stats(self):
+        """Zero the counters"""
+        with self.lock:
+            for counters in self.counters.values():
+                counters.update(hits=0, misses=0, errors=0, seconds=0.0)
+
+
+def probe_native(request):
+    """Native backend: reader picked by extension, else by the header signature"""
+    # The router has read the header when the extension has no reader
+    return probe_native_stream(request.file_path, request.header)
+
+
+def probe_ffprobe_stream(request):
+    """ffprobe backend: a single call returns the stream info and the DOVI side data"""
+    result = subprocess.run(build_ffprobe_command(request.file_path), capture_output=True, text=True,
+                            timeout=PROBE_TIMEOUT, creationflags=SUBPROCESS_FLAGS)
+
+    if result.returncode != 0:
+        return None
+
+    return parse_ffprobe_output(result.stdout)
+
+
+def probe_native_iso(request):
+    """ISO value of the camera metadata embedded in the file"""
+    metadata = probe_native_iso_metadata(request.file_path)
+    return get_iso_from_metadata(metadata) if metadata else None
+
+
+def probe_sidecar_iso(request):
+    """ISO value of the first sidecar file giving one"""
+    for sidecar_path in request.sidecar_paths:
+        metadata = probe_sidecar_iso_metadata(sidecar_path)
+        iso_value = get_iso_from_metadata(metadata) if metadata else None
+        if iso_value is not None:
+            return iso_value
+    return None
+
+
+STREAM_ROUTER = BackendRouter([
+    ProbeBackend('native', probe_native, NATIVE_COST, extensions=NATIVE_READERS,
+                 magic=[(offset, signature) for offset, signature, _ in NATIVE_MAGIC]),
+    ProbeBackend('ffprobe', probe_ffprobe_stream, SUBPROCESS_COST),
+])
+if libav.is_available():
+    STREAM_ROUTER.register(ProbeBackend('pyav', lambda request: libav.probe_stream(request.file_path, PROBE_TIMEOUT),
+                                        LIBRARY_COST))
+
+ISO_ROUTER = BackendRouter([
+    ProbeBackend('native', probe_native_iso, NATIVE_COST, extensions=ISO_READERS),
+    ProbeBackend('sidecar', probe_sidecar_iso, NATIVE_COST + 1),
+    ProbeBackend('exiftool', lambda request: get_iso_from_exiftool(request.file_path), SUBPROCESS_COST),
+])
+
+
+def get_backend_stats():
+    """Counters of all routers: {'stream': {...}, 'iso': {...}} (see BackendRouter.get_stats)"""
+    return {'stream': STREAM_ROUTER.get_stats(), 'iso': ISO_ROUTER.get_stats()}
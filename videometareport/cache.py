@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk caches: raw probe data and scan snapshots
+"""
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from .records import VideoResult
+
+
+def get_cache_dir():
+    """Get the per-user cache directory of the application"""
+    if sys.platform == 'win32':
+        base_dir = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return Path(base_dir) / 'VideoMetaReport'
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'VideoMetaReport'
+    base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base_dir) / 'videometareport'
+
+
+class ProbeCache:
+    """
+    On-disk (SQLite) cache of the raw probe data returned by probe_video_file.
+    Entries are keyed by absolute path and only used while the file size and mtime match.
+    Not thread-safe: use it from the thread collecting the results.
+    """
+    
+    # Bump when the stored raw data changes (e.g. new ffprobe entries)
+    SCHEMA_VERSION = 2
+    COMMIT_INTERVAL = 500
+    
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = get_cache_dir() / 'probe_cache.sqlite3'
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.pending_writes = 0
+        
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self.connection.execute('DROP TABLE IF EXISTS probe_cache')
+            self.connection.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS probe_cache (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                stream TEXT NOT NULL,
+                iso TEXT,
+                iso_skipped INTEGER NOT NULL DEFAULT 0,
+                probed_at REAL NOT NULL
+            )
+        ''')
+        self.connection.commit()
+    
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(str(file_path))
+    
+    def get(self, file_path, stat):
+        """Get the cached raw data of file_path, or None if missing or stale"""
+        row = self.connection.execute(
+            'SELECT size, mtime_ns, stream, iso, iso_skipped FROM probe_cache WHERE path = ?',
+            (self._key(file_path),)
+        ).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return None
+        raw = {'stream': json.loads(row[2]), 'iso': row[3]}
+        if row[4]:
+            raw['isoSkipped'] = True
+        return raw
+    
+    def put(self, file_path, stat, raw):
+        """Store the raw data of file_path"""
+        self.connection.execute(
+            'INSERT OR REPLACE INTO probe_cache (path, size, mtime_ns, stream, iso, iso_skipped, probed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (self._key(file_path), stat.st_size, stat.st_mtime_ns,
+             json.dumps(raw['stream'], ensure_ascii=False), raw['iso'], int(bool(raw.get('isoSkipped'))),
+             time.time())
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= self.COMMIT_INTERVAL:
+            self.commit()
+    
+    def commit(self):
+        self.connection.commit()
+        self.pending_writes = 0
+    
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+
+def open_probe_cache():
+    """Open the default probe cache, or return None if it can't be used"""
+    try:
+        return ProbeCache()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Failed to open probe cache: {e}")
+        return None
+
+
+class ScanSnapshotStore:
+    """
+    On-disk (SQLite) record of the last scan of each folder: the files found
+    (with size, mtime and file id), their results and the statistics.
+    Used by rescan_video_files to only analyze what changed since then.
+    """
+    
+    # Bump when the stored results change
+    SCHEMA_VERSION = 2
+    
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = get_cache_dir() / 'scan_snapshots.sqlite3'
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self.connection.execute('DROP TABLE IF EXISTS scans')
+            self.connection.execute('DROP TABLE IF EXISTS scan_files')
+            self.connection.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS scans (
+                root TEXT PRIMARY KEY,
+                statistics TEXT NOT NULL,
+                scanned_at REAL NOT NULL
+            )
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS scan_files (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                result TEXT,
+                PRIMARY KEY (root, path)
+            )
+        ''')
+        self.connection.commit()
+    
+    @staticmethod
+    def _file_row(root, file_path, stat, result):
+        return (root, str(file_path), stat.st_size, stat.st_mtime_ns, stat.st_dev, stat.st_ino,
+                json.dumps(result.to_state(), ensure_ascii=False) if result else None)
+    
+    def load(self, root):
+        """
+        Get the last scan of root as (statistics, files), or None if root was never scanned.
+        files maps each path string to a dict with size, mtime_ns, dev, ino and result.
+        """
+        row = self.connection.execute('SELECT statistics FROM scans WHERE root = ?', (root,)).fetchone()
+        if row is None:
+            return None
+        
+        files = {}
+        for path, size, mtime_ns, dev, ino, result in self.connection.execute(
+                'SELECT path, size, mtime_ns, dev, ino, result FROM scan_files WHERE root = ?', (root,)):
+            files[path] = {
+                'size': size, 'mtime_ns': mtime_ns, 'dev': dev, 'ino': ino,
+                'result': VideoResult.from_state(json.loads(result)) if result else None
+            }
+        return json.loads(row[0]), files
+    
+    def save(self, root, entries, slots, statistics):
+        """Replace the snapshot of root with a full scan"""
+        with self.connection:
+            self.connection.execute('DELETE FROM scan_files WHERE root = ?', (root,))
+            self.connection.executemany(
+                'INSERT INTO scan_files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self._file_row(root, file_path, stat, result)
+                 for (file_path, stat), result in zip(entries, slots))
+            )
+            self._save_statistics(root, statistics)
+    
+    def update(self, root, removed_paths, updated_files, statistics):
+        """
+        Patch the snapshot of root.
+        updated_files: list of (file_path, stat, result) for added, modified and renamed files
+        """
+        with self.connection:
+            self.connection.executemany('DELETE FROM scan_files WHERE root = ? AND path = ?',
+                                        ((root, path) for path in removed_paths))
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO scan_files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self._file_row(root, file_path, stat, result) for file_path, stat, result in updated_files)
+            )
+            self._save_statistics(root, statistics)
+    
+    def _save_statistics(self, root, statistics):
+        self.connection.execute('INSERT OR REPLACE INTO scans VALUES (?, ?, ?)',
+                                (root, json.dumps(statistics), time.time()))
+    
+    def close(self):
+        self.connection.close()
+
+
+def open_scan_snapshot_store():
+    """Open the default scan snapshot store, or return None if it can't be used"""
+    try:
+        return ScanSnapshotStore()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Failed to open scan snapshots: {e}")
+        return None
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Headless command line interface, for batch/server use (cron, no display)
+
+    python -m videometareport scan <dir> [--workers N] [--output PATH] [--format html --format json ...]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from . import __version__
+from .analysis import (
+    DEFAULT_ASYNC_CONCURRENCY, DEFAULT_ENGINE, DEFAULT_WORKERS, ENGINES,
+    analyze_video_file_slots, compute_statistics, rescan_video_files,
+)
+from .backends import get_backend_stats
+from .cache import open_probe_cache, open_scan_snapshot_store
+from .columns import ResultColumns
+from .planner import ProbePlanner
+from .report import REPORT_WRITERS, save_report
+from .scanner import scan_video_files
+from .tools import DEFAULT_EXIFTOOL_MODE, check_ffprobe
+
+DEFAULT_REPORT_NAME = '视频报告'
+
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(prog='videometareport', description="Video Meta Report - 视频批量分析")
+    parser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = subparsers.add_parser('scan', help="analyze the videos in a folder and write a report")
+    scan_parser.add_argument('directory', help="folder to analyze (recursively)")
+    scan_parser.add_argument('-j', '--workers', type=int,
+                             help=f"number of files analyzed concurrently (default: {DEFAULT_WORKERS}, "
+                                  f"or {DEFAULT_ASYNC_CONCURRENCY} with the asyncio engine)")
+    scan_parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                             help="probe engine: a thread pool, or asyncio subprocesses for many probes "
+                                  f"in flight on high-latency storage (default: {DEFAULT_ENGINE})")
+    scan_parser.add_argument('-o', '--output',
+                             help=f"report path (default: <directory>/{DEFAULT_REPORT_NAME}.<format>); "
+                                  "with several formats the suffix is replaced per format; '-' writes to stdout")
+    scan_parser.add_argument('-f', '--format', dest='formats', action='append', choices=sorted(REPORT_WRITERS),
+                             help="report format, can be repeated (default: html)")
+    scan_parser.add_argument('--incremental', action='store_true',
+                             help="only analyze files changed since the last scan of this folder")
+    scan_parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                             help="probe every file again instead of reusing cached results")
+    scan_parser.add_argument('--exiftool-mode', choices=['session', 'batch'], default=DEFAULT_EXIFTOOL_MODE,
+                             help=f"how exiftool is run (default: {DEFAULT_EXIFTOOL_MODE})")
+    scan_parser.add_argument('-q', '--quiet', action='store_true', help="don't print progress")
+    return parser
+
+
+def get_report_paths(directory, output, formats):
+    """Map each report format to its output path ('-' for stdout)"""
+    if output == '-':
+        return {formats[0]: '-'}
+    if output is None:
+        base_path = Path(directory) / DEFAULT_REPORT_NAME
+        return {report_format: base_path.with_suffix(f'.{report_format}') for report_format in formats}
+    if len(formats) == 1:
+        return {formats[0]: Path(output)}
+    return {report_format: Path(output).with_suffix(f'.{report_format}') for report_format in formats}
+
+
+def format_backend_stats(stats):
+    """One line per router: calls, hits and time of each backend used"""
+    lines = []
+    for router_name, label in (('stream', '视频流'), ('iso', 'ISO')):
+        parts = []
+        for name, counters in stats[router_name].items():
+            calls = counters['hits'] + counters['misses'] + counters['errors']
+            if calls:
+                parts.append(f"{name} {counters['hits']}/{calls} 命中 {counters['seconds']:.2f}s")
+        if parts:
+            lines.append(f"{label}探测: " + ", ".join(parts))
+    return lines
+
+
+def run_scan(args):
+    """Run the scan command, returns the exit code"""
+    directory = args.directory
+    formats = list(dict.fromkeys(args.formats or ['html']))
+    workers = args.workers
+    if workers is None:
+        workers = DEFAULT_ASYNC_CONCURRENCY if args.engine == 'asyncio' else DEFAULT_WORKERS
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    if not os.path.isdir(directory):
+        print(f"错误: 文件夹不存在: {directory}", file=sys.stderr)
+        return 1
+    if args.output == '-' and len(formats) > 1:
+        print("错误: 只能将一种格式的报告输出到 stdout", file=sys.stderr)
+        return 1
+
+    is_valid, error_msg = check_ffprobe()
+    if not is_valid:
+        print(f"错误: 未检测到 ffprobe，请确保已安装 FFmpeg。\n{error_msg}", file=sys.stderr)
+        return 1
+
+    def report_progress(done, total, file_path):
+        log(f"[{done}/{total} {done / total * 100:.1f}%] {file_path}")
+
+    # Only probe what the requested report formats show
+    planner = ProbePlanner(formats)
+    # Rows of the results as they come in, the statistics are counted from them
+    columns = ResultColumns()
+    cache = open_probe_cache() if args.use_cache else None
+    store = open_scan_snapshot_store()
+    try:
+        if args.incremental and store is not None:
+            results, statistics, changes = rescan_video_files(directory, store, workers=workers,
+                                                              progress_callback=report_progress, cache=cache,
+                                                              exiftool_mode=args.exiftool_mode, engine=args.engine,
+                                                              planner=planner, columns=columns)
+            if changes is None:
+                log("没有找到上次的扫描结果，已完整分析")
+            else:
+                log(f"新增 {len(changes['added'])} 个, 删除 {len(changes['removed'])} 个, "
+                    f"修改 {len(changes['modified'])} 个, 重命名 {len(changes['renamed'])} 个文件")
+        else:
+            sidecars = {}
+            entries = scan_video_files(directory, sidecars=sidecars)
+            log(f"找到 {len(entries)} 个视频文件，开始分析 (并发数: {workers}, {args.engine})...")
+            slots = analyze_video_file_slots([file_path for file_path, _ in entries], workers=workers,
+                                             progress_callback=report_progress,
+                                             exiftool_mode=args.exiftool_mode, cache=cache,
+                                             file_stats=[stat for _, stat in entries], engine=args.engine,
+                                             sidecars=sidecars, planner=planner, columns=columns)
+            results = [result for result in slots if result]
+            statistics = compute_statistics(results, len(entries), columns)
+            if store is not None:
+                store.save(os.path.abspath(directory), entries, slots, statistics)
+    finally:
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+
+    if statistics['totalFiles'] == 0:
+        print("错误: 未找到视频文件", file=sys.stderr)
+        return 1
+
+    for report_format, report_path in get_report_paths(directory, args.output, formats).items():
+        if report_path == '-':
+            REPORT_WRITERS[report_format](results, statistics, directory, sys.stdout)
+            continue
+        try:
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            save_report(results, statistics, directory, report_path, report_format)
+        except OSError as e:
+            print(f"错误: 无法写入报告 {report_path}: {e}", file=sys.stderr)
+            return 1
+        log(f"报告已保存到: {report_path}")
+
+    log(f"分析完成！共 {statistics['totalFiles']} 个文件，成功分析 {len(results)} 个")
+    for line in format_backend_stats(get_backend_stats()):
+        log(line)
+    if planner.skipped['iso']:
+        log(f"跳过 {planner.skipped['iso']} 个报告中不显示的 ISO 探测")
+    return 0
+
+
+def main(argv=None):
+    """Command line entry point, returns the exit code"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'scan':
+        return run_scan(args)
+    return 2
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar store of analysis results, for statistics over whole libraries
+
+The classification inputs of the results are kept as typed arrays (array module),
+one per field, filled row by row as the results of a scan come in and patched in
+place by a rescan. The statistics (for the default or any other thresholds) are
+computed from the columns alone: with NumPy installed the columns are viewed as
+NumPy arrays without copying and classified with vectorized operations, without it
+in a single loop over the columns.
+"""
+from array import array
+from collections import namedtuple
+
+from .records import (
+    COLOR_CATEGORY_CODES, FRAMERATE_HIGH, FRAMERATE_HIGH_RANGE, FRAMERATE_LOW, FRAMERATE_LOW_BELOW,
+    FRAMERATE_NORMAL, FRAMERATE_NORMAL_RANGE, FRAMERATE_OTHER, FRAMERATE_UNKNOWN, RESOLUTION_1080P,
+    RESOLUTION_1080P_SIZE, RESOLUTION_4K, RESOLUTION_4K_SIZE, RESOLUTION_LOW,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+STATISTICS_COUNTERS = [
+    'lowResolutionCount', 'goodResolutionCount', 'excellentResolutionCount',
+    'lowFramerateCount', 'normalFramerateCount', 'highFramerateCount',
+    'hdrCount', 'otherColorSpaceCount'
+]
+
+# Counter of each resolution / frame rate level (levels without a counter are not counted)
+RESOLUTION_COUNTERS = {
+    RESOLUTION_LOW: 'lowResolutionCount',
+    RESOLUTION_1080P: 'goodResolutionCount',
+    RESOLUTION_4K: 'excellentResolutionCount',
+}
+FRAMERATE_COUNTERS = {
+    FRAMERATE_LOW: 'lowFramerateCount',
+    FRAMERATE_NORMAL: 'normalFramerateCount',
+    FRAMERATE_HIGH: 'highFramerateCount',
+}
+
+HDR_CODE = COLOR_CATEGORY_CODES['HDR']
+SDR_CODE = COLOR_CATEGORY_CODES['SDR']
+
+# Classification thresholds (see classify_resolution and classify_framerate)
+Thresholds = namedtuple('Thresholds', ['resolution_1080p', 'resolution_4k', 'framerate_low_below',
+                                       'framerate_high', 'framerate_normal'])
+DEFAULT_THRESHOLDS = Thresholds(RESOLUTION_1080P_SIZE, RESOLUTION_4K_SIZE, FRAMERATE_LOW_BELOW,
+                                FRAMERATE_HIGH_RANGE, FRAMERATE_NORMAL_RANGE)
+
+# Column name -> array typecode
+COLUMN_TYPES = {
+    'width': 'l',
+    'height': 'l',
+    'framerate': 'd',
+    'color_transfer': 'H',
+    'color_primaries': 'H',
+    'color_category': 'B',
+    'flags': 'B',
+    'iso': 'l',
+}
+
+
+def parse_iso(iso):
+    """ISO value as an int for the iso column, 0 when unknown or not a single number"""
+    if isinstance(iso, int):
+        return iso
+    return int(iso) if isinstance(iso, str) and iso.isdigit() else 0
+
+
+class ResultColumns:
+    """
+    Classification inputs of analysis results, one array per field (COLUMN_TYPES):
+    width, height, framerate, color_transfer / color_primaries (codes of the values
+    in self.values, 0 for none), color_category (COLOR_CATEGORY_CODES), flags, iso.
+    Rows added with a key (the file path) can be replaced, renamed and removed by key.
+    """
+
+    def __init__(self, results=()):
+        for name, typecode in COLUMN_TYPES.items():
+            setattr(self, name, array(typecode))
+        self.values = [None]
+        self.value_codes = {None: 0}
+        self.keys = []
+        self.rows = {}
+        self.extend(results)
+
+    def __len__(self):
+        return len(self.width)
+
+    def value_code(self, value):
+        """Code of a colour field value in the transfer/primaries columns"""
+        code = self.value_codes.get(value)
+        if code is None:
+            code = self.value_codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def row_values(self, result):
+        """The column values of a VideoResult, in the order of COLUMN_TYPES"""
+        return (result.width, result.height, result.framerate, self.value_code(result.color_transfer),
+                self.value_code(result.color_primaries), result.color_category, result.flags,
+                parse_iso(result.iso))
+
+    def append(self, result, key=None):
+        """Add one VideoResult as a new row, returns its row index"""
+        for name, value in zip(COLUMN_TYPES, self.row_values(result)):
+            getattr(self, name).append(value)
+        self.keys.append(key)
+        if key is not None:
+            self.rows[key] = len(self.keys) - 1
+        return len(self.keys) - 1
+
+    def extend(self, results):
+        """Add VideoResults, skipping empty slots"""
+        for result in results:
+            if result:
+                self.append(result)
+
+    def set(self, key, result):
+        """Store the result of key: replaces its row, adds one, or removes it when result is None"""
+        row = self.rows.get(key)
+        if result is None:
+            if row is not None:
+                self.remove(key)
+        elif row is None:
+            self.append(result, key)
+        else:
+            for name, value in zip(COLUMN_TYPES, self.row_values(result)):
+                getattr(self, name)[row] = value
+
+    def remove(self, key):
+        """Remove the row of key, moving the last row into its place"""
+        row = self.rows.pop(key)
+        last = len(self.keys) - 1
+        if row != last:
+            for name in COLUMN_TYPES:
+                column = getattr(self, name)
+                column[row] = column[last]
+            moved_key = self.keys[row] = self.keys[last]
+            if moved_key is not None:
+                self.rows[moved_key] = row
+        for name in COLUMN_TYPES:
+            getattr(self, name).pop()
+        self.keys.pop()
+
+    def rename(self, old_key, new_key):
+        """Move the row of old_key to new_key"""
+        row = self.rows.pop(old_key)
+        self.keys[row] = new_key
+        self.rows[new_key] = row
+
+    def column(self, name):
+        """A column as a NumPy array sharing its memory (the array itself without NumPy)"""
+        data = getattr(self, name)
+        return numpy.frombuffer(data, dtype=data.typecode) if numpy is not None else data
+
+    def count_values(self, name):
+        """{value: number of rows} of a column, colour fields by their value"""
+        counts = {}
+        for code in getattr(self, name):
+            counts[code] = counts.get(code, 0) + 1
+        if name in ('color_transfer', 'color_primaries'):
+            return {self.values[code]: count for code, count in counts.items()}
+        return counts
+
+    def resolution_levels(self, thresholds=DEFAULT_THRESHOLDS):
+        """Resolution level of every row as a NumPy array (see classify_resolution)"""
+        width, height = self.column('width'), self.column('height')
+        effective_width = numpy.maximum(width, height)
+        effective_height = numpy.minimum(width, height)
+        low = ((effective_width < thresholds.resolution_1080p[0])
+               | (effective_height < thresholds.resolution_1080p[1]))
+        uhd = (effective_width >= thresholds.resolution_4k[0]) & (effective_height >= thresholds.resolution_4k[1])
+        return numpy.select([low, uhd], [RESOLUTION_LOW, RESOLUTION_4K], RESOLUTION_1080P)
+
+    def framerate_levels(self, thresholds=DEFAULT_THRESHOLDS):
+        """Frame rate level of every row as a NumPy array (see classify_framerate)"""
+        framerate = self.column('framerate')
+        high, normal = thresholds.framerate_high, thresholds.framerate_normal
+        return numpy.select([
+            framerate == 0,
+            framerate < thresholds.framerate_low_below,
+            (framerate >= high[0]) & (framerate <= high[1]),
+            (framerate >= normal[0]) & (framerate <= normal[1]),
+        ], [FRAMERATE_UNKNOWN, FRAMERATE_LOW, FRAMERATE_HIGH, FRAMERATE_NORMAL], FRAMERATE_OTHER)
+
+    def count_statistics(self, thresholds=DEFAULT_THRESHOLDS):
+        """The STATISTICS_COUNTERS of the rows, classified with thresholds"""
+        if numpy is None or not len(self):
+            return self.count_statistics_loop(thresholds)
+        statistics = dict.fromkeys(STATISTICS_COUNTERS, 0)
+        resolution_counts = numpy.bincount(self.resolution_levels(thresholds), minlength=len(RESOLUTION_COUNTERS))
+        for level, counter in RESOLUTION_COUNTERS.items():
+            statistics[counter] = int(resolution_counts[level])
+        framerate_counts = numpy.bincount(self.framerate_levels(thresholds), minlength=FRAMERATE_OTHER + 1)
+        for level, counter in FRAMERATE_COUNTERS.items():
+            statistics[counter] = int(framerate_counts[level])
+        categories = numpy.bincount(self.column('color_category'), minlength=len(COLOR_CATEGORY_CODES))
+        statistics['hdrCount'] = int(categories[HDR_CODE])
+        statistics['otherColorSpaceCount'] = len(self) - statistics['hdrCount'] - int(categories[SDR_CODE])
+        return statistics
+
+    def count_statistics_loop(self, thresholds=DEFAULT_THRESHOLDS):
+        """count_statistics without NumPy: one pass over the columns"""
+        min_width, min_height = thresholds.resolution_1080p
+        uhd_width, uhd_height = thresholds.resolution_4k
+        low_below = thresholds.framerate_low_below
+        high_min, high_max = thresholds.framerate_high
+        normal_min, normal_max = thresholds.framerate_normal
+        low_resolution = uhd = low_framerate = high_framerate = normal_framerate = hdr = sdr = 0
+        for width, height, framerate, category in zip(self.width, self.height, self.framerate,
+                                                      self.color_category):
+            if width < height:
+                width, height = height, width
+            if width < min_width or height < min_height:
+                low_resolution += 1
+            elif width >= uhd_width and height >= uhd_height:
+                uhd += 1
+            if framerate == 0:
+                pass
+            elif framerate < low_below:
+                low_framerate += 1
+            elif high_min <= framerate <= high_max:
+                high_framerate += 1
+            elif normal_min <= framerate <= normal_max:
+                normal_framerate += 1
+            if category == HDR_CODE:
+                hdr += 1
+            elif category == SDR_CODE:
+                sdr += 1
+        return {
+            'lowResolutionCount': low_resolution,
+            'goodResolutionCount': len(self) - low_resolution - uhd,
+            'excellentResolutionCount': uhd,
+            'lowFramerateCount': low_framerate,
+            'normalFramerateCount': normal_framerate,
+            'highFramerateCount': high_framerate,
+            'hdrCount': hdr,
+            'otherColorSpaceCount': len(self) - hdr - sdr,
+        }
+
+
+def compute_percentages(statistics):
+    """Share of totalFiles of every counter, in percent rounded to 0.1 (0 without files)"""
+    total = statistics['totalFiles']
+    return {counter: round(value / total * 100, 1) if total > 0 else 0
+            for counter, value in statistics.items() if counter != 'totalFiles'}
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+In-process probing with PyAV (libavformat/libavcodec bindings), when installed
+
+The file is opened and its stream info found exactly as ffprobe does it, without
+spawning a process. Only what PyAV exposes can be read: a stream with side data
+other than a display matrix (or, with PyAV 14 and later, any stream) is left to
+ffprobe when it may be a DOVI configuration.
+"""
+from fractions import Fraction
+
+from .native.colorspace import set_color_fields
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+# Side data PyAV decodes (Stream.side_data key -> side_data_type printed by ffprobe)
+KNOWN_SIDE_DATA = {'DISPLAYMATRIX': 'Display Matrix'}
+
+# Codecs a Dolby Vision configuration can come with (profiles 5/7/8 HEVC, 9 AVC, 10 AV1)
+DOVI_CODECS = {'hevc', 'h264', 'av1'}
+
+
+def is_available():
+    """Whether PyAV can be imported"""
+    return av is not None
+
+
+def format_fourcc(tag):
+    """Codec tag as av_fourcc2str prints it: printable characters as is, the others as [n]"""
+    return ''.join(c if c.isascii() and (c.isalnum() or c in ' .-_') else f'[{ord(c)}]' for c in tag)
+
+
+def format_frame_rate(rate):
+    """r_frame_rate as ffprobe prints it, 0/0 when unknown"""
+    if not rate:
+        return '0/0'
+    rate = Fraction(rate)
+    return f'{rate.numerator}/{rate.denominator}'
+
+
+def can_carry_dovi(codec_name):
+    """Whether a stream of codec_name may have a DOVI configuration in its side data"""
+    return codec_name in DOVI_CODECS
+
+
+def get_side_data_list(stream, codec_name):
+    """
+    side_data_list entries of stream, or None when PyAV hides some of them and
+    one could be a DOVI configuration. PyAV 14 and later don't expose the side data
+    at all: only codecs without Dolby Vision can be answered then.
+    """
+    side_data = getattr(stream, 'side_data', None)
+    nb_side_data = getattr(stream, 'nb_side_data', None)
+    if side_data is None or nb_side_data is None:
+        return None if can_carry_dovi(codec_name) else []
+    known = [key for key in side_data if key in KNOWN_SIDE_DATA]
+    if nb_side_data != len(known) and can_carry_dovi(codec_name):
+        return None
+    return [{'side_data_type': KNOWN_SIDE_DATA[key]} for key in known]
+
+
+def probe_stream(file_path, timeout=None):
+    """
+    Read the first video stream of file_path with PyAV.
+    Returns a dict with the keys ffprobe returns for FFPROBE_STREAM_ENTRIES, or None
+    when the file has no video stream or PyAV doesn't expose all the fields.
+    Raises the av errors of files that can't be opened.
+    """
+    with av.open(str(file_path), timeout=timeout) as container:
+        if not container.streams.video:
+            return None
+        stream = container.streams.video[0]
+        context = stream.codec_context
+        if context is None or context.codec is None:
+            return None
+
+        side_data_list = get_side_data_list(stream, context.codec.canonical_name)
+        colors = [getattr(context, name, None) for name in ('color_primaries', 'color_trc', 'colorspace')]
+        if side_data_list is None or None in colors:
+            return None
+
+        result = {
+            'codec_name': context.codec.canonical_name,
+            'codec_tag_string': format_fourcc(context.codec_tag),
+            'width': context.width,
+            'height': context.height,
+            'r_frame_rate': format_frame_rate(stream.base_rate),
+        }
+        if context.pix_fmt:
+            result['pix_fmt'] = context.pix_fmt
+        if not set_color_fields(result, *(int(code) for code in colors)):
+            return None
+        if side_data_list:
+            result['side_data_list'] = side_data_list
+        return result
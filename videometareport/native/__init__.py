@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Native (pure Python) header readers
+
+They return the same stream dict as ffprobe for the files they understand, saving
+a process spawn per file. Anything they are not sure about is left to ffprobe.
+"""
+import os
+
+from . import elementary, isobmff, matroska, mpegts, mxf, r3d
+from .sidecar import read_sidecar_iso_metadata
+
+
+# File extension -> reader returning an ffprobe-like stream dict or None
+NATIVE_READERS = {
+    '.mp4': isobmff.read_stream_info,
+    '.m4v': isobmff.read_stream_info,
+    '.mov': isobmff.read_stream_info,
+    '.qt': isobmff.read_stream_info,
+    '.3gp': isobmff.read_stream_info,
+    '.f4v': isobmff.read_stream_info,
+    '.mkv': matroska.read_stream_info,
+    '.webm': matroska.read_stream_info,
+    '.ts': mpegts.read_stream_info,
+    '.mts': mpegts.read_stream_info,
+    '.m2ts': mpegts.read_stream_info,
+    '.mxf': mxf.read_stream_info,
+    '.h264': elementary.read_h264_stream_info,
+    '.264': elementary.read_h264_stream_info,
+    '.hevc': elementary.read_hevc_stream_info,
+    '.265': elementary.read_hevc_stream_info,
+    # Camera RAW
+    '.crm': isobmff.read_raw_stream_info,
+    '.nev': isobmff.read_raw_stream_info,
+    '.r3d': r3d.read_stream_info,
+}
+
+
+# Header signatures (offset, bytes) -> reader, for files whose extension has no reader
+NATIVE_MAGIC = [
+    (4, b'ftyp', isobmff.read_stream_info),
+    (0, b'\x1a\x45\xdf\xa3', matroska.read_stream_info),
+    (0, mxf.PARTITION_PACK_KEY[:12], mxf.read_stream_info),
+    (4, b'RED1', r3d.read_stream_info),
+    (4, b'RED2', r3d.read_stream_info),
+]
+# Bytes of the header compared with NATIVE_MAGIC
+MAGIC_SIZE = 16
+
+
+# File extension -> reader returning the ISO tags of the camera metadata, or None
+ISO_READERS = {
+    '.mp4': isobmff.read_iso_metadata,
+    '.m4v': isobmff.read_iso_metadata,
+    '.mov': isobmff.read_iso_metadata,
+    '.qt': isobmff.read_iso_metadata,
+    '.crm': isobmff.read_iso_metadata,
+    '.nev': isobmff.read_iso_metadata,
+    '.r3d': r3d.read_iso_metadata,
+}
+
+
+def get_native_reader(file_path, header=None):
+    """Reader for file_path: by extension, else by matching header (its first bytes) with NATIVE_MAGIC"""
+    reader = NATIVE_READERS.get(os.path.splitext(str(file_path))[1].lower())
+    if reader is None and header:
+        for offset, signature, magic_reader in NATIVE_MAGIC:
+            if header[offset:offset + len(signature)] == signature:
+                return magic_reader
+    return reader
+
+
+def probe_native_stream(file_path, header=None):
+    """
+    Read the first video stream of file_path without ffprobe.
+    header: optional first bytes of the file, to recognise formats with an unexpected extension
+    Returns None when there is no reader for the format or the reader isn't confident.
+    """
+    reader = get_native_reader(file_path, header)
+    if reader is None:
+        return None
+    try:
+        return reader(file_path)
+    except Exception:
+        # Damaged or unusual file, ffprobe will tell
+        return None
+
+
+def probe_native_iso_metadata(file_path):
+    """
+    ISO tags of file_path read without exiftool, named as exiftool names them
+    (pass them to tools.get_iso_from_metadata). Returns None when nothing was found.
+    """
+    reader = ISO_READERS.get(os.path.splitext(str(file_path))[1].lower())
+    if reader is None:
+        return None
+    try:
+        return reader(file_path)
+    except Exception:
+        return None
+
+
+def probe_sidecar_iso_metadata(sidecar_path):
+    """ISO tags of a camera sidecar file (clip XML, .THM, .xmp), like probe_native_iso_metadata"""
+    try:
+        return read_sidecar_iso_metadata(sidecar_path)
+    except Exception:
+        return None
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Colour and pixel format names, as ffprobe prints them
+
+The codes are the ISO/IEC 23091-2 (H.273) ones shared by the colr box, the H.264/HEVC
+VUI, Matroska Colour elements, ProRes frame headers, etc.
+"""
+
+# Code 2 is 'unspecified' everywhere, ffprobe leaves the field out
+UNSPECIFIED = 2
+
+COLOR_PRIMARIES = {
+    1: 'bt709', 4: 'bt470m', 5: 'bt470bg', 6: 'smpte170m', 7: 'smpte240m', 8: 'film',
+    9: 'bt2020', 10: 'smpte428', 11: 'smpte431', 12: 'smpte432', 22: 'ebu3213',
+}
+
+COLOR_TRANSFERS = {
+    1: 'bt709', 4: 'gamma22', 5: 'gamma28', 6: 'smpte170m', 7: 'smpte240m', 8: 'linear',
+    9: 'log100', 10: 'log316', 11: 'iec61966-2-4', 12: 'bt1361e', 13: 'iec61966-2-1',
+    14: 'bt2020-10', 15: 'bt2020-12', 16: 'smpte2084', 17: 'smpte428', 18: 'arib-std-b67',
+}
+
+COLOR_SPACES = {
+    0: 'gbr', 1: 'bt709', 4: 'fcc', 5: 'bt470bg', 6: 'smpte170m', 7: 'smpte240m', 8: 'ycgco',
+    9: 'bt2020nc', 10: 'bt2020c', 11: 'smpte2085', 12: 'chroma-derived-nc', 13: 'chroma-derived-c',
+    14: 'ictcp',
+}
+
+# chroma_format_idc as used by H.264/HEVC
+CHROMA_FORMATS = {0: 'gray', 1: 'yuv420p', 2: 'yuv422p', 3: 'yuv444p'}
+
+
+def set_color_fields(stream, primaries, transfer, matrix):
+    """
+    Store the colour codes in stream under ffprobe's keys, skipping unspecified ones.
+    Returns False if a code is reserved/unknown, in which case ffprobe's output can't be predicted.
+    """
+    for key, code, names in (('color_primaries', primaries, COLOR_PRIMARIES),
+                             ('color_transfer', transfer, COLOR_TRANSFERS),
+                             ('color_space', matrix, COLOR_SPACES)):
+        if code is None or code == UNSPECIFIED:
+            stream.pop(key, None)
+        elif code in names:
+            stream[key] = names[code]
+        else:
+            return False
+    return True
+
+
+def get_pix_fmt(chroma_format, bit_depth, alpha=False, full_range=False):
+    """
+    ffmpeg pixel format name for a planar YUV layout, e.g. (1, 10) -> 'yuv420p10le'.
+    full_range gives the (8 bit only) yuvj formats the H.264 decoder reports.
+    Returns None for layouts ffmpeg has no name for.
+    """
+    base = CHROMA_FORMATS.get(chroma_format)
+    if base is None or bit_depth not in (8, 9, 10, 12, 14, 16):
+        return None
+    if chroma_format == 0:
+        return 'gray' if bit_depth == 8 else f'gray{bit_depth}le'
+    if alpha:
+        base = base.replace('yuv', 'yuva')
+    if bit_depth == 8:
+        if full_range and not alpha:
+            return base.replace('yuv', 'yuvj')
+        return base
+    return f'{base}{bit_depth}le'
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Dolby Vision configuration, in the shape of ffprobe's DOVI side data
+
+ffprobe only reports Dolby Vision when the container carries a configuration record
+(dvcC/dvvC/dvwC boxes, Matroska block addition mappings, the TS descriptor); RPU NAL
+units in the video stream alone don't produce side data, so they are not looked for.
+"""
+import struct
+
+DOVI_SIDE_DATA_TYPE = 'DOVI configuration record'
+
+
+def get_dovi_side_data(version_major, version_minor, profile, level, rpu_present, el_present, bl_present,
+                       bl_signal_compatibility_id=0, md_compression=0):
+    """side_data_list entry ffprobe prints for a Dolby Vision configuration"""
+    return {
+        'side_data_type': DOVI_SIDE_DATA_TYPE,
+        'dv_version_major': version_major,
+        'dv_version_minor': version_minor,
+        'dv_profile': profile,
+        'dv_level': level,
+        'rpu_present_flag': rpu_present,
+        'el_present_flag': el_present,
+        'bl_present_flag': bl_present,
+        'dv_bl_signal_compatibility_id': bl_signal_compatibility_id,
+        'dv_md_compression': md_compression,
+    }
+
+
+def parse_dovi_config_record(data):
+    """DOVIDecoderConfigurationRecord (dvcC/dvvC/dvwC payload) -> DOVI side data, or None if too short"""
+    if len(data) < 4:
+        return None
+    version_major, version_minor, flags = struct.unpack_from('>BBH', data)
+    bl_signal_compatibility_id = md_compression = 0
+    if len(data) >= 5:
+        bl_signal_compatibility_id = (data[4] >> 4) & 0x0f
+        md_compression = (data[4] >> 2) & 0x03
+    return get_dovi_side_data(version_major, version_minor, (flags >> 9) & 0x7f, (flags >> 3) & 0x3f,
+                              (flags >> 2) & 0x01, (flags >> 1) & 0x01, flags & 0x01,
+                              bl_signal_compatibility_id, md_compression)
+
+
+def parse_dovi_descriptor(data):
+    """MPEG-TS Dolby Vision video stream descriptor -> DOVI side data, the way ffmpeg reads it"""
+    if len(data) < 4:
+        return None
+    # Without a base layer, a dependency_pid comes before the compatibility id
+    if not data[3] & 0x01 and len(data) >= 6:
+        data = data[:4] + data[6:]
+    return parse_dovi_config_record(data)
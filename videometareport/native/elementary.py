@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Raw H.264/HEVC elementary stream (Annex B) reader
+
+There is no container, everything comes from the first SPS. ffprobe's raw demuxer
+times the stream with the VUI frame rate (25 fps without one), which the
+parameter set gives us as well.
+"""
+from .h26x import is_first_slice, is_sps, iter_nal_units, parse_sps, set_sps_fields
+from .rational import av_reduce, format_rational
+
+READ_CHUNK_SIZE = 512 * 1024
+MAX_READ_SIZE = 4 * 1024 * 1024
+
+# Frame rate the raw demuxers assume when the stream doesn't signal one
+DEFAULT_FRAME_RATE = (25, 1)
+
+# Time base of the raw demuxers; the frame duration must be exact in it for the
+# r_frame_rate estimate to land on the frame rate
+RAW_TIME_BASE = 1200000
+
+# ffmpeg needs more than 15 frame durations to settle r_frame_rate
+MIN_PICTURE_COUNT = 17
+
+# Stream has no fourcc
+CODEC_TAG_STRING = '[0][0][0][0]'
+
+
+def scan_nal_units(codec_name, data, sps, picture_count):
+    """Look for the first SPS and count the pictures after it in Annex B data, returns the updated (sps, picture_count)"""
+    for nal in iter_nal_units(data):
+        if sps is None and is_sps(codec_name, nal):
+            try:
+                sps = parse_sps(codec_name, nal)
+            except ValueError:
+                # Cut off at the end of what was read
+                continue
+        elif sps is not None and is_first_slice(codec_name, nal):
+            picture_count += 1
+    return sps, picture_count
+
+
+def read_stream_info(file_path, codec_name):
+    """
+    Read an H.264 (codec_name 'h264') or HEVC ('hevc') elementary stream.
+    Returns a dict with the keys ffprobe returns for FFPROBE_STREAM_ENTRIES, or None
+    when the file can't be read or ffprobe's answer can't be predicted with confidence.
+    """
+    sps = None
+    picture_count = 0
+    read_size = 0
+    # Bytes from the start code of the last NAL unit on, which the next chunk may continue
+    pending = bytearray()
+    with open(file_path, 'rb') as f:
+        while read_size < MAX_READ_SIZE and picture_count < MIN_PICTURE_COUNT:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if not read_size:
+                # Must start with a start code (possibly after some zero bytes)
+                first_start_code = chunk.find(b'\x00\x00\x01')
+                if first_start_code < 0 or chunk[:first_start_code].strip(b'\x00'):
+                    return None
+                pending += chunk[first_start_code:]
+                scan_start = 1
+            else:
+                # A start code split between chunks leaves two of its bytes in pending
+                scan_start = len(pending) - 2
+                pending += chunk
+            read_size += len(chunk)
+            last_start_code = pending.rfind(b'\x00\x00\x01', scan_start)
+            if last_start_code < 0:
+                continue
+            # Up to and including the next start code, so the complete NAL units end as in the whole stream
+            sps, picture_count = scan_nal_units(codec_name, bytes(pending[:last_start_code + 3]), sps, picture_count)
+            del pending[:last_start_code]
+    # The last NAL unit read, possibly truncated
+    sps, picture_count = scan_nal_units(codec_name, bytes(pending), sps, picture_count)
+
+    if sps is None or picture_count < MIN_PICTURE_COUNT or sps['interlaced']:
+        return None
+
+    if 'frame_rate' in sps:
+        frame_rate = av_reduce(*sps['frame_rate'], 1 << 30)
+    elif codec_name == 'h264':
+        frame_rate = DEFAULT_FRAME_RATE
+    else:
+        # The HEVC parser may take it from the VPS instead
+        return None
+    if RAW_TIME_BASE * frame_rate[1] % frame_rate[0]:
+        return None
+
+    stream = {
+        'r_frame_rate': format_rational(*frame_rate),
+        'codec_name': codec_name,
+        'codec_tag_string': CODEC_TAG_STRING,
+    }
+    if not set_sps_fields(stream, codec_name, sps):
+        return None
+    return stream
+
+
+def read_h264_stream_info(file_path):
+    return read_stream_info(file_path, 'h264')
+
+
+def read_hevc_stream_info(file_path):
+    return read_stream_info(file_path, 'hevc')
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+ISO tags from Exif (TIFF) and XMP metadata blocks embedded by cameras
+
+The tags are returned under the names exiftool gives them (see tools.EXIFTOOL_ISO_TAGS),
+with the values exiftool -json would print, so tools.get_iso_from_metadata picks the same one.
+"""
+import re
+import struct
+import xml.etree.ElementTree as ElementTree
+
+# Exif tag id -> exiftool tag name
+EXIF_ISO_TAGS = {
+    0x8827: 'ISO',
+    0x8832: 'RecommendedExposureIndex',
+}
+EXIF_IFD_POINTER = 0x8769
+
+# TIFF field type -> (struct format, size) for the integer types ISO tags use
+TIFF_INTEGER_TYPES = {3: ('H', 2), 4: ('I', 4)}
+
+TIFF_HEADERS = (b'II*\x00', b'MM\x00*')
+
+# Entries read from an IFD before giving up on it
+MAX_IFD_ENTRIES = 512
+# ISO tags hold one value (a few for some cameras), longer arrays are other tags
+MAX_VALUE_COUNT = 16
+
+# Nikon NCTG entries carry the Exif tags with this prefix added to the tag id
+NCTG_EXIF_PREFIX = 0x1100000
+# TIFF field type -> size, to step over the NCTG entries
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_APP1 = 0xE1
+JPEG_SOS = 0xDA
+EXIF_HEADER = b'Exif\x00\x00'
+
+# XMP property (namespace, name) -> exiftool tag name
+XMP_NAMESPACES = {
+    'exif': 'http://ns.adobe.com/exif/1.0/',
+    'exifEX': 'http://cipa.jp/exif/1.0/',
+}
+XMP_ISO_TAGS = {
+    '{%s}ISOSpeedRatings' % XMP_NAMESPACES['exif']: 'ISO',
+    '{%s}RecommendedExposureIndex' % XMP_NAMESPACES['exifEX']: 'RecommendedExposureIndex',
+}
+RDF_LI = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}li'
+XMP_PACKET_RE = re.compile(rb'<x:xmpmeta[\s>].*?</x:xmpmeta>', re.DOTALL)
+
+
+def read_ifd(data, start, offset, endian, tags):
+    """Add the ISO tags of the IFD at offset to tags, returns the Exif IFD offset or None"""
+    count, = struct.unpack_from(endian + 'H', data, start + offset)
+    if count > MAX_IFD_ENTRIES:
+        raise ValueError("Invalid IFD entry count")
+    exif_ifd = None
+    for pos in range(start + offset + 2, start + offset + 2 + count * 12, 12):
+        tag, field_type, value_count = struct.unpack_from(endian + 'HHI', data, pos)
+        if field_type not in TIFF_INTEGER_TYPES or not 0 < value_count <= MAX_VALUE_COUNT:
+            continue
+        fmt, size = TIFF_INTEGER_TYPES[field_type]
+        value_pos = pos + 8
+        if value_count * size > 4:
+            value_pos = start + struct.unpack_from(endian + 'I', data, pos + 8)[0]
+        values = struct.unpack_from(f'{endian}{value_count}{fmt}', data, value_pos)
+        if tag == EXIF_IFD_POINTER:
+            exif_ifd = values[0]
+        elif tag in EXIF_ISO_TAGS and values:
+            # exiftool prints a list of values separated by spaces
+            tags.setdefault(EXIF_ISO_TAGS[tag], values[0] if len(values) == 1 else ' '.join(map(str, values)))
+    return exif_ifd
+
+
+def read_tiff_iso_tags(data, start=0):
+    """ISO tags of the TIFF structure at data[start:] (IFD0 and its Exif IFD): {tag name: value}"""
+    header = data[start:start + 4]
+    if header not in TIFF_HEADERS:
+        raise ValueError("Not a TIFF header")
+    endian = '<' if header == TIFF_HEADERS[0] else '>'
+    ifd0, = struct.unpack_from(endian + 'I', data, start + 4)
+    tags = {}
+    exif_ifd = read_ifd(data, start, ifd0, endian, tags)
+    if exif_ifd is not None and exif_ifd != ifd0:
+        read_ifd(data, start, exif_ifd, endian, tags)
+    return tags
+
+
+def find_tiff_iso_tags(data):
+    """ISO tags of the first valid TIFF structure found anywhere in data, or None"""
+    for header in TIFF_HEADERS:
+        pos = data.find(header)
+        while pos >= 0:
+            try:
+                return read_tiff_iso_tags(data, pos)
+            except (ValueError, struct.error):
+                pos = data.find(header, pos + 1)
+    return None
+
+
+def read_nctg_iso_tags(data):
+    """ISO tags of a Nikon NCTG box (big endian tag, type, count entries)"""
+    tags = {}
+    pos = 0
+    while pos + 8 <= len(data):
+        tag, field_type, value_count = struct.unpack_from('>IHH', data, pos)
+        pos += 8
+        if field_type not in TIFF_TYPE_SIZES:
+            break
+        size = TIFF_TYPE_SIZES[field_type] * value_count
+        name = EXIF_ISO_TAGS.get(tag - NCTG_EXIF_PREFIX)
+        if name is not None and field_type in TIFF_INTEGER_TYPES and 0 < value_count <= MAX_VALUE_COUNT:
+            fmt = TIFF_INTEGER_TYPES[field_type][0]
+            values = struct.unpack_from(f'>{value_count}{fmt}', data, pos)
+            tags.setdefault(name, values[0] if len(values) == 1 else ' '.join(map(str, values)))
+        pos += size
+    return tags
+
+
+def read_jpeg_iso_tags(data):
+    """ISO tags of the Exif APP1 segment of a JPEG image, or None"""
+    if data[:2] != JPEG_SOI:
+        return None
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xff:
+        marker = data[pos + 1]
+        if marker == JPEG_SOS:
+            break
+        length, = struct.unpack_from('>H', data, pos + 2)
+        segment = data[pos + 4:pos + 2 + length]
+        if marker == JPEG_APP1 and segment.startswith(EXIF_HEADER):
+            return read_tiff_iso_tags(segment, len(EXIF_HEADER))
+        pos += 2 + length
+    return None
+
+
+def read_xmp_iso_tags(data):
+    """
+    ISO tags of an XMP packet, or None. A property holding several values
+    (which exiftool would print as a list) makes the whole packet None.
+    """
+    match = XMP_PACKET_RE.search(data)
+    if match is None:
+        return None
+    try:
+        root = ElementTree.fromstring(match.group(0))
+    except ElementTree.ParseError:
+        return None
+    tags = {}
+    for element in root.iter():
+        # Simple properties can be written as attributes of rdf:Description
+        values = {name: [value] for name, value in element.attrib.items() if name in XMP_ISO_TAGS}
+        if element.tag in XMP_ISO_TAGS:
+            items = [item.text for item in element.iter(RDF_LI)]
+            values[element.tag] = items if items else [element.text]
+        for name, items in values.items():
+            items = [(item or '').strip() for item in items]
+            if len(items) != 1:
+                return None
+            # exiftool -json prints numbers as numbers
+            tags.setdefault(XMP_ISO_TAGS[name], int(items[0]) if items[0].isdigit() else items[0])
+    return tags
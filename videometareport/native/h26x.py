@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+H.264/HEVC parameter set parsing
+
+Decodes the SPS (and its VUI) far enough to tell what the ffmpeg decoder reports:
+cropped size, chroma format, bit depth, colour description, range and timing.
+"""
+import struct
+
+from .colorspace import CHROMA_FORMATS, get_pix_fmt, set_color_fields
+
+H264_NAL_SPS = 7
+HEVC_NAL_SPS = 33
+
+# Coded slice NAL unit types (non-IDR and IDR for H.264, the VCL types in use for HEVC)
+H264_NAL_SLICES = {1, 5}
+HEVC_NAL_SLICES = set(range(0, 10)) | set(range(16, 22))
+
+# H.264 profiles with chroma_format_idc/bit depth/scaling matrices in the SPS
+H264_HIGH_PROFILES = {100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135}
+
+# (SubWidthC, SubHeightC) per chroma_format_idc
+CHROMA_SUBSAMPLING = {0: (1, 1), 1: (2, 2), 2: (2, 1), 3: (1, 1)}
+
+# Matrix coefficients code of RGB (GBR) streams, decoded to gbrp formats
+MATRIX_RGB = 0
+
+
+class BitReader:
+    """Big-endian bit reader with Exp-Golomb codes"""
+
+    def __init__(self, data):
+        self.value = int.from_bytes(data, 'big')
+        self.size = len(data) * 8
+        self.pos = 0
+
+    def read_bits(self, count):
+        """Read count bits as an unsigned integer"""
+        if self.pos + count > self.size:
+            raise ValueError("Read past the end of the parameter set")
+        self.pos += count
+        return (self.value >> (self.size - self.pos)) & ((1 << count) - 1)
+
+    def read_bit(self):
+        return self.read_bits(1)
+
+    def skip_bits(self, count):
+        self.read_bits(count)
+
+    def read_ue(self):
+        """Unsigned Exp-Golomb code"""
+        leading_zeros = 0
+        while not self.read_bit():
+            leading_zeros += 1
+            if leading_zeros > 31:
+                raise ValueError("Invalid Exp-Golomb code")
+        return (1 << leading_zeros) - 1 + self.read_bits(leading_zeros)
+
+    def read_se(self):
+        """Signed Exp-Golomb code"""
+        value = self.read_ue()
+        return (value + 1) // 2 if value % 2 else -(value // 2)
+
+
+def unescape_rbsp(data):
+    """Remove the emulation prevention bytes (00 00 03) of a NAL unit"""
+    if b'\x00\x00\x03' not in data:
+        return data
+    out = bytearray()
+    zeros = 0
+    for byte in data:
+        if zeros >= 2 and byte == 3:
+            zeros = 0
+            continue
+        out.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+    return bytes(out)
+
+
+def iter_nal_units(data):
+    """Yield the NAL units (header included) of an Annex B byte stream; the last one may be truncated"""
+    start = data.find(b'\x00\x00\x01')
+    while start != -1:
+        start += 3
+        end = data.find(b'\x00\x00\x01', start)
+        nal = data[start:end] if end != -1 else data[start:]
+        # A 4 byte start code leaves a trailing zero
+        yield nal.rstrip(b'\x00') if end != -1 else nal
+        start = end
+
+
+def get_avcc_sps(record):
+    """First SPS NAL unit of an avcC record (AVCDecoderConfigurationRecord), or None"""
+    if len(record) < 8 or not record[5] & 0x1f:
+        return None
+    length = struct.unpack_from('>H', record, 6)[0]
+    return record[8:8 + length] or None
+
+
+def get_hvcc_sps(record):
+    """First SPS NAL unit of an hvcC record (HEVCDecoderConfigurationRecord), or None"""
+    if len(record) < 23:
+        return None
+    pos = 23
+    for _ in range(record[22]):
+        nal_type = record[pos] & 0x3f
+        count = struct.unpack_from('>H', record, pos + 1)[0]
+        pos += 3
+        for _ in range(count):
+            length = struct.unpack_from('>H', record, pos)[0]
+            if nal_type == HEVC_NAL_SPS:
+                return record[pos + 2:pos + 2 + length]
+            pos += 2 + length
+    return None
+
+
+def h264_nal_type(nal):
+    return nal[0] & 0x1f
+
+
+def hevc_nal_type(nal):
+    return (nal[0] >> 1) & 0x3f
+
+
+def skip_h264_scaling_list(reader, size):
+    last_scale = next_scale = 8
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last_scale + reader.read_se() + 256) % 256
+        last_scale = next_scale or last_scale
+
+
+def read_video_signal_type(reader, sps):
+    """video_signal_type fields shared by the H.264 and HEVC VUI"""
+    if reader.read_bit():  # video_signal_type_present_flag
+        reader.skip_bits(3)  # video_format
+        sps['full_range'] = bool(reader.read_bit())
+        if reader.read_bit():  # colour_description_present_flag
+            sps['color_primaries'] = reader.read_bits(8)
+            sps['color_transfer'] = reader.read_bits(8)
+            sps['color_space'] = reader.read_bits(8)
+
+
+def skip_aspect_ratio_and_overscan(reader):
+    if reader.read_bit():  # aspect_ratio_info_present_flag
+        if reader.read_bits(8) == 255:  # Extended_SAR
+            reader.skip_bits(32)
+    if reader.read_bit():  # overscan_info_present_flag
+        reader.skip_bits(1)
+
+
+def parse_h264_sps(nal):
+    """
+    Decode an H.264 SPS NAL unit (header included).
+    Returns a dict with width, height, chroma_format, bit_depth, interlaced, full_range (None
+    unless signalled) and, when present in the VUI, color_primaries/color_transfer/color_space
+    codes and frame_rate (num, den).
+    """
+    reader = BitReader(unescape_rbsp(nal[1:]))
+    profile = reader.read_bits(8)
+    reader.skip_bits(16)  # constraint flags, level_idc
+    reader.read_ue()  # seq_parameter_set_id
+
+    chroma_format = 1
+    separate_colour_plane = False
+    bit_depth = 8
+    if profile in H264_HIGH_PROFILES:
+        chroma_format = reader.read_ue()
+        if chroma_format == 3:
+            separate_colour_plane = bool(reader.read_bit())
+        bit_depth = reader.read_ue() + 8
+        reader.read_ue()  # bit_depth_chroma_minus8
+        reader.skip_bits(1)  # qpprime_y_zero_transform_bypass_flag
+        if reader.read_bit():  # seq_scaling_matrix_present_flag
+            for i in range(8 if chroma_format != 3 else 12):
+                if reader.read_bit():
+                    skip_h264_scaling_list(reader, 16 if i < 6 else 64)
+
+    reader.read_ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = reader.read_ue()
+    if pic_order_cnt_type == 0:
+        reader.read_ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif pic_order_cnt_type == 1:
+        reader.skip_bits(1)  # delta_pic_order_always_zero_flag
+        reader.read_se()  # offset_for_non_ref_pic
+        reader.read_se()  # offset_for_top_to_bottom_field
+        for _ in range(reader.read_ue()):
+            reader.read_se()
+    reader.read_ue()  # max_num_ref_frames
+    reader.skip_bits(1)  # gaps_in_frame_num_value_allowed_flag
+    width_in_mbs = reader.read_ue() + 1
+    height_in_map_units = reader.read_ue() + 1
+    frame_mbs_only = reader.read_bit()
+    if not frame_mbs_only:
+        reader.skip_bits(1)  # mb_adaptive_frame_field_flag
+    reader.skip_bits(1)  # direct_8x8_inference_flag
+
+    width = width_in_mbs * 16
+    height = height_in_map_units * 16 * (2 - frame_mbs_only)
+    if reader.read_bit():  # frame_cropping_flag
+        crop_left, crop_right, crop_top, crop_bottom = (reader.read_ue() for _ in range(4))
+        if chroma_format == 0 or separate_colour_plane:
+            crop_unit_x, crop_unit_y = 1, 2 - frame_mbs_only
+        else:
+            sub_width, sub_height = CHROMA_SUBSAMPLING[chroma_format]
+            crop_unit_x, crop_unit_y = sub_width, sub_height * (2 - frame_mbs_only)
+        width -= crop_unit_x * (crop_left + crop_right)
+        height -= crop_unit_y * (crop_top + crop_bottom)
+
+    sps = {
+        'width': width,
+        'height': height,
+        'chroma_format': chroma_format,
+        'bit_depth': bit_depth,
+        'interlaced': not frame_mbs_only,
+        'full_range': None,
+    }
+
+    if reader.read_bit():  # vui_parameters_present_flag
+        skip_aspect_ratio_and_overscan(reader)
+        read_video_signal_type(reader, sps)
+        if reader.read_bit():  # chroma_loc_info_present_flag
+            reader.read_ue()
+            reader.read_ue()
+        if reader.read_bit():  # timing_info_present_flag
+            num_units_in_tick = reader.read_bits(32)
+            time_scale = reader.read_bits(32)
+            if num_units_in_tick and time_scale:
+                # Two ticks per frame
+                sps['frame_rate'] = (time_scale, num_units_in_tick * 2)
+
+    return sps
+
+
+def skip_hevc_profile_tier_level(reader, max_sub_layers_minus1):
+    reader.skip_bits(8 + 32 + 48 + 8)  # general profile, compatibility, constraint flags, level
+    sub_layer_flags = [(reader.read_bit(), reader.read_bit()) for _ in range(max_sub_layers_minus1)]
+    if max_sub_layers_minus1 > 0:
+        reader.skip_bits(2 * (8 - max_sub_layers_minus1))
+    for profile_present, level_present in sub_layer_flags:
+        if profile_present:
+            reader.skip_bits(88)
+        if level_present:
+            reader.skip_bits(8)
+
+
+def skip_hevc_scaling_list_data(reader):
+    for size_id in range(4):
+        for _ in range(0, 6, 3 if size_id == 3 else 1):
+            if not reader.read_bit():  # scaling_list_pred_mode_flag
+                reader.read_ue()  # scaling_list_pred_matrix_id_delta
+                continue
+            if size_id > 1:
+                reader.read_se()  # scaling_list_dc_coef_minus8
+            for _ in range(min(64, 1 << (4 + (size_id << 1)))):
+                reader.read_se()
+
+
+def skip_hevc_short_term_ref_pic_sets(reader):
+    num_delta_pocs = []
+    for idx in range(reader.read_ue()):
+        if idx and reader.read_bit():  # inter_ref_pic_set_prediction_flag
+            reader.skip_bits(1)  # delta_rps_sign
+            reader.read_ue()  # abs_delta_rps_minus1
+            count = 0
+            for _ in range(num_delta_pocs[idx - 1] + 1):
+                used_by_curr_pic = reader.read_bit()
+                use_delta = used_by_curr_pic or reader.read_bit()
+                count += use_delta
+            num_delta_pocs.append(count)
+        else:
+            num_negative = reader.read_ue()
+            num_positive = reader.read_ue()
+            for _ in range(num_negative + num_positive):
+                reader.read_ue()  # delta_poc_minus1
+                reader.skip_bits(1)  # used_by_curr_pic_flag
+            num_delta_pocs.append(num_negative + num_positive)
+
+
+def parse_hevc_sps(nal):
+    """
+    Decode an HEVC SPS NAL unit (header included).
+    Returns the same dict as parse_h264_sps.
+    """
+    reader = BitReader(unescape_rbsp(nal[2:]))
+    reader.skip_bits(4)  # sps_video_parameter_set_id
+    max_sub_layers_minus1 = reader.read_bits(3)
+    reader.skip_bits(1)  # sps_temporal_id_nesting_flag
+    skip_hevc_profile_tier_level(reader, max_sub_layers_minus1)
+    reader.read_ue()  # sps_seq_parameter_set_id
+
+    chroma_format = reader.read_ue()
+    if chroma_format == 3:
+        reader.skip_bits(1)  # separate_colour_plane_flag
+    width = reader.read_ue()
+    height = reader.read_ue()
+    if reader.read_bit():  # conformance_window_flag
+        crop_left, crop_right, crop_top, crop_bottom = (reader.read_ue() for _ in range(4))
+        sub_width, sub_height = CHROMA_SUBSAMPLING.get(chroma_format, (1, 1))
+        width -= sub_width * (crop_left + crop_right)
+        height -= sub_height * (crop_top + crop_bottom)
+    bit_depth = reader.read_ue() + 8
+    reader.read_ue()  # bit_depth_chroma_minus8
+    log2_max_poc_lsb = reader.read_ue() + 4
+
+    sub_layer_ordering_info_present = reader.read_bit()
+    for _ in range(0 if sub_layer_ordering_info_present else max_sub_layers_minus1, max_sub_layers_minus1 + 1):
+        reader.read_ue()  # sps_max_dec_pic_buffering_minus1
+        reader.read_ue()  # sps_max_num_reorder_pics
+        reader.read_ue()  # sps_max_latency_increase_plus1
+    for _ in range(6):
+        reader.read_ue()  # coding/transform block sizes, transform hierarchy depths
+    if reader.read_bit():  # scaling_list_enabled_flag
+        if reader.read_bit():  # sps_scaling_list_data_present_flag
+            skip_hevc_scaling_list_data(reader)
+    reader.skip_bits(2)  # amp_enabled_flag, sample_adaptive_offset_enabled_flag
+    if reader.read_bit():  # pcm_enabled_flag
+        reader.skip_bits(8)  # pcm sample bit depths
+        reader.read_ue()
+        reader.read_ue()
+        reader.skip_bits(1)  # pcm_loop_filter_disabled_flag
+    skip_hevc_short_term_ref_pic_sets(reader)
+    if reader.read_bit():  # long_term_ref_pics_present_flag
+        for _ in range(reader.read_ue()):
+            reader.skip_bits(log2_max_poc_lsb + 1)
+    reader.skip_bits(2)  # sps_temporal_mvp_enabled_flag, strong_intra_smoothing_enabled_flag
+
+    sps = {
+        'width': width,
+        'height': height,
+        'chroma_format': chroma_format,
+        'bit_depth': bit_depth,
+        'interlaced': False,
+        'full_range': None,
+    }
+
+    if reader.read_bit():  # vui_parameters_present_flag
+        skip_aspect_ratio_and_overscan(reader)
+        read_video_signal_type(reader, sps)
+        if reader.read_bit():  # chroma_loc_info_present_flag
+            reader.read_ue()
+            reader.read_ue()
+        reader.skip_bits(1)  # neutral_chroma_indication_flag
+        sps['interlaced'] = bool(reader.read_bit())  # field_seq_flag
+        reader.skip_bits(1)  # frame_field_info_present_flag
+        if reader.read_bit():  # default_display_window_flag
+            for _ in range(4):
+                reader.read_ue()
+        if reader.read_bit():  # vui_timing_info_present_flag
+            num_units_in_tick = reader.read_bits(32)
+            time_scale = reader.read_bits(32)
+            if num_units_in_tick and time_scale:
+                sps['frame_rate'] = (time_scale, num_units_in_tick)
+
+    return sps
+
+
+def parse_sps(codec_name, nal):
+    """parse_h264_sps or parse_hevc_sps depending on codec_name"""
+    if codec_name == 'h264':
+        return parse_h264_sps(nal)
+    return parse_hevc_sps(nal)
+
+
+def is_sps(codec_name, nal):
+    """Whether nal (header included) is a sequence parameter set"""
+    if not nal:
+        return False
+    if codec_name == 'h264':
+        return h264_nal_type(nal) == H264_NAL_SPS
+    return len(nal) > 2 and hevc_nal_type(nal) == HEVC_NAL_SPS
+
+
+def is_first_slice(codec_name, nal):
+    """Whether nal is the first slice of a picture, to count pictures"""
+    if codec_name == 'h264':
+        # first_mb_in_slice == 0 is coded as a single 1 bit
+        return len(nal) > 1 and h264_nal_type(nal) in H264_NAL_SLICES and bool(nal[1] & 0x80)
+    # first_slice_segment_in_pic_flag
+    return len(nal) > 2 and hevc_nal_type(nal) in HEVC_NAL_SLICES and bool(nal[2] & 0x80)
+
+
+def get_sps_pix_fmt(codec_name, sps, full_range=None):
+    """
+    pix_fmt the ffmpeg decoder picks for a parsed SPS, or None when unsure
+    (e.g. H.264 monochrome, which some builds decode as gray and others as yuv420p).
+    full_range: range signalled by the container, used by H.264 when the VUI has none
+    """
+    chroma_format = sps['chroma_format']
+    if chroma_format not in CHROMA_FORMATS or codec_name == 'h264' and chroma_format == 0:
+        return None
+    if sps.get('color_space') == MATRIX_RGB:
+        if chroma_format != 3:
+            return None
+        return 'gbrp' if sps['bit_depth'] == 8 else f"gbrp{sps['bit_depth']}le"
+    if sps['full_range'] is not None:
+        full_range = sps['full_range']
+    if codec_name == 'hevc':
+        # The HEVC decoder ignores the container, and only has a full range 8 bit 4:2:0
+        full_range = sps['full_range'] and chroma_format == 1
+    return get_pix_fmt(chroma_format, sps['bit_depth'], full_range=bool(full_range))
+
+
+def set_sps_fields(stream, codec_name, sps, full_range=None):
+    """
+    Set width, height, pix_fmt and the colours the decoder takes from the SPS: the H.264
+    decoder only overrides the container's colours when the VUI has a colour description,
+    the HEVC one always does.
+    Returns False when ffprobe's values can't be predicted.
+    """
+    pix_fmt = get_sps_pix_fmt(codec_name, sps, full_range)
+    if pix_fmt is None:
+        return False
+    stream['width'] = sps['width']
+    stream['height'] = sps['height']
+    stream['pix_fmt'] = pix_fmt
+    if 'color_primaries' in sps or codec_name == 'hevc':
+        return set_color_fields(stream, sps.get('color_primaries'), sps.get('color_transfer'),
+                                sps.get('color_space'))
+    return True
+
+
+def set_config_record_fields(stream, codec_name, record, colors=None, full_range=None):
+    """
+    set_sps_fields for H.264/HEVC in a container, from the SPS of its avcC/hvcC record.
+    colors: (primaries, transfer, matrix) signalled by the container, kept unless the SPS overrides them
+    full_range: range signalled by the container
+    """
+    nal = get_avcc_sps(record) if codec_name == 'h264' else get_hvcc_sps(record)
+    if nal is None:
+        # Parameter sets only in-band (avc3/hev1)
+        return False
+    if colors is not None and codec_name == 'h264' and not set_color_fields(stream, *colors):
+        return False
+    return set_sps_fields(stream, codec_name, parse_sps(codec_name, nal), full_range)
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+ISO-BMFF (MP4/MOV) header reader
+
+Only the moov box is read: the file is walked box header by box header, so a moov
+at the end of the file costs a few seeks rather than reading through mdat.
+"""
+import struct
+
+from .colorspace import get_pix_fmt, set_color_fields
+from .dovi import parse_dovi_config_record
+from .exif import find_tiff_iso_tags, read_jpeg_iso_tags, read_nctg_iso_tags, read_tiff_iso_tags, read_xmp_iso_tags
+from .h26x import set_config_record_fields
+from .rational import INT_MAX, av_reduce, format_rational
+from .sidecar import read_xml_iso_tags
+
+# moov is a few hundred KB for hours of video, anything this large is not worth parsing in Python
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+# Maximum number of top-level boxes looked at before giving up
+MAX_TOP_LEVEL_BOXES = 64
+
+# Sample entry fourcc -> ffprobe codec_name, for the codecs whose fields we can reproduce
+CODEC_NAMES = {
+    'avc1': 'h264', 'avc3': 'h264',
+    'hvc1': 'hevc', 'hev1': 'hevc',
+    # Dolby Vision sample entries
+    'dva1': 'h264', 'dvav': 'h264',
+    'dvh1': 'hevc', 'dvhe': 'hevc',
+    'apco': 'prores', 'apcs': 'prores', 'apcn': 'prores', 'apch': 'prores',
+    'ap4h': 'prores', 'ap4x': 'prores',
+}
+
+# ProRes RAW: ffprobe only knows the tag
+PRORES_RAW_TAGS = {'aprn', 'aprh'}
+
+# ProRes 4444 (XQ) decodes to 12 bit, the 422 flavours to 10 bit
+PRORES_4444_TAGS = {'ap4h', 'ap4x'}
+
+# Dolby Vision configuration boxes, ffprobe turns them into DOVI side data
+DOVI_BOX_TYPES = ('dvcC', 'dvvC', 'dvwC')
+
+# Camera metadata blocks holding ISO tags
+XMP_UUID = bytes.fromhex('be7acfcb97a942e89c71999491e3afac')
+CANON_UUID = bytes.fromhex('85c0b687820f11e08111f4ce462b6a48')
+# Sony clip metadata, the same document as the M01.XML sidecar: in a meta box's 'xml ' box or a uuid box
+NRTM_XML_MARKER = b'<NonRealTimeMeta'
+# Top-level metadata boxes larger than this are skipped
+MAX_METADATA_BOX_SIZE = 4 * 1024 * 1024
+
+# Size of a VisualSampleEntry before its child boxes
+VISUAL_SAMPLE_ENTRY_SIZE = 78
+
+
+def iter_boxes(data, start=0, end=None):
+    """Yield (type, payload_start, payload_end) for the boxes in data[start:end]"""
+    if end is None:
+        end = len(data)
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header_size = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        # QuickTime sample entries may end with a 4 byte terminator
+        if size < header_size or pos + size > end:
+            return
+        yield box_type.decode('latin-1'), pos + header_size, pos + size
+        pos += size
+
+
+def find_box(data, path, start=0, end=None):
+    """Payload (start, end) of the first box matching path (e.g. ['mdia', 'minf']), or None"""
+    for box_type, payload_start, payload_end in iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, payload_end
+            found = find_box(data, path[1:], payload_start, payload_end)
+            if found:
+                return found
+    return None
+
+
+def iter_file_boxes(f):
+    """Yield (type, payload_start, payload_end) for the top-level boxes of an open file"""
+    f.seek(0, 2)
+    file_size = f.tell()
+    pos = 0
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        if pos + 8 > file_size:
+            return
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        # Not an ISO-BMFF file (or a damaged one)
+        if size < header_size or not box_type.isalnum():
+            return
+        yield box_type.decode('latin-1'), pos + header_size, pos + size
+        pos += size
+
+
+def read_file_box(f, start, end, max_size):
+    """Payload of a top-level box, or None if it is larger than max_size or cut off"""
+    if end - start > max_size:
+        return None
+    f.seek(start)
+    payload = f.read(end - start)
+    return payload if len(payload) == end - start else None
+
+
+def read_moov(f):
+    """Find the top-level moov box of an open file and return its payload, or None"""
+    for box_type, start, end in iter_file_boxes(f):
+        if box_type == 'moov':
+            return read_file_box(f, start, end, MAX_MOOV_SIZE)
+    return None
+
+
+def get_video_track(moov):
+    """Payload (start, end) of the mdia box of the first video track, or None"""
+    for box_type, start, end in iter_boxes(moov):
+        if box_type != 'trak':
+            continue
+        mdia = find_box(moov, ['mdia'], start, end)
+        if not mdia:
+            continue
+        hdlr = find_box(moov, ['hdlr'], *mdia)
+        if hdlr and moov[hdlr[0] + 8:hdlr[0] + 12] == b'vide':
+            return mdia
+    return None
+
+
+def read_mdhd_timescale(data, start):
+    """Timescale of an mdhd box"""
+    version = data[start]
+    offset = start + (20 if version == 1 else 12)
+    return struct.unpack_from('>I', data, offset)[0]
+
+
+def read_stts(data, start, end):
+    """(sample_count, sample_delta) entries of an stts box"""
+    entry_count = struct.unpack_from('>I', data, start + 4)[0]
+    if start + 8 + entry_count * 8 > end:
+        return None
+    return [struct.unpack_from('>II', data, start + 8 + i * 8) for i in range(entry_count)]
+
+
+def read_first_chunk_offset(data, stbl):
+    """File offset of the first chunk, from stco or co64"""
+    stco = find_box(data, ['stco'], *stbl)
+    if stco and struct.unpack_from('>I', data, stco[0] + 4)[0]:
+        return struct.unpack_from('>I', data, stco[0] + 8)[0]
+    co64 = find_box(data, ['co64'], *stbl)
+    if co64 and struct.unpack_from('>I', data, co64[0] + 4)[0]:
+        return struct.unpack_from('>Q', data, co64[0] + 8)[0]
+    return None
+
+
+def get_frame_rate(timescale, stts):
+    """
+    r_frame_rate the way ffmpeg's mov demuxer sets it: only for a constant sample
+    duration (allowing for a different last sample). Returns None otherwise.
+    """
+    if not stts or not timescale:
+        return None
+    if len(stts) == 2 and stts[1][0] == 1:
+        stts = stts[:1]
+    if len(stts) != 1 or not stts[0][1]:
+        return None
+    return format_rational(*av_reduce(timescale, stts[0][1], INT_MAX))
+
+
+def parse_colr(data, start, end):
+    """(primaries, transfer, matrix, full_range) from a colr box, or None for ICC profiles"""
+    colour_type = data[start:start + 4]
+    if colour_type not in (b'nclx', b'nclc') or end - start < 10:
+        return None
+    primaries, transfer, matrix = struct.unpack_from('>HHH', data, start + 4)
+    full_range = None
+    if colour_type == b'nclx' and end - start >= 11:
+        full_range = bool(data[start + 10] & 0x80)
+    return primaries, transfer, matrix, full_range
+
+
+def read_prores_frame_header(f, offset):
+    """(chroma_format, primaries, transfer, matrix, alpha) from the first ProRes frame, or None"""
+    f.seek(offset)
+    frame = f.read(8 + 18)
+    if len(frame) < 26 or frame[4:8] != b'icpf':
+        return None
+    header = frame[8:]
+    chroma_format = 3 if header[12] & 0xc0 == 0xc0 else 2
+    return chroma_format, header[14], header[15], header[16], bool(header[17] & 0x0f)
+
+
+def read_stream_info(file_path, raw=False):
+    """
+    Read the first video stream of an MP4/MOV file.
+    Returns a dict with the keys ffprobe returns for FFPROBE_STREAM_ENTRIES, or None
+    when the file can't be read or ffprobe's answer can't be predicted with confidence.
+    raw: the file is a camera RAW format in an ISO-BMFF container (Canon CRM, Nikon NEV),
+    whose codec ffprobe doesn't know: only the sample entry fields are returned.
+    """
+    with open(file_path, 'rb') as f:
+        moov = read_moov(f)
+        if moov is None:
+            return None
+        return parse_moov(f, moov, raw)
+
+
+def read_raw_stream_info(file_path):
+    return read_stream_info(file_path, raw=True)
+
+
+def parse_moov(f, moov, raw=False):
+    """read_stream_info for an already read moov payload"""
+    mdia = get_video_track(moov)
+    if mdia is None:
+        return None
+    mdhd = find_box(moov, ['mdhd'], *mdia)
+    stbl = find_box(moov, ['minf', 'stbl'], *mdia)
+    if not mdhd or not stbl:
+        return None
+    stsd = find_box(moov, ['stsd'], *stbl)
+    stts = find_box(moov, ['stts'], *stbl)
+    if not stsd or not stts:
+        return None
+
+    frame_rate = get_frame_rate(read_mdhd_timescale(moov, mdhd[0]), read_stts(moov, *stts))
+    if frame_rate is None:
+        return None
+
+    # First sample entry, after the full box header and entry count
+    entries = list(iter_boxes(moov, stsd[0] + 8, stsd[1]))
+    if not entries:
+        return None
+    tag, entry_start, entry_end = entries[0]
+    if entry_end - entry_start < VISUAL_SAMPLE_ENTRY_SIZE:
+        return None
+    width, height = struct.unpack_from('>HH', moov, entry_start + 24)
+    children = {}
+    for box_type, start, end in iter_boxes(moov, entry_start + VISUAL_SAMPLE_ENTRY_SIZE, entry_end):
+        children.setdefault(box_type, (start, end))
+
+    stream = {
+        'width': width,
+        'height': height,
+        'r_frame_rate': frame_rate,
+        'codec_tag_string': tag,
+    }
+
+    if raw or tag in PRORES_RAW_TAGS:
+        return stream
+
+    codec_name = CODEC_NAMES.get(tag)
+    if codec_name is None:
+        return None
+    stream['codec_name'] = codec_name
+
+    colr = parse_colr(moov, *children['colr']) if 'colr' in children else None
+
+    if codec_name == 'prores':
+        # The decoder takes the colours from the frame header, not from colr
+        offset = read_first_chunk_offset(moov, stbl)
+        frame_header = read_prores_frame_header(f, offset) if offset is not None else None
+        if frame_header is None:
+            return None
+        chroma_format, primaries, transfer, matrix, alpha = frame_header
+        bit_depth = 12 if tag in PRORES_4444_TAGS else 10
+        stream['pix_fmt'] = get_pix_fmt(chroma_format, bit_depth, alpha=alpha)
+        if not set_color_fields(stream, primaries, transfer, matrix):
+            return None
+        return stream
+
+    # H.264/HEVC: size, pix_fmt and colours as the decoder reports them, from the SPS
+    record_type = 'avcC' if codec_name == 'h264' else 'hvcC'
+    if record_type not in children:
+        return None
+    colors = full_range = None
+    if colr is not None:
+        colors, full_range = colr[:3], colr[3]
+    if not set_config_record_fields(stream, codec_name, moov[slice(*children[record_type])], colors, full_range):
+        return None
+    for box_type in DOVI_BOX_TYPES:
+        if box_type in children:
+            dovi = parse_dovi_config_record(moov[slice(*children[box_type])])
+            if dovi is None:
+                return None
+            stream['side_data_list'] = [dovi]
+    return stream
+
+
+def get_udta_iso_tags(data, start, end):
+    """ISO tags of the camera metadata in a udta box, as a list of {tag name: value}"""
+    found = []
+    for box_type, box_start, box_end in iter_boxes(data, start, end):
+        if box_type == 'CNTH':
+            # Canon: CNDA holds a JPEG thumbnail with the Exif data
+            cnda = find_box(data, ['CNDA'], box_start, box_end)
+            tags = read_jpeg_iso_tags(data[slice(*cnda)]) if cnda else None
+        elif box_type == 'PANA':
+            # Panasonic: a TIFF structure somewhere in the box
+            tags = find_tiff_iso_tags(data[box_start:box_end])
+        elif box_type == 'NCDT':
+            # Nikon: Exif tags among the NCTG entries
+            nctg = find_box(data, ['NCTG'], box_start, box_end)
+            tags = read_nctg_iso_tags(data[slice(*nctg)]) if nctg else None
+        elif box_type == 'XMP_':
+            tags = read_xmp_iso_tags(data[box_start:box_end])
+        else:
+            continue
+        if tags:
+            found.append(tags)
+    return found
+
+
+def get_nrtm_iso_tags(data):
+    """ISO tags of Sony NonRealTimeMeta XML, or None for other data"""
+    pos = data.find(NRTM_XML_MARKER)
+    return read_xml_iso_tags(data[pos:]) if pos >= 0 else None
+
+
+def get_meta_iso_tags(data, start, end):
+    """ISO tags of the XML document of a meta box (Sony), or None"""
+    # meta is a full box in MP4 files, a plain container in QuickTime ones
+    if data[start + 4:start + 8] != b'hdlr':
+        start += 4
+    xml = find_box(data, ['xml '], start, end)
+    # 'xml ' is a full box as well
+    return get_nrtm_iso_tags(data[xml[0] + 4:xml[1]]) if xml else None
+
+
+def get_uuid_iso_tags(data, start, end):
+    """ISO tags of a uuid box (Canon metadata, XMP or Sony XML), or None"""
+    user_type = data[start:start + 16]
+    if user_type == XMP_UUID:
+        return read_xmp_iso_tags(data[start + 16:end])
+    if user_type == CANON_UUID:
+        # CMT2 is the Exif IFD as a TIFF structure
+        cmt2 = find_box(data, ['CMT2'], start + 16, end)
+        return read_tiff_iso_tags(data, cmt2[0]) if cmt2 else None
+    return get_nrtm_iso_tags(data[start + 16:end])
+
+
+def read_iso_metadata(file_path):
+    """
+    ISO tags from the camera metadata of an MP4/MOV file: Canon's CNTH and uuid boxes,
+    Nikon's NCDT box, Panasonic's PANA box, Sony's NonRealTimeMeta XML and XMP packets.
+    Returns {tag name: value} (the names exiftool gives them), or None if none of these blocks is present.
+    """
+    found = []
+    with open(file_path, 'rb') as f:
+        for box_type, start, end in iter_file_boxes(f):
+            if box_type == 'moov':
+                moov = read_file_box(f, start, end, MAX_MOOV_SIZE)
+                if moov is None:
+                    continue
+                for child_type, child_start, child_end in iter_boxes(moov):
+                    if child_type == 'udta':
+                        found.extend(get_udta_iso_tags(moov, child_start, child_end))
+                    elif child_type == 'uuid':
+                        found.append(get_uuid_iso_tags(moov, child_start, child_end))
+                    elif child_type == 'meta':
+                        found.append(get_meta_iso_tags(moov, child_start, child_end))
+            elif box_type in ('uuid', 'meta'):
+                payload = read_file_box(f, start, end, MAX_METADATA_BOX_SIZE)
+                if payload is None:
+                    continue
+                if box_type == 'uuid':
+                    found.append(get_uuid_iso_tags(payload, 0, len(payload)))
+                else:
+                    found.append(get_meta_iso_tags(payload, 0, len(payload)))
+
+    # The first block (in file order) holding a tag wins
+    metadata = {}
+    for tags in found:
+        for name, value in (tags or {}).items():
+            metadata.setdefault(name, value)
+    return metadata or None
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Matroska/WebM (EBML) header reader
+
+Only the Tracks element is decoded. It normally sits in the first few KB of the
+Segment; otherwise the SeekHead tells where to jump, so the rest of the file is never read.
+"""
+from .dovi import parse_dovi_config_record
+from .h26x import set_config_record_fields
+from .rational import av_reduce, format_rational
+
+# Bytes read from the start of the file, enough for the EBML header, SeekHead, Info and Tracks
+HEADER_READ_SIZE = 256 * 1024
+
+# A Tracks element larger than this is not worth parsing in Python
+MAX_TRACKS_SIZE = 4 * 1024 * 1024
+
+EBML_ID = 0x1A45DFA3
+DOC_TYPE_ID = 0x4282
+SEGMENT_ID = 0x18538067
+SEEK_HEAD_ID = 0x114D9B74
+SEEK_ID = 0x4DBB
+SEEK_ELEMENT_ID = 0x53AB
+SEEK_POSITION_ID = 0x53AC
+TRACKS_ID = 0x1654AE6B
+CLUSTER_ID = 0x1F43B675
+TRACK_ENTRY_ID = 0xAE
+TRACK_TYPE_ID = 0x83
+CODEC_ID_ID = 0x86
+CODEC_PRIVATE_ID = 0x63A2
+DEFAULT_DURATION_ID = 0x23E383
+CONTENT_ENCODINGS_ID = 0x6D80
+BLOCK_ADDITION_MAPPING_ID = 0x41E4
+BLOCK_ADD_ID_TYPE_ID = 0x41E7
+BLOCK_ADD_ID_EXTRA_DATA_ID = 0x41ED
+VIDEO_ID = 0xE0
+PIXEL_WIDTH_ID = 0xB0
+PIXEL_HEIGHT_ID = 0xBA
+COLOUR_ID = 0x55B0
+MATRIX_COEFFICIENTS_ID = 0x55B1
+RANGE_ID = 0x55B9
+TRANSFER_CHARACTERISTICS_ID = 0x55BA
+PRIMARIES_ID = 0x55BB
+
+TRACK_TYPE_VIDEO = 1
+
+# Colour Range values
+RANGE_BROADCAST = 1
+RANGE_FULL = 2
+
+# CodecID -> ffprobe codec_name, for the codecs whose fields we can reproduce
+CODEC_NAMES = {
+    'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc',
+}
+
+# BlockAddIDType values (fourccs) whose extra data is a Dolby Vision configuration record
+DOVI_BLOCK_ADD_ID_TYPES = {
+    int.from_bytes(b'dvcC', 'big'),
+    int.from_bytes(b'dvvC', 'big'),
+    int.from_bytes(b'dvwC', 'big'),
+}
+
+# Matroska streams have no fourcc
+CODEC_TAG_STRING = '[0][0][0][0]'
+
+# The demuxer only sets r_frame_rate from DefaultDuration between 5 and 1000 fps (exclusive)
+MIN_FRAME_RATE = 5
+MAX_FRAME_RATE = 1000
+
+
+def read_vint(data, pos, keep_marker=False):
+    """Decode an EBML variable length integer at pos, returns (value, next_pos); value is None if unknown"""
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise ValueError("Invalid EBML variable length integer")
+    value = first if keep_marker else first & (mask - 1)
+    all_ones = value == mask - 1
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xff
+    if all_ones and not keep_marker:
+        # Unknown size
+        return None, pos + length
+    return value, pos + length
+
+
+def iter_elements(data, start, end):
+    """
+    Yield (id, data_start, data_end) for the elements in data[start:end].
+    data_end may be past the end of data for an element that was only partly read.
+    """
+    pos = start
+    while pos < end and pos < len(data):
+        try:
+            element_id, pos = read_vint(data, pos, keep_marker=True)
+            size, pos = read_vint(data, pos)
+        except (ValueError, IndexError):
+            return
+        data_end = end if size is None else pos + size
+        yield element_id, pos, data_end
+        pos = data_end
+
+
+def get_children(data, start, end):
+    """First occurrence of each child element: {id: (data_start, data_end)}"""
+    children = {}
+    for element_id, data_start, data_end in iter_elements(data, start, end):
+        children.setdefault(element_id, (data_start, data_end))
+    return children
+
+
+def read_uint(data, span):
+    """Unsigned integer element value"""
+    start, end = span
+    return int.from_bytes(data[start:end], 'big')
+
+
+def read_tracks(f, data):
+    """Payload of the Tracks element of an open Matroska file, data being its first bytes; None if not found"""
+    elements = iter_elements(data, 0, len(data))
+    header = next(elements, None)
+    if header is None or header[0] != EBML_ID:
+        return None
+    doc_type = get_children(data, header[1], header[2]).get(DOC_TYPE_ID)
+    if doc_type is None or data[doc_type[0]:doc_type[1]].rstrip(b'\0') not in (b'matroska', b'webm'):
+        return None
+    segment = next(elements, None)
+    if segment is None or segment[0] != SEGMENT_ID:
+        return None
+    segment_start = segment[1]
+
+    tracks_position = None
+    for element_id, start, end in iter_elements(data, segment_start, segment[2]):
+        if element_id == TRACKS_ID:
+            if end <= len(data):
+                return data[start:end]
+            # Only partly read
+            if end - start > MAX_TRACKS_SIZE:
+                return None
+            f.seek(start)
+            return f.read(end - start)
+        if element_id == SEEK_HEAD_ID and end <= len(data):
+            for seek_id, seek_start, seek_end in iter_elements(data, start, end):
+                if seek_id != SEEK_ID:
+                    continue
+                seek = get_children(data, seek_start, seek_end)
+                if (SEEK_ELEMENT_ID in seek and SEEK_POSITION_ID in seek and
+                        read_uint(data, seek[SEEK_ELEMENT_ID]) == TRACKS_ID):
+                    tracks_position = segment_start + read_uint(data, seek[SEEK_POSITION_ID])
+        elif element_id == CLUSTER_ID:
+            break
+
+    if tracks_position is None:
+        return None
+
+    # Tracks after the first Cluster (e.g. written by a live muxer): jump there
+    f.seek(tracks_position)
+    head = f.read(12)
+    element_id, pos = read_vint(head, 0, keep_marker=True)
+    size, pos = read_vint(head, pos)
+    if element_id != TRACKS_ID or size is None or size > MAX_TRACKS_SIZE:
+        return None
+    f.seek(tracks_position + pos)
+    return f.read(size)
+
+
+def get_video_track(tracks):
+    """(start, end) of the first video TrackEntry, or None"""
+    for element_id, start, end in iter_elements(tracks, 0, len(tracks)):
+        if element_id != TRACK_ENTRY_ID:
+            continue
+        end = min(end, len(tracks))
+        track = get_children(tracks, start, end)
+        if TRACK_TYPE_ID in track and read_uint(tracks, track[TRACK_TYPE_ID]) == TRACK_TYPE_VIDEO:
+            return start, end
+    return None
+
+
+def get_dovi_side_data(tracks, track_start, track_end):
+    """
+    DOVI side data from the BlockAdditionMapping elements of a TrackEntry.
+    Returns (side_data or None, ok); ok is False for a mapping we can't decode.
+    """
+    dovi = None
+    for element_id, start, end in iter_elements(tracks, track_start, track_end):
+        if element_id != BLOCK_ADDITION_MAPPING_ID:
+            continue
+        mapping = get_children(tracks, start, end)
+        if BLOCK_ADD_ID_TYPE_ID not in mapping:
+            continue
+        if read_uint(tracks, mapping[BLOCK_ADD_ID_TYPE_ID]) not in DOVI_BLOCK_ADD_ID_TYPES:
+            # Other block additions (e.g. HDR10+) don't show up in the stream side data
+            continue
+        if BLOCK_ADD_ID_EXTRA_DATA_ID not in mapping:
+            return None, False
+        dovi = parse_dovi_config_record(tracks[slice(*mapping[BLOCK_ADD_ID_EXTRA_DATA_ID])])
+        if dovi is None:
+            return None, False
+    return dovi, True
+
+
+def read_stream_info(file_path):
+    """
+    Read the first video stream of a Matroska/WebM file.
+    Returns a dict with the keys ffprobe returns for FFPROBE_STREAM_ENTRIES, or None
+    when the file can't be read or ffprobe's answer can't be predicted with confidence.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(HEADER_READ_SIZE)
+        tracks = read_tracks(f, data)
+    if tracks is None:
+        return None
+    return parse_tracks(tracks)
+
+
+def parse_tracks(tracks):
+    """read_stream_info for an already read Tracks payload"""
+    track_span = get_video_track(tracks)
+    if track_span is None:
+        return None
+    track = get_children(tracks, *track_span)
+    if VIDEO_ID not in track or CODEC_ID_ID not in track:
+        return None
+    # Compressed headers
+    if CONTENT_ENCODINGS_ID in track:
+        return None
+
+    codec_id = tracks[slice(*track[CODEC_ID_ID])].rstrip(b'\0').decode('ascii', errors='replace')
+    codec_name = CODEC_NAMES.get(codec_id)
+    if codec_name is None:
+        return None
+
+    video = get_children(tracks, *track[VIDEO_ID])
+    if PIXEL_WIDTH_ID not in video or PIXEL_HEIGHT_ID not in video:
+        return None
+
+    # r_frame_rate as the demuxer derives it from DefaultDuration (in ns)
+    if DEFAULT_DURATION_ID not in track:
+        return None
+    default_duration = read_uint(tracks, track[DEFAULT_DURATION_ID])
+    if not default_duration:
+        return None
+    frame_rate = av_reduce(1000000000, default_duration, 30000)
+    if not frame_rate[1] * MIN_FRAME_RATE < frame_rate[0] < frame_rate[1] * MAX_FRAME_RATE:
+        return None
+
+    stream = {
+        'width': read_uint(tracks, video[PIXEL_WIDTH_ID]),
+        'height': read_uint(tracks, video[PIXEL_HEIGHT_ID]),
+        'r_frame_rate': format_rational(*frame_rate),
+        'codec_name': codec_name,
+        'codec_tag_string': CODEC_TAG_STRING,
+    }
+
+    # Size, pix_fmt and colours as the decoder reports them, from the SPS
+    if CODEC_PRIVATE_ID not in track:
+        return None
+    colors = full_range = None
+    if COLOUR_ID in video:
+        colour = get_children(tracks, *video[COLOUR_ID])
+        colors = tuple(
+            read_uint(tracks, colour[element_id]) if element_id in colour else None
+            for element_id in (PRIMARIES_ID, TRANSFER_CHARACTERISTICS_ID, MATRIX_COEFFICIENTS_ID)
+        )
+        color_range = read_uint(tracks, colour[RANGE_ID]) if RANGE_ID in colour else None
+        full_range = {RANGE_BROADCAST: False, RANGE_FULL: True}.get(color_range)
+    if not set_config_record_fields(stream, codec_name, tracks[slice(*track[CODEC_PRIVATE_ID])], colors, full_range):
+        return None
+    dovi, ok = get_dovi_side_data(tracks, *track_span)
+    if not ok:
+        return None
+    if dovi is not None:
+        stream['side_data_list'] = [dovi]
+    return stream
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+MPEG-2 video sequence header parsing
+
+The sequence header, sequence extension and sequence display extension give what
+the ffmpeg decoder reports: size, chroma format, progressive flag and colours.
+"""
+from .colorspace import CHROMA_FORMATS, set_color_fields
+from .h26x import BitReader, iter_nal_units
+
+SEQUENCE_HEADER_CODE = 0xB3
+EXTENSION_START_CODE = 0xB5
+PICTURE_START_CODE = 0x00
+
+SEQUENCE_EXTENSION_ID = 1
+SEQUENCE_DISPLAY_EXTENSION_ID = 2
+
+
+def parse_sequence(data):
+    """
+    Parse the first sequence header of an MPEG-2 video stream and its extensions.
+    Returns a dict with width, height, chroma_format, progressive and, when signalled,
+    color_primaries/color_transfer/color_space codes; None if there is no sequence header
+    (or it is MPEG-1, without sequence extension).
+    """
+    sequence = None
+    for unit in iter_nal_units(data):
+        if not unit:
+            continue
+        start_code = unit[0]
+        if start_code == SEQUENCE_HEADER_CODE and sequence is None:
+            reader = BitReader(unit[1:4])
+            sequence = {'width': reader.read_bits(12), 'height': reader.read_bits(12)}
+        elif start_code == EXTENSION_START_CODE and sequence is not None:
+            reader = BitReader(unit[1:5])
+            extension_id = reader.read_bits(4)
+            if extension_id == SEQUENCE_EXTENSION_ID:
+                reader.skip_bits(8)  # profile_and_level_indication
+                sequence['progressive'] = bool(reader.read_bit())
+                sequence['chroma_format'] = reader.read_bits(2)
+                sequence['width'] |= reader.read_bits(2) << 12
+                sequence['height'] |= reader.read_bits(2) << 12
+            elif extension_id == SEQUENCE_DISPLAY_EXTENSION_ID:
+                reader.skip_bits(3)  # video_format
+                if reader.read_bit() and len(unit) >= 5:
+                    # colour_primaries, transfer_characteristics, matrix_coefficients
+                    sequence['color_primaries'], sequence['color_transfer'], sequence['color_space'] = unit[2:5]
+        elif start_code == PICTURE_START_CODE and sequence is not None:
+            # Extensions of the sequence header come before the first picture
+            break
+    if sequence is None or 'chroma_format' not in sequence:
+        return None
+    return sequence
+
+
+def set_sequence_fields(stream, sequence):
+    """
+    Set width, height, pix_fmt and the colours the decoder takes from the sequence:
+    the colour description, when present, overrides the container's.
+    Returns False when ffprobe's values can't be predicted.
+    """
+    if sequence['chroma_format'] not in CHROMA_FORMATS or not sequence['chroma_format']:
+        return False
+    stream['width'] = sequence['width']
+    stream['height'] = sequence['height']
+    stream['pix_fmt'] = CHROMA_FORMATS[sequence['chroma_format']]
+    if 'color_primaries' in sequence:
+        return set_color_fields(stream, sequence['color_primaries'], sequence['color_transfer'],
+                                sequence['color_space'])
+    return True
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+MPEG-TS / M2TS reader
+
+Follows PAT -> PMT to the first video PID, then takes the first SPS of its PES
+payload and the PES timestamps. Only a bounded prefix of the file is read, where
+ffprobe's default probesize makes it read several MB.
+"""
+import struct
+from math import gcd
+
+from .dovi import parse_dovi_descriptor
+from .h26x import is_sps, iter_nal_units, parse_sps, set_sps_fields
+from .rational import INT_MAX, av_reduce, format_rational
+
+TS_PACKET_SIZE = 188
+# M2TS (AVCHD, Blu-ray) prefixes each packet with a 4 byte timestamp
+M2TS_PACKET_SIZE = 192
+SYNC_BYTE = 0x47
+
+READ_CHUNK_SIZE = 512 * 1024
+MAX_READ_SIZE = 4 * 1024 * 1024
+
+# Bytes of a PES packet searched for the SPS (it comes first in an access unit)
+MAX_ES_BUFFER_SIZE = 1024 * 1024
+
+PAT_PID = 0
+PAT_TABLE_ID = 0x00
+PMT_TABLE_ID = 0x02
+
+REGISTRATION_DESCRIPTOR = 0x05
+DOVI_VIDEO_STREAM_DESCRIPTOR = 0xB0
+
+# stream_type -> codec_name for the codecs we decode
+STREAM_TYPE_CODECS = {0x1B: 'h264', 0x24: 'hevc'}
+
+# Every stream_type ffmpeg maps to a video codec, to find the first video stream (v:0)
+VIDEO_STREAM_TYPES = {0x01, 0x02, 0x10, 0x1B, 0x20, 0x21, 0x24, 0x33, 0x42, 0xD1, 0xD2, 0xD4, 0xEA}
+
+# PES timestamps are in 1/90000 s
+PES_TIME_BASE = 90000
+TIMESTAMP_WRAP = 1 << 33
+
+# ffmpeg derives r_frame_rate from the gcd of the DTS deltas, provided there are
+# more than 15 of them and the gcd is above time_base / 500
+MIN_DURATION_COUNT = 16
+MIN_DURATION_GCD = PES_TIME_BASE // 500
+# Deltas collected before stopping, ffprobe looks at a similar number of frames
+MAX_DURATION_COUNT = 64
+
+
+def format_codec_tag(tag):
+    """codec_tag_string as ffprobe prints it (av_fourcc_make_string)"""
+    chars = []
+    for shift in (0, 8, 16, 24):
+        byte = (tag >> shift) & 0xff
+        char = chr(byte)
+        chars.append(char if byte < 128 and (char.isalnum() or char in '. -_') else f'[{byte}]')
+    return ''.join(chars)
+
+
+def detect_packet_size(data):
+    """Packet size (188/192) and offset of the first sync byte, or None"""
+    for packet_size, offset in ((TS_PACKET_SIZE, 0), (M2TS_PACKET_SIZE, 4)):
+        if len(data) >= offset + packet_size * 3 and all(
+                data[offset + i * packet_size] == SYNC_BYTE for i in range(3)):
+            return packet_size, offset
+    return None
+
+
+def iter_packets(f):
+    """Yield (pid, payload_unit_start, payload) for the packets in the first MAX_READ_SIZE bytes"""
+    data = f.read(READ_CHUNK_SIZE)
+    detected = detect_packet_size(data)
+    if detected is None:
+        return
+    packet_size, offset = detected
+    total_read = len(data)
+    pos = offset
+    while True:
+        while pos + TS_PACKET_SIZE <= len(data):
+            if data[pos] != SYNC_BYTE:
+                # Lost sync, don't guess
+                return
+            flags, = struct.unpack_from('>H', data, pos + 1)
+            pid = flags & 0x1fff
+            payload_unit_start = bool(flags & 0x4000)
+            adaptation_field_control = (data[pos + 3] >> 4) & 0x03
+            payload_start = pos + 4
+            if adaptation_field_control & 0x02:
+                payload_start += 1 + data[payload_start]
+            if adaptation_field_control & 0x01 and payload_start < pos + TS_PACKET_SIZE:
+                yield pid, payload_unit_start, data[payload_start:pos + TS_PACKET_SIZE]
+            pos += packet_size
+        if total_read >= MAX_READ_SIZE:
+            return
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        total_read += len(chunk)
+        data = data[pos:] + chunk
+        pos = 0
+
+
+class SectionAssembler:
+    """Reassembles the PSI sections of a PID that may span several packets"""
+
+    def __init__(self):
+        self.buffer = None
+
+    def feed(self, payload_unit_start, payload):
+        """Add a packet payload, returns a complete section or None"""
+        if payload_unit_start:
+            pointer_field = payload[0]
+            self.buffer = payload[1 + pointer_field:]
+        elif self.buffer is not None:
+            self.buffer += payload
+        if self.buffer is None or len(self.buffer) < 3:
+            return None
+        section_length = ((self.buffer[1] & 0x0f) << 8) | self.buffer[2]
+        if len(self.buffer) < 3 + section_length:
+            return None
+        section = self.buffer[:3 + section_length]
+        self.buffer = None
+        return section
+
+
+def parse_pat(section):
+    """PMT PID of the first program of a PAT section, or None"""
+    if section[0] != PAT_TABLE_ID:
+        return None
+    # Program loop between the 8 byte header and the CRC
+    for pos in range(8, len(section) - 4 - 3, 4):
+        program_number, pmt_pid = struct.unpack_from('>HH', section, pos)
+        if program_number != 0:  # 0 is the network PID
+            return pmt_pid & 0x1fff
+    return None
+
+
+def iter_descriptors(data, start, end):
+    """Yield (tag, payload) for the descriptors in data[start:end]"""
+    pos = start
+    while pos + 2 <= end:
+        tag, length = data[pos], data[pos + 1]
+        yield tag, data[pos + 2:min(pos + 2 + length, end)]
+        pos += 2 + length
+
+
+def parse_pmt(section):
+    """
+    First video stream of a PMT section: (pid, stream_type, codec_tag, dovi_side_data).
+    Returns None if the PMT has no video stream.
+    """
+    if section[0] != PMT_TABLE_ID:
+        return None
+    program_info_length = struct.unpack_from('>H', section, 10)[0] & 0x0fff
+    pos = 12 + program_info_length
+    end = len(section) - 4
+    while pos + 5 <= end:
+        stream_type = section[pos]
+        pid = struct.unpack_from('>H', section, pos + 1)[0] & 0x1fff
+        es_info_length = struct.unpack_from('>H', section, pos + 3)[0] & 0x0fff
+        es_info_start = pos + 5
+        pos = es_info_start + es_info_length
+        if stream_type not in VIDEO_STREAM_TYPES:
+            continue
+        codec_tag = stream_type
+        dovi = None
+        for tag, payload in iter_descriptors(section, es_info_start, min(pos, end)):
+            if tag == REGISTRATION_DESCRIPTOR and len(payload) >= 4:
+                codec_tag = struct.unpack_from('<I', payload)[0]
+            elif tag == DOVI_VIDEO_STREAM_DESCRIPTOR:
+                dovi = parse_dovi_descriptor(payload)
+        return pid, stream_type, codec_tag, dovi
+    return None
+
+
+def parse_pes_header(payload):
+    """(timestamp, es_data) of the start of a PES packet: DTS, else PTS (None if absent)"""
+    if len(payload) < 9 or payload[:3] != b'\x00\x00\x01':
+        return None, b''
+    header_data_length = payload[8]
+    pts_dts_flags = payload[7] >> 6
+    timestamp = None
+    if pts_dts_flags in (2, 3) and len(payload) >= 14:
+        # DTS follows PTS when both are present
+        timestamp_pos = 14 if pts_dts_flags == 3 and len(payload) >= 19 else 9
+        b = payload[timestamp_pos:timestamp_pos + 5]
+        timestamp = (((b[0] >> 1) & 0x07) << 30 | b[1] << 22 | (b[2] >> 1) << 15 | b[3] << 7 | b[4] >> 1)
+    return timestamp, payload[9 + header_data_length:]
+
+
+def get_timestamp_frame_rate(timestamps):
+    """
+    r_frame_rate as ffmpeg estimates it for a 90 kHz stream: from the gcd of the
+    increasing timestamp deltas. Returns (num, den) or None when ffmpeg would guess otherwise.
+    """
+    duration_gcd = 0
+    duration_count = 0
+    for last, timestamp in zip(timestamps, timestamps[1:]):
+        if timestamp > last:
+            duration_gcd = gcd(duration_gcd, timestamp - last)
+            duration_count += 1
+    if duration_count < MIN_DURATION_COUNT or duration_gcd <= MIN_DURATION_GCD:
+        return None
+    return av_reduce(PES_TIME_BASE, duration_gcd, INT_MAX)
+
+
+def find_sps(codec_name, es_data):
+    """Parse the first SPS found in a chunk of elementary stream, or None"""
+    for nal in iter_nal_units(es_data):
+        if is_sps(codec_name, nal):
+            return parse_sps(codec_name, nal)
+    return None
+
+
+def read_stream_info(file_path):
+    """
+    Read the first video stream of an MPEG-TS/M2TS file.
+    Returns a dict with the keys ffprobe returns for FFPROBE_STREAM_ENTRIES, or None
+    when the file can't be read or ffprobe's answer can't be predicted with confidence.
+    """
+    pat = SectionAssembler()
+    pmt = SectionAssembler()
+    pmt_pid = None
+    video = None
+    es_buffer = b''
+    sps = None
+    timestamps = []
+    wrap_offset = 0
+
+    with open(file_path, 'rb') as f:
+        for pid, payload_unit_start, payload in iter_packets(f):
+            if video is None:
+                if pid == PAT_PID and pmt_pid is None:
+                    section = pat.feed(payload_unit_start, payload)
+                    if section is not None:
+                        pmt_pid = parse_pat(section)
+                elif pid == pmt_pid:
+                    section = pmt.feed(payload_unit_start, payload)
+                    if section is not None:
+                        video = parse_pmt(section)
+                        if video is None or video[1] not in STREAM_TYPE_CODECS:
+                            return None
+                        codec_name = STREAM_TYPE_CODECS[video[1]]
+                continue
+            if pid != video[0]:
+                continue
+
+            if payload_unit_start:
+                # The previous PES packet is complete, look for the SPS in it
+                if sps is None:
+                    sps = find_sps(codec_name, es_buffer)
+                elif len(timestamps) > MAX_DURATION_COUNT:
+                    break
+                timestamp, payload = parse_pes_header(payload)
+                if timestamp is not None:
+                    timestamp += wrap_offset
+                    if timestamps and timestamps[-1] - timestamp > TIMESTAMP_WRAP // 2:
+                        wrap_offset += TIMESTAMP_WRAP
+                        timestamp += TIMESTAMP_WRAP
+                    timestamps.append(timestamp)
+                es_buffer = b''
+            if sps is None and len(es_buffer) < MAX_ES_BUFFER_SIZE:
+                es_buffer += payload
+
+    if sps is None or sps['interlaced']:
+        # Field coded streams get per-field timestamps from the parser
+        return None
+    frame_rate = get_timestamp_frame_rate(timestamps)
+    if frame_rate is None:
+        return None
+    # A PES packet holding more than one frame would throw the estimate off
+    if 'frame_rate' in sps and av_reduce(*sps['frame_rate'], INT_MAX) != frame_rate:
+        return None
+
+    pid, stream_type, codec_tag, dovi = video
+    stream = {
+        'r_frame_rate': format_rational(*frame_rate),
+        'codec_name': codec_name,
+        'codec_tag_string': format_codec_tag(codec_tag),
+    }
+    if not set_sps_fields(stream, codec_name, sps):
+        return None
+    if dovi is not None:
+        stream['side_data_list'] = [dovi]
+    return stream
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+MXF (SMPTE 377) header partition reader
+
+Decodes the header partition pack, the primer pack and the picture essence descriptor
+(CDCI/MPEG-2) of the header metadata, then the start of the first picture element,
+where the H.264 SPS or MPEG-2 sequence header tells what the decoder reports.
+The rest of the file, however large, is never read.
+"""
+import struct
+
+from .colorspace import set_color_fields
+from .h26x import is_sps, iter_nal_units, parse_sps, set_sps_fields
+from .mpeg2 import parse_sequence, set_sequence_fields
+from .rational import INT_MAX, av_reduce, format_rational
+
+# A header partition may be preceded by a run-in of up to 64 KB
+MAX_RUN_IN_SIZE = 64 * 1024
+# Header metadata larger than this is not worth parsing in Python
+MAX_HEADER_METADATA_SIZE = 16 * 1024 * 1024
+# Bytes of the first picture element searched for the SPS/sequence header
+MAX_ESSENCE_READ_SIZE = 1024 * 1024
+# KLV packets (index segments, system items, sound...) skipped looking for the first picture
+MAX_ESSENCE_KLV_COUNT = 64
+
+KEY_SIZE = 16
+
+# Keys, compared without their version byte (byte 7)
+PARTITION_PACK_KEY = bytes.fromhex('060e2b34020501010d01020101')
+HEADER_PARTITION = 0x02
+# Partition status: only complete header metadata is final
+COMPLETE_PARTITION_STATUSES = {3, 4}
+PRIMER_PACK_KEY = bytes.fromhex('060e2b34020501010d01020101050100')
+LOCAL_SET_KEY = bytes.fromhex('060e2b34025301010d01010101')
+ESSENCE_ELEMENT_KEY = bytes.fromhex('060e2b34010201010d010301')
+
+# Local set type (key byte 14) of the picture essence descriptors
+PICTURE_DESCRIPTOR_TYPES = {
+    0x27: 'generic',
+    0x28: 'cdci',
+    0x29: 'rgba',
+    0x51: 'mpeg2',
+}
+# Essence element item type (key byte 12) of picture elements (GC and D-10 CP)
+PICTURE_ITEM_TYPES = {0x15, 0x05}
+
+# Descriptor local tags
+SAMPLE_RATE_TAG = 0x3001
+PICTURE_ESSENCE_CODING_TAG = 0x3201
+FRAME_LAYOUT_TAG = 0x320C
+TRANSFER_CHARACTERISTIC_TAG = 0x3210
+COLOR_PRIMARIES_TAG = 0x3219
+CODING_EQUATIONS_TAG = 0x321A
+COMPONENT_DEPTH_TAG = 0x3301
+BLACK_REF_LEVEL_TAG = 0x3304
+WHITE_REF_LEVEL_TAG = 0x3305
+COLOR_RANGE_TAG = 0x3306
+
+# Items some writers give a dynamic local tag: UL bytes 8-13 -> static tag
+DYNAMIC_ITEM_ULS = {
+    bytes.fromhex('040102010106'): COLOR_PRIMARIES_TAG,
+    bytes.fromhex('040102010103'): CODING_EQUATIONS_TAG,
+    bytes.fromhex('040102010101'): TRANSFER_CHARACTERISTIC_TAG,
+}
+
+FULL_FRAME = 0
+
+# PictureEssenceCoding UL bytes 8-12 and byte 13 -> codec_name
+PICTURE_CODING_PREFIX = bytes.fromhex('0401020201')
+PICTURE_CODINGS = {
+    0x01: 'mpeg2video', 0x02: 'mpeg2video', 0x03: 'mpeg2video', 0x04: 'mpeg2video', 0x05: 'mpeg2video',
+    0x31: 'h264', 0x32: 'h264',
+}
+
+# Colour ULs: bytes 8-12 select the table, byte 13 the H.273 code ffmpeg maps it to
+COLOR_UL_TABLES = {
+    TRANSFER_CHARACTERISTIC_TAG: (bytes.fromhex('0401010101'), {
+        0x01: 4, 0x02: 1, 0x03: 7, 0x04: 1, 0x05: 12, 0x06: 8, 0x07: 17, 0x08: 11,
+        0x09: 14, 0x0A: 16, 0x0B: 18,
+    }),
+    COLOR_PRIMARIES_TAG: (bytes.fromhex('0401010103'), {
+        0x01: 6, 0x02: 5, 0x03: 1, 0x04: 9, 0x05: 10,
+    }),
+    CODING_EQUATIONS_TAG: (bytes.fromhex('0401010102'), {
+        0x01: 5, 0x02: 1, 0x03: 7, 0x04: 8, 0x05: 0, 0x06: 9,
+    }),
+}
+
+# Streams have no fourcc
+CODEC_TAG_STRING = '[0][0][0][0]'
+
+
+def match_key(key, prefix):
+    """Compare a key with a prefix, ignoring the version byte"""
+    return key[:7] == prefix[:7] and key[8:len(prefix)] == prefix[8:]
+
+
+def read_ber_length(data, pos):
+    """Decode a BER length at pos, returns (length, next_pos)"""
+    first = data[pos]
+    if first < 0x80:
+        return first, pos + 1
+    count = first & 0x7f
+    if count > 8 or pos + 1 + count > len(data):
+        raise ValueError("Invalid BER length")
+    return int.from_bytes(data[pos + 1:pos + 1 + count], 'big'), pos + 1 + count
+
+
+def iter_klv(data, start=0, end=None):
+    """Yield (key, value_start, value_end) for the KLV packets in data[start:end]"""
+    if end is None:
+        end = len(data)
+    pos = start
+    while pos + KEY_SIZE < end:
+        key = data[pos:pos + KEY_SIZE]
+        length, value_start = read_ber_length(data, pos + KEY_SIZE)
+        if value_start + length > end:
+            return
+        yield key, value_start, value_start + length
+        pos = value_start + length
+
+
+def iter_local_set(data, start, end):
+    """Yield (local tag, value_start, value_end) for the items of a local set"""
+    pos = start
+    while pos + 4 <= end:
+        tag, length = struct.unpack_from('>HH', data, pos)
+        pos += 4
+        if pos + length > end:
+            return
+        yield tag, pos, pos + length
+        pos += length
+
+
+def read_primer(data, start, end):
+    """Local tag -> UL mapping of a primer pack"""
+    count, item_size = struct.unpack_from('>II', data, start)
+    if item_size != 18:
+        return {}
+    primer = {}
+    for pos in range(start + 8, min(start + 8 + count * item_size, end), item_size):
+        tag, = struct.unpack_from('>H', data, pos)
+        primer[tag] = data[pos + 2:pos + 18]
+    return primer
+
+
+def read_descriptor(data, start, end, primer):
+    """Items of a picture descriptor set: {static tag: raw value}"""
+    items = {}
+    for tag, value_start, value_end in iter_local_set(data, start, end):
+        if tag >= 0x8000:
+            ul = primer.get(tag)
+            tag = DYNAMIC_ITEM_ULS.get(ul[8:14]) if ul else None
+            if tag is None:
+                continue
+        items.setdefault(tag, data[value_start:value_end])
+    return items
+
+
+def get_color_code(items, tag):
+    """H.273 code of a colour UL item; None if absent, False if ffmpeg's mapping is unknown"""
+    ul = items.get(tag)
+    if ul is None:
+        return None
+    prefix, codes = COLOR_UL_TABLES[tag]
+    if len(ul) != 16 or ul[8:13] != prefix:
+        return False
+    return codes.get(ul[13], False)
+
+
+def get_full_range(items):
+    """
+    Range the demuxer derives from the reference levels (like mxf_get_color_range):
+    True, False, or None when not signalled or not recognised
+    """
+    def read_u32(tag):
+        value = items.get(tag)
+        return struct.unpack('>I', value)[0] if value is not None and len(value) == 4 else 0
+    black, white, color_range = (read_u32(tag) for tag in (BLACK_REF_LEVEL_TAG, WHITE_REF_LEVEL_TAG, COLOR_RANGE_TAG))
+    depth = read_u32(COMPONENT_DEPTH_TAG)
+    if not (black or white or color_range) or not 8 <= depth < 31:
+        return None
+    if black == 0 and white == (1 << depth) - 1 and color_range in ((1 << depth), (1 << depth) - 1):
+        return True
+    if black == 1 << (depth - 4) and white == 235 << (depth - 8) and color_range == (14 << (depth - 4)) + 1:
+        return False
+    return None
+
+
+def find_header_partition(data):
+    """(partition pack value start, value end) of the header partition in data, or None"""
+    pos = data.find(PARTITION_PACK_KEY[:4])
+    while 0 <= pos <= MAX_RUN_IN_SIZE:
+        key = data[pos:pos + KEY_SIZE]
+        if len(key) == KEY_SIZE and match_key(key, PARTITION_PACK_KEY):
+            if key[13] != HEADER_PARTITION or key[14] not in COMPLETE_PARTITION_STATUSES:
+                return None
+            length, value_start = read_ber_length(data, pos + KEY_SIZE)
+            return value_start, value_start + length
+        pos = data.find(PARTITION_PACK_KEY[:4], pos + 1)
+    return None
+
+
+def read_first_picture(f, pos):
+    """Start of the value of the first picture essence element at or after pos, or None"""
+    for _ in range(MAX_ESSENCE_KLV_COUNT):
+        f.seek(pos)
+        head = f.read(KEY_SIZE + 9)
+        if len(head) < KEY_SIZE + 1:
+            return None
+        length, value_start = read_ber_length(head, KEY_SIZE)
+        key = head[:KEY_SIZE]
+        if match_key(key, ESSENCE_ELEMENT_KEY) and key[12] in PICTURE_ITEM_TYPES:
+            f.seek(pos + value_start)
+            return f.read(min(length, MAX_ESSENCE_READ_SIZE))
+        pos += value_start + length
+    return None
+
+
+def read_stream_info(file_path):
+    """
+    Read the picture essence of an MXF file.
+    Returns a dict with the keys ffprobe returns for FFPROBE_STREAM_ENTRIES, or None
+    when the file can't be read or ffprobe's answer can't be predicted with confidence.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(MAX_RUN_IN_SIZE + KEY_SIZE + 9 + 256)
+        partition = find_header_partition(data)
+        if partition is None:
+            return None
+        value_start, value_end = partition
+        if value_end > len(data):
+            return None
+        header_byte_count, index_byte_count = struct.unpack_from('>QQ', data, value_start + 32)
+        if not header_byte_count or header_byte_count > MAX_HEADER_METADATA_SIZE:
+            return None
+        f.seek(value_end)
+        header = f.read(header_byte_count)
+        if len(header) < header_byte_count:
+            return None
+        items = parse_header_metadata(header)
+        if items is None:
+            return None
+        essence = read_first_picture(f, value_end + header_byte_count + index_byte_count)
+    if essence is None:
+        return None
+    return build_stream(items, essence)
+
+
+def parse_header_metadata(header):
+    """Items of the only picture descriptor of the header metadata, or None"""
+    primer = {}
+    descriptors = []
+    for key, start, end in iter_klv(header):
+        if match_key(key, PRIMER_PACK_KEY):
+            primer = read_primer(header, start, end)
+        elif match_key(key, LOCAL_SET_KEY) and key[13] == 0x01 and key[14] in PICTURE_DESCRIPTOR_TYPES:
+            descriptors.append((start, end))
+    # Several video tracks: which one is v:0 depends on the package structure
+    if len(descriptors) != 1:
+        return None
+    return read_descriptor(header, *descriptors[0], primer)
+
+
+def build_stream(items, essence):
+    """ffprobe stream dict from the descriptor items and the start of the first picture"""
+    coding = items.get(PICTURE_ESSENCE_CODING_TAG)
+    if coding is None or len(coding) != 16 or coding[8:13] != PICTURE_CODING_PREFIX:
+        return None
+    codec_name = PICTURE_CODINGS.get(coding[13])
+    if codec_name is None:
+        return None
+
+    # Field based layouts get their height doubled and per-field timing
+    frame_layout = items.get(FRAME_LAYOUT_TAG)
+    if frame_layout is None or frame_layout[0] != FULL_FRAME:
+        return None
+
+    # r_frame_rate is the edit rate, the stream time base being its inverse
+    sample_rate = items.get(SAMPLE_RATE_TAG)
+    if sample_rate is None or len(sample_rate) != 8:
+        return None
+    num, den = struct.unpack('>II', sample_rate)
+    if not num or not den:
+        return None
+
+    stream = {
+        'r_frame_rate': format_rational(*av_reduce(num, den, INT_MAX)),
+        'codec_name': codec_name,
+        'codec_tag_string': CODEC_TAG_STRING,
+    }
+    colors = [get_color_code(items, tag)
+              for tag in (COLOR_PRIMARIES_TAG, TRANSFER_CHARACTERISTIC_TAG, CODING_EQUATIONS_TAG)]
+    if False in colors or not set_color_fields(stream, *colors):
+        return None
+
+    if codec_name == 'h264':
+        for nal in iter_nal_units(essence):
+            if is_sps('h264', nal):
+                sps = parse_sps('h264', nal)
+                if sps['interlaced'] or not set_sps_fields(stream, 'h264', sps, get_full_range(items)):
+                    return None
+                return stream
+        return None
+
+    sequence = parse_sequence(essence)
+    if sequence is None or not sequence['progressive'] or not set_sequence_fields(stream, sequence):
+        return None
+    return stream
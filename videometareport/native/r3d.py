@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+RED R3D header reader
+
+An R3D file starts with a RED1 (early cameras) or RED2 header block giving the
+image size and frame rate at fixed offsets, followed by tagged metadata entries
+(camera settings such as ISO). ffmpeg only understands RED1, so for most files
+this is the only way to get a stream.
+"""
+import struct
+
+from .rational import INT_MAX, av_reduce, format_rational
+
+# Bytes of the header block read at most
+MAX_HEADER_SIZE = 64 * 1024
+
+# Header type -> (width offset, height offset, size format, frame rate offset)
+HEADER_LAYOUTS = {
+    b'RED1': (0x36, 0x3a, '>H', 0x3e),
+    b'RED2': (0x4c, 0x50, '>I', 0x56),
+}
+
+# Largest image size any RED camera records, anything above is a misread header
+MAX_IMAGE_SIZE = 16384
+
+# Metadata entry holding the ISO (size 6: the 16 bit size and tag, then an int16u)
+ISO_ENTRY = b'\x00\x06\x40\x3b'
+# Lowest ISO a RED camera offers; the int16u can't go past the highest
+MIN_ISO = 25
+
+
+def read_header(file_path):
+    """(header type, header block) of an R3D file, or None"""
+    with open(file_path, 'rb') as f:
+        data = f.read(8)
+        if len(data) < 8 or data[4:8] not in HEADER_LAYOUTS:
+            return None
+        size, = struct.unpack_from('>I', data)
+        if not 8 <= size <= MAX_HEADER_SIZE:
+            return None
+        return data[4:8], data + f.read(size - 8)
+
+
+def read_stream_info(file_path):
+    """
+    Read the image size and frame rate of an R3D file.
+    Returns a dict with the width, height and r_frame_rate keys of an ffprobe stream, or None.
+    """
+    header = read_header(file_path)
+    if header is None:
+        return None
+    header_type, data = header
+    width_offset, height_offset, size_format, frame_rate_offset = HEADER_LAYOUTS[header_type]
+    if len(data) < frame_rate_offset + 4:
+        return None
+    width, = struct.unpack_from(size_format, data, width_offset)
+    height, = struct.unpack_from(size_format, data, height_offset)
+    num, den = struct.unpack_from('>HH', data, frame_rate_offset)
+    if not 0 < width <= MAX_IMAGE_SIZE or not 0 < height <= MAX_IMAGE_SIZE or not num or not den:
+        return None
+    return {
+        'width': width,
+        'height': height,
+        'r_frame_rate': format_rational(*av_reduce(num, den, INT_MAX)),
+    }
+
+
+def read_iso_metadata(file_path):
+    """ISO tag from the metadata entries of the R3D header, as {'ISO': value}, or None"""
+    header = read_header(file_path)
+    if header is None:
+        return None
+    data = header[1]
+    pos = data.find(ISO_ENTRY)
+    if pos < 0 or pos + 6 > len(data):
+        return None
+    iso, = struct.unpack_from('>H', data, pos + 4)
+    if iso < MIN_ISO:
+        return None
+    return {'ISO': iso}
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Rational numbers the way libavutil reduces them
+"""
+from math import gcd
+
+INT_MAX = 2 ** 31 - 1
+
+
+def av_reduce(num, den, max_value):
+    """
+    Port of av_reduce: the closest fraction to num/den with numerator and denominator
+    no larger than max_value. Returns (num, den).
+    """
+    divisor = gcd(num, den)
+    if divisor:
+        num //= divisor
+        den //= divisor
+    if num <= max_value and den <= max_value:
+        return num, den
+
+    a0_num, a0_den = 0, 1
+    a1_num, a1_den = 1, 0
+    while den:
+        x = num // den
+        next_den = num - den * x
+        a2_num = x * a1_num + a0_num
+        a2_den = x * a1_den + a0_den
+        if a2_num > max_value or a2_den > max_value:
+            if a1_num:
+                x = (max_value - a0_num) // a1_num
+            if a1_den:
+                x = min(x, (max_value - a0_den) // a1_den)
+            if den * (2 * x * a1_den + a0_den) > num * a1_den:
+                a1_num, a1_den = x * a1_num + a0_num, x * a1_den + a0_den
+            break
+        a0_num, a0_den = a1_num, a1_den
+        a1_num, a1_den = a2_num, a2_den
+        num, den = den, next_den
+    return a1_num, a1_den
+
+
+def format_rational(num, den):
+    """'num/den' as ffprobe prints rationals"""
+    return f"{num}/{den}"
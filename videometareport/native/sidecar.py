@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+ISO tags from camera sidecar files: Sony/XDCAM clip XML (NonRealTimeMeta), Canon
+.THM thumbnails and .xmp files
+
+The files are small, so they are read whole (up to MAX_SIDECAR_SIZE) and searched
+with regular expressions rather than parsed.
+"""
+import os
+import re
+
+from .exif import read_jpeg_iso_tags, read_xmp_iso_tags
+
+MAX_SIDECAR_SIZE = 1024 * 1024
+
+# Clip XML item/element name -> tag name, as for exiftool's ISO tags (see tools.EXIFTOOL_ISO_TAGS)
+XML_ISO_NAMES = {
+    'ISO': 'ISO',
+    'ISOSensitivity': 'ISOSensitivity',
+    'ExposureIndexOfPhotoMeter': 'RecommendedExposureIndex',
+}
+_names = '|'.join(XML_ISO_NAMES)
+# Sony NonRealTimeMeta: <Item name="ISOSensitivity" value="800"/>
+XML_ITEM_RE = re.compile(rb'<Item\s+name="(%s)"\s+value="(\d+)"' % _names.encode('ascii'))
+# Plain elements: <ISOSensitivity>800</ISOSensitivity>
+XML_ELEMENT_RE = re.compile(rb'<(%s)>\s*(\d+)\s*</' % _names.encode('ascii'))
+
+
+def read_xml_iso_tags(data):
+    """ISO tags of a clip XML file: {tag name: value}"""
+    if b'<x:xmpmeta' in data:
+        return read_xmp_iso_tags(data)
+    tags = {}
+    for regex in (XML_ITEM_RE, XML_ELEMENT_RE):
+        for name, value in regex.findall(data):
+            tags.setdefault(XML_ISO_NAMES[name.decode('ascii')], int(value))
+    return tags
+
+
+# Sidecar extension -> parser
+SIDECAR_PARSERS = {
+    '.xml': read_xml_iso_tags,
+    '.thm': read_jpeg_iso_tags,
+    '.xmp': read_xmp_iso_tags,
+}
+
+
+def read_sidecar_iso_metadata(file_path):
+    """ISO tags of a sidecar file, named as exiftool names them, or None"""
+    parser = SIDECAR_PARSERS.get(os.path.splitext(str(file_path))[1].lower())
+    if parser is None:
+        return None
+    with open(file_path, 'rb') as f:
+        data = f.read(MAX_SIDECAR_SIZE)
+    return parser(data) or None
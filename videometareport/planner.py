@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Probe planner: decides per file, from what is already known about it, which
+follow-up probes are worth running
+
+A probe whose output the reports would throw away is skipped:
+- no ISO lookup for a file whose stream couldn't be probed (it is dropped from the results)
+- no ISO lookup for a Dolby Vision file when only the HTML report is written: its notes
+  column shows the Dolby Vision advice, the ISO value is not shown anywhere else
+"""
+import threading
+
+from .records import VideoResult
+
+
+# Report formats showing the ISO value itself (the HTML report only uses it in the notes column)
+ISO_VALUE_FORMATS = {'json', 'csv'}
+
+
+class ProbePlanner:
+    """
+    Per file probe decisions for one scan, counting the probes skipped.
+    report_formats: formats the results are written to; None (unknown) probes everything.
+    """
+
+    def __init__(self, report_formats=None):
+        self.iso_value_shown = report_formats is None or bool(ISO_VALUE_FORMATS & set(report_formats))
+        self.lock = threading.Lock()
+        self.skipped = {'iso': 0}
+
+    def needs_iso(self, stream, is_dolby_vision):
+        """Whether the ISO value of a file with this probed stream is used by the reports"""
+        if not stream:
+            return False
+        if is_dolby_vision and not self.iso_value_shown:
+            with self.lock:
+                self.skipped['iso'] += 1
+            return False
+        return True
+
+    def reuses_result(self, result):
+        """Whether a result of an earlier scan (or cached raw data) has everything this scan needs"""
+        iso_skipped = result.iso_skipped if isinstance(result, VideoResult) else result.get('isoSkipped')
+        return not iso_skipped or not self.iso_value_shown
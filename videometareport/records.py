@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Compact analysis results
+
+A VideoResult keeps what the classification was made from (size, frame rate, colour
+fields) and the categories as small ints; the display strings of the reports are only
+produced when a field is read. Directory names and colour field values are interned,
+so the files of a folder share one string.
+"""
+import functools
+import sys
+from collections.abc import Mapping
+from pathlib import Path
+
+
+# Resolution levels -> (resolutionStatus, resolutionColor, resolutionCategory, resolutionLabel)
+RESOLUTION_LOW, RESOLUTION_1080P, RESOLUTION_4K = range(3)
+RESOLUTION_FIELDS = (
+    ("低画质(<1080p)", "red", "Low", "low"),
+    ("1080p", "yellow", "1080p", "good"),
+    ("4K ✓", "green", "4K", "excellent"),
+)
+
+# Frame rate levels -> (framerate display (None: the value), framerateStatus (None: the display),
+# framerateColor, framerateCategory)
+FRAMERATE_UNKNOWN, FRAMERATE_LOW, FRAMERATE_NORMAL, FRAMERATE_HIGH, FRAMERATE_OTHER = range(5)
+FRAMERATE_FIELDS = (
+    ("未知", "未知", "gray", "Unknown"),
+    (None, "低帧率", "red", "Low"),
+    ("30 fps", "标准帧率", "yellow", "Normal"),
+    ("60 fps", "高帧率 ✓", "green", "High"),
+    (None, None, "white", "Other"),
+)
+
+# colorCategory values (the rest of the colour fields is made by describe_color)
+COLOR_CATEGORIES = ('SDR', 'HDR', 'WideGamut', 'Other', 'HighBitDepth', 'Advanced', 'RAW')
+COLOR_CATEGORY_CODES = {category: code for code, category in enumerate(COLOR_CATEGORIES)}
+
+# Classification thresholds: minimum landscape size of 1080p and 4K, frame rates in fps
+RESOLUTION_1080P_SIZE = (1920, 1080)
+RESOLUTION_4K_SIZE = (3840, 2160)
+FRAMERATE_LOW_BELOW = 28
+FRAMERATE_HIGH_RANGE = (55, 65)
+FRAMERATE_NORMAL_RANGE = (29, 31)
+
+# Flags
+DOLBY_VISION = 1
+RAW_VIDEO = 2
+ISO_SKIPPED = 4
+
+
+def classify_resolution(width, height):
+    """Resolution level of a video, portrait videos counting as their landscape size"""
+    effective_width = max(width, height)
+    effective_height = min(width, height)
+    if effective_width < RESOLUTION_1080P_SIZE[0] or effective_height < RESOLUTION_1080P_SIZE[1]:
+        return RESOLUTION_LOW
+    if effective_width >= RESOLUTION_4K_SIZE[0] and effective_height >= RESOLUTION_4K_SIZE[1]:
+        return RESOLUTION_4K
+    return RESOLUTION_1080P
+
+
+def parse_framerate(framerate_text):
+    """Frame rate in fps of an ffprobe rate ('30000/1001' or '25'), 0 if unknown"""
+    framerate = 0
+    if '/' in framerate_text:
+        try:
+            num, den = map(float, framerate_text.split('/'))
+            if den != 0:
+                framerate = num / den
+        except ValueError:
+            pass
+    else:
+        try:
+            framerate = float(framerate_text)
+        except ValueError:
+            pass
+    return framerate
+
+
+def classify_framerate(framerate):
+    """Frame rate level of a frame rate in fps"""
+    if framerate == 0:
+        return FRAMERATE_UNKNOWN
+    if framerate < FRAMERATE_LOW_BELOW:
+        return FRAMERATE_LOW
+    if FRAMERATE_HIGH_RANGE[0] <= framerate <= FRAMERATE_HIGH_RANGE[1]:
+        return FRAMERATE_HIGH
+    if FRAMERATE_NORMAL_RANGE[0] <= framerate <= FRAMERATE_NORMAL_RANGE[1]:
+        return FRAMERATE_NORMAL
+    return FRAMERATE_OTHER
+
+
+@functools.lru_cache(maxsize=1024)
+def describe_color(color_transfer, color_primaries, color_space, pix_fmt, is_raw_video, is_dolby_vision):
+    """
+    Colour classification of a stream: (colorSpace, colorInfo, colorSpaceColor, colorCategory).
+    Few combinations occur in a library, so the strings are built once for each.
+    """
+    color_info_array = []
+    color_display_array = []
+    color_space_color = "white"
+    color_category = "SDR"
+    is_hdr = False
+
+    # Check color transfer
+    if color_transfer:
+        if color_transfer == "smpte2084":
+            color_info_array.append("PQ (SMPTE 2084)")
+            color_display_array.append("HDR10")
+            is_hdr = True
+            color_space_color = "blue"
+            color_category = "HDR"
+        elif color_transfer == "arib-std-b67":
+            color_info_array.append("HLG (ARIB STD-B67)")
+            color_display_array.append("HDR HLG")
+            is_hdr = True
+            color_space_color = "blue"
+            color_category = "HDR"
+        elif color_transfer == "bt2020-10":
+            color_info_array.append("BT.2020-10bit")
+            color_display_array.append("HDR10")
+            is_hdr = True
+            color_space_color = "blue"
+            color_category = "HDR"
+        elif color_transfer == "bt2020":
+            color_info_array.append("BT.2020")
+            color_display_array.append("宽色域")
+            color_space_color = "red"
+            color_category = "WideGamut"
+        elif color_transfer == "bt709":
+            color_info_array.append("Rec.709")
+            color_category = "SDR"
+        elif color_transfer == "smpte170m":
+            color_info_array.append("BT.601")
+            color_category = "SDR"
+        elif color_transfer in ["gamma22", "gamma28"]:
+            color_info_array.append(f"Gamma {color_transfer[5:]}")
+            color_category = "SDR"
+        else:
+            color_info_array.append(color_transfer)
+            color_display_array.append("非SDR")
+            color_space_color = "red"
+            color_category = "Other"
+
+    # Check color primaries (gamut)
+    if color_primaries and not is_hdr:
+        if color_primaries == "bt2020" and color_category == "SDR":
+            color_info_array.append("BT.2020色域")
+            color_display_array.append("宽色域")
+            color_space_color = "red"
+            color_category = "WideGamut"
+        elif color_primaries == "p3":
+            color_info_array.append("DCI-P3色域")
+            color_display_array.append("广色域")
+            color_space_color = "red"
+            color_category = "WideGamut"
+        elif color_primaries not in ["bt709", "smpte170m"] and color_category == "SDR":
+            color_info_array.append(f"{color_primaries}色域")
+            color_display_array.append("非标准色域")
+            color_space_color = "red"
+            color_category = "Other"
+
+    # Check color space parameter
+    if color_space:
+        if color_space == "bt2020nc":
+            color_info_array.append("BT.2020非恒定亮度")
+            color_display_array.append("BT.2020 NC")
+        elif color_space == "bt2020c":
+            color_info_array.append("BT.2020恒定亮度")
+            color_display_array.append("BT.2020 CL")
+        elif color_space == "bt709":
+            color_info_array.append("BT.709色彩空间")
+            color_display_array.append("Rec.709")
+        else:
+            color_info_array.append(f"{color_space}色彩空间")
+            color_display_array.append(color_space)
+
+    # Check pixel format
+    if pix_fmt and not is_hdr and color_category == "SDR":
+        if 'p10' in pix_fmt or 'p12' in pix_fmt:
+            color_info_array.append(f"10/12-bit色深: {pix_fmt}")
+            color_display_array.append("高色深")
+            color_space_color = "red"
+            color_category = "HighBitDepth"
+        elif 'yuva' in pix_fmt:
+            color_info_array.append(f"带Alpha通道: {pix_fmt}")
+            color_display_array.append("带透明通道")
+            color_space_color = "red"
+            color_category = "Advanced"
+        elif 'yuv444' in pix_fmt:
+            color_info_array.append(f"4:4:4色度抽样: {pix_fmt}")
+            color_display_array.append("4:4:4格式")
+            color_space_color = "red"
+            color_category = "Advanced"
+        elif 'rgb' in pix_fmt or 'bgr' in pix_fmt:
+            color_info_array.append(f"RGB格式: {pix_fmt}")
+            color_display_array.append("RGB格式")
+            color_space_color = "red"
+            color_category = "Advanced"
+        else:
+            color_info_array.append(f"像素格式: {pix_fmt}")
+            color_display_array.append(pix_fmt)
+
+    # Default values if no color info detected
+    if not color_info_array:
+        color_info_array.append("SDR")
+        color_display_array.append("SDR")
+
+    color_info = ", ".join(color_info_array)
+    color_display = ", ".join(color_display_array) if color_display_array else "SDR"
+
+    # Add RAW video warning if detected
+    if is_raw_video:
+        color_display = 'RAW视频'
+        color_category = "RAW"
+
+    # Add Dolby Vision label if detected
+    if is_dolby_vision:
+        dolby_label = '杜比视界'
+        color_display = dolby_label + ' ' + color_display if color_display else dolby_label
+
+    if is_hdr:
+        color_space_color = "blue"
+
+    return color_display, color_info, color_space_color, color_category
+
+
+def intern_value(value):
+    """Shared copy of a string value (None and other types as is)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class VideoResult(Mapping):
+    """
+    Analysis result of one video file. Reads like the result dict of the reports:
+    result['colorSpace'], result.get('iso'), dict(result) for the full dict.
+    """
+
+    __slots__ = ('directory', 'file_name', 'width', 'height', 'framerate', 'iso',
+                 'color_transfer', 'color_primaries', 'color_space', 'pix_fmt',
+                 'flags', 'resolution_level', 'framerate_level', 'color_category')
+
+    def __init__(self, file_path, width, height, framerate, iso, color_transfer=None, color_primaries=None,
+                 color_space=None, pix_fmt=None, flags=0):
+        file_path_obj = Path(file_path)
+        self.directory = sys.intern(str(file_path_obj.parent))
+        self.file_name = file_path_obj.name
+        self.width = width
+        self.height = height
+        self.framerate = framerate
+        self.iso = iso or None
+        self.color_transfer = intern_value(color_transfer)
+        self.color_primaries = intern_value(color_primaries)
+        self.color_space = intern_value(color_space)
+        self.pix_fmt = intern_value(pix_fmt)
+        self.flags = flags
+        self.resolution_level = classify_resolution(width, height)
+        self.framerate_level = classify_framerate(framerate)
+        self.color_category = COLOR_CATEGORY_CODES[self.describe_color()[3]]
+
+    @property
+    def full_path(self):
+        return str(Path(self.directory, self.file_name))
+
+    @property
+    def is_dolby_vision(self):
+        return bool(self.flags & DOLBY_VISION)
+
+    @property
+    def is_raw_video(self):
+        return bool(self.flags & RAW_VIDEO)
+
+    @property
+    def iso_skipped(self):
+        return bool(self.flags & ISO_SKIPPED)
+
+    def describe_color(self):
+        """(colorSpace, colorInfo, colorSpaceColor, colorCategory), see describe_color"""
+        return describe_color(self.color_transfer, self.color_primaries, self.color_space, self.pix_fmt,
+                              self.is_raw_video, self.is_dolby_vision)
+
+    def framerate_display(self):
+        display = FRAMERATE_FIELDS[self.framerate_level][0]
+        return display if display is not None else f"{self.framerate:.1f} fps"
+
+    def framerate_status(self):
+        status = FRAMERATE_FIELDS[self.framerate_level][1]
+        return status if status is not None else self.framerate_display()
+
+    def relocated(self, file_path):
+        """Copy of the result with its path fields pointing to file_path"""
+        result = VideoResult.__new__(VideoResult)
+        for name in self.__slots__:
+            setattr(result, name, getattr(self, name))
+        file_path_obj = Path(file_path)
+        result.directory = sys.intern(str(file_path_obj.parent))
+        result.file_name = file_path_obj.name
+        return result
+
+    def to_state(self):
+        """What the result is made from, as a JSON-serializable list (see from_state)"""
+        return [self.full_path, self.width, self.height, self.framerate, self.iso, self.color_transfer,
+                self.color_primaries, self.color_space, self.pix_fmt, self.flags]
+
+    @classmethod
+    def from_state(cls, state):
+        """Result rebuilt from to_state()"""
+        return cls(*state)
+
+    # Mapping interface: the keys of the reports, the display strings made on access
+
+    def __getitem__(self, key):
+        getter = FIELD_GETTERS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self)
+
+    def __iter__(self):
+        return iter(RESULT_KEYS)
+
+    def __len__(self):
+        return len(RESULT_KEYS)
+
+    def __repr__(self):
+        return f'VideoResult({self.full_path!r})'
+
+
+# Result key -> getter, in the order of the former result dicts
+FIELD_GETTERS = {
+    'directory': lambda r: r.directory,
+    'fileName': lambda r: r.file_name,
+    'fullPath': lambda r: r.full_path,
+    'iso': lambda r: r.iso if r.iso else "-",
+    'resolution': lambda r: f"{r.width}x{r.height}",
+    'resolutionStatus': lambda r: RESOLUTION_FIELDS[r.resolution_level][0],
+    'resolutionColor': lambda r: RESOLUTION_FIELDS[r.resolution_level][1],
+    'resolutionCategory': lambda r: RESOLUTION_FIELDS[r.resolution_level][2],
+    'framerate': VideoResult.framerate_display,
+    'framerateStatus': VideoResult.framerate_status,
+    'framerateColor': lambda r: FRAMERATE_FIELDS[r.framerate_level][2],
+    'framerateCategory': lambda r: FRAMERATE_FIELDS[r.framerate_level][3],
+    'colorSpace': lambda r: r.describe_color()[0],
+    'colorInfo': lambda r: r.describe_color()[1],
+    'colorSpaceColor': lambda r: r.describe_color()[2],
+    'colorCategory': lambda r: COLOR_CATEGORIES[r.color_category],
+    'resolutionLabel': lambda r: RESOLUTION_FIELDS[r.resolution_level][3],
+    'isDolbyVision': lambda r: r.is_dolby_vision,
+    'isRawVideo': lambda r: r.is_raw_video,
+}
+RESULT_KEYS = tuple(FIELD_GETTERS)
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+HTML report generation
+"""
+import csv
+import functools
+import io
+import json
+import os
+import re
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from .columns import compute_percentages
+
+
+def get_report_template_path():
+    """Locate the HTML report template"""
+    if getattr(sys, 'frozen', False):
+        # Frozen (PyInstaller)
+        if hasattr(sys, '_MEIPASS'):
+            # One-file mode
+            base_path = Path(sys._MEIPASS)
+        elif sys.platform == 'darwin':
+            # macOS .app bundle (onedir)
+            # Resources are commonly in ../Resources relative to executable in Contents/MacOS
+            # Check ../Resources/templates first
+            exe_path = Path(sys.executable)
+            resource_path = exe_path.parent.parent / 'Resources'
+            if (resource_path / 'templates').exists():
+                base_path = resource_path
+            else:
+                # Fallback to executable dir
+                base_path = exe_path.parent
+        else:
+            # Windows/Linux onedir mode
+            base_path = Path(sys.executable).parent
+            
+        return base_path / 'templates' / 'report_template.html'
+    
+    # Dev mode
+    return Path(__file__).parent.parent / 'templates' / 'report_template.html'
+
+
+class ReportTemplate:
+    """
+    The report template compiled into literal segments and {{name}} slots,
+    so a report is rendered in a single pass over the template.
+    """
+    
+    SLOT_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+    
+    def __init__(self, text):
+        # re.split with a group alternates literal, slot name, literal, ...
+        parts = self.SLOT_PATTERN.split(text)
+        self.literals = parts[0::2]
+        self.slots = parts[1::2]
+    
+    def render(self, output, values):
+        """
+        Write the template to output. values maps slot names to strings, or to
+        callables that write the slot content to output themselves.
+        Slots without a value are written unchanged.
+        """
+        for literal, slot in zip(self.literals, self.slots):
+            output.write(literal)
+            value = values.get(slot)
+            if value is None:
+                output.write(f'{{{{{slot}}}}}')
+            elif callable(value):
+                value(output)
+            else:
+                output.write(value)
+        output.write(self.literals[-1])
+
+
+@functools.lru_cache(maxsize=None)
+def load_report_template(template_path=None):
+    """Read and compile the report template once"""
+    if template_path is None:
+        template_path = get_report_template_path()
+    with open(template_path, 'r', encoding='utf-8') as f:
+        return ReportTemplate(f.read())
+
+EMPTY_TABLE_ROW = '''
+            <tr>
+                <td colspan="5" style="text-align: center; padding: 50px; color: #888;">
+                    <h3>🎉 恭喜！</h3>
+                    <p>没有发现需要警告的视频文件。</p>
+                </td>
+            </tr>
+'''
+
+
+def render_table_row(result):
+    """Render the report table row of one result"""
+    # Determine row class
+    row_class = ""
+    if result['resolutionColor'] == 'red' or result['framerateColor'] == 'red' or result['colorSpaceColor'] == 'red':
+        row_class = "red"
+    elif result['resolutionColor'] == 'yellow' or result['framerateColor'] == 'yellow':
+        row_class = "yellow"
+    elif result['resolutionColor'] == 'green' or result['framerateColor'] == 'green':
+        row_class = "green"
+    if result['colorSpaceColor'] == 'blue':
+        row_class = "blue"
+    
+    # Escape special characters for JavaScript
+    escaped_dir = result['directory'].replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('\n', '\\n')
+    escaped_full = result['fullPath'].replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('\n', '\\n')
+    
+    # Escape HTML characters for display
+    display_dir = result['directory'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    display_file = result['fileName'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    display_res_status = result['resolutionStatus'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    display_fps_status = result['framerateStatus'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    
+    # colorSpace may contain HTML (for Dolby Vision warning), so don't escape it
+    display_color_space = result['colorSpace']
+    
+    # Build notes column based on conditions
+    notes_content = ""
+    iso_str = result.get('iso', '-')
+    is_raw = result.get('isRawVideo', False)
+    is_dolby = result.get('isDolbyVision', False)
+    
+    if is_dolby:
+        notes_content = "杜比视界需要提前调色再导入"
+    elif iso_str != '-':
+        try:
+            iso_num = int(iso_str)
+            if is_raw and iso_num > 800:
+                notes_content = f"ISO为{iso_num}，考虑提前降噪"
+            elif not is_raw and iso_num > 4000:
+                notes_content = f"ISO为{iso_num}，考虑提前降噪"
+            else:
+                notes_content = "-"
+        except ValueError:
+            notes_content = iso_str
+    else:
+        notes_content = "-"
+    
+    return f'''
+            <tr class="data-row {row_class}">
+                <td>
+                    <button class="copy-btn" onclick="copyToClipboard('{escaped_dir}')" title="点击复制目录路径">{display_dir}</button>
+                </td>
+                <td>
+                    <button class="copy-btn" onclick="copyToClipboard('{escaped_full}')" title="点击复制完整文件路径">{display_file}</button>
+                </td>
+                <td class="{result['resolutionColor']}">{display_res_status}</td>
+                <td class="{result['framerateColor']}">{display_fps_status}</td>
+                <td class="{result['colorSpaceColor']}">{display_color_space}</td>
+                <td class="white">{notes_content}</td>
+            </tr>
+'''
+
+
+def get_report_replacements(statistics, input_path):
+    """Values of the template slots, except the table rows"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    total = statistics['totalFiles']
+    percentages = compute_percentages(statistics)
+    
+    return {
+        'timestamp': timestamp,
+        'input_path': str(input_path).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'),
+        'total_files': str(total),
+        'low_resolution_count': str(statistics['lowResolutionCount']),
+        'low_resolution_percent': str(percentages['lowResolutionCount']),
+        'good_resolution_count': str(statistics['goodResolutionCount']),
+        'good_resolution_percent': str(percentages['goodResolutionCount']),
+        'excellent_resolution_count': str(statistics['excellentResolutionCount']),
+        'excellent_resolution_percent': str(percentages['excellentResolutionCount']),
+        'low_framerate_count': str(statistics['lowFramerateCount']),
+        'low_framerate_percent': str(percentages['lowFramerateCount']),
+        'normal_framerate_count': str(statistics['normalFramerateCount']),
+        'normal_framerate_percent': str(percentages['normalFramerateCount']),
+        'high_framerate_count': str(statistics['highFramerateCount']),
+        'high_framerate_percent': str(percentages['highFramerateCount']),
+        'hdr_count': str(statistics['hdrCount']),
+        'hdr_percent': str(percentages['hdrCount']),
+        'other_color_space_count': str(statistics['otherColorSpaceCount']),
+        'other_color_space_percent': str(percentages['otherColorSpaceCount']),
+        'sdr_count': str(statistics['sdrCount']),
+        'sdr_percent': str(percentages['sdrCount']),
+    }
+
+
+def write_html_report(results, statistics, input_path, output):
+    """
+    Stream the HTML report to the text file object output, writing each
+    table row as it is rendered.
+    """
+    try:
+        template = load_report_template()
+    except FileNotFoundError:
+        output.write(f"<html><body><h1>错误</h1><p>找不到模板文件: {get_report_template_path()}</p></body></html>")
+        return
+    
+    def write_table_rows(output):
+        if not results:
+            output.write(EMPTY_TABLE_ROW)
+            return
+        for result in results:
+            output.write(render_table_row(result))
+    
+    values = get_report_replacements(statistics, input_path)
+    values['table_rows'] = write_table_rows
+    template.render(output, values)
+
+
+# Result fields, in column order for the CSV report
+RESULT_FIELDS = [
+    'directory', 'fileName', 'fullPath', 'iso',
+    'resolution', 'resolutionStatus', 'resolutionColor', 'resolutionCategory',
+    'framerate', 'framerateStatus', 'framerateColor', 'framerateCategory',
+    'colorSpace', 'colorInfo', 'colorSpaceColor', 'colorCategory',
+    'resolutionLabel', 'isDolbyVision', 'isRawVideo'
+]
+
+
+def write_json_report(results, statistics, input_path, output):
+    """Stream the results and statistics as a JSON document, one result at a time"""
+    output.write('{\n')
+    output.write(f'  "inputPath": {json.dumps(str(input_path), ensure_ascii=False)},\n')
+    output.write(f'  "generatedAt": "{datetime.now().isoformat(timespec="seconds")}",\n')
+    output.write(f'  "statistics": {json.dumps(statistics)},\n')
+    output.write('  "results": [')
+    for idx, result in enumerate(results):
+        output.write(',\n    ' if idx else '\n    ')
+        output.write(json.dumps(dict(result), ensure_ascii=False))
+    output.write('\n  ]\n}\n')
+
+
+def write_csv_report(results, statistics, input_path, output):
+    """Write one CSV row per result"""
+    writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for result in results:
+        writer.writerow(result)
+
+
+REPORT_WRITERS = {
+    'html': write_html_report,
+    'json': write_json_report,
+    'csv': write_csv_report,
+}
+
+
+def save_report(results, statistics, input_path, report_path, report_format='html'):
+    """
+    Write a report in the given format (html, json or csv) to report_path.
+    It is streamed to a temporary file next to report_path, which replaces report_path
+    once complete: an error while writing leaves any previous report untouched.
+    """
+    writer = REPORT_WRITERS[report_format]
+    # The csv module does its own line endings; utf-8-sig so Excel detects the encoding
+    newline = '' if report_format == 'csv' else None
+    encoding = 'utf-8-sig' if report_format == 'csv' else 'utf-8'
+    report_path = Path(report_path)
+    temp_path = report_path.with_name(f'.{report_path.name}.{uuid.uuid4().hex[:8]}.tmp')
+    try:
+        with open(temp_path, 'x', encoding=encoding, newline=newline) as f:
+            writer(results, statistics, input_path, f)
+        os.replace(temp_path, report_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_html_report(results, statistics, input_path, report_path):
+    """Write the HTML report to report_path (see save_report)"""
+    save_report(results, statistics, input_path, report_path, 'html')
+
+
+def generate_html_report(results, statistics, input_path):
+    """Generate HTML report using external template file"""
+    output = io.StringIO()
+    write_html_report(results, statistics, input_path, output)
+    return output.getvalue()
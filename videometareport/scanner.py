@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Finding video files
+"""
+import os
+import re
+from pathlib import Path
+
+
+# Supported video extensions
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', 
+                    '.mpg', '.mpeg', '.ts', '.mts', '.m2ts', '.hevc', '.h264', '.264', 
+                    '.265', '.rmvb', '.rm', '.3gp', '.f4v', '.m2v', '.mp2', '.mpe', 
+                    '.mpv', '.ogv', '.qt', '.vob',
+                    '.crm', '.mxf', '.nev', '.r3d']  # Added RAW formats
+
+VIDEO_EXTENSION_SET = frozenset(VIDEO_EXTENSIONS)
+
+# RAW video extensions that should always show RAW warning
+RAW_EXTENSIONS = ['.crm', '.nev', '.r3d']
+
+# Per-clip metadata files cameras write next to the videos: Sony/XDCAM/Canon clip XML,
+# Canon .THM thumbnails, .xmp files
+SIDECAR_EXTENSIONS = frozenset(['.xml', '.thm', '.xmp'])
+
+# Sony/XDCAM clip XML carries a suffix: C0001.MP4 -> C0001M01.XML
+SIDECAR_XML_SUFFIX = re.compile(r'm\d\d$')
+
+
+def get_sidecar_keys(name):
+    """Lower-case names (stem or full name) of the videos a sidecar file may belong to"""
+    stem, ext = os.path.splitext(name.lower())
+    keys = [stem]
+    if ext == '.xml' and SIDECAR_XML_SUFFIX.search(stem):
+        keys.append(stem[:-3])
+    return keys
+
+
+def match_sidecars(videos, sidecar_paths, sidecars):
+    """Add the sidecar files of the videos of one directory to sidecars: {str(video path): [sidecar paths]}"""
+    by_key = {}
+    for sidecar_path in sorted(sidecar_paths):
+        for key in get_sidecar_keys(os.path.basename(sidecar_path)):
+            by_key.setdefault(key, []).append(sidecar_path)
+    for video_path in videos:
+        name = os.path.basename(video_path).lower()
+        # C0001.MP4.xmp first, then C0001.xmp, C0001M01.XML, ...
+        matches = by_key.get(name, []) + by_key.get(os.path.splitext(name)[0], [])
+        if matches:
+            sidecars[video_path] = list(dict.fromkeys(matches))
+
+
+def scan_video_files(path, sidecars=None):
+    """
+    Walk path once with os.scandir and collect video files.
+    Returns a sorted list of (Path, os.stat_result) tuples; extensions are matched
+    case-insensitively, so names like .Mp4 are found as well.
+    sidecars: optional dict, filled with {str(video path): [sidecar paths]} for the
+    videos that have camera sidecar files in the same directory.
+    """
+    entries = []
+    if not os.path.isdir(path):
+        return entries
+    
+    pending_dirs = [os.fspath(path)]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        videos = []
+        sidecar_paths = []
+        try:
+            with os.scandir(current_dir) as it:
+                for entry in it:
+                    try:
+                        # Like rglob, don't descend into symlinked directories
+                        if entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(entry.path)
+                            continue
+                        ext = os.path.splitext(entry.name)[1].lower()
+                        if ext not in VIDEO_EXTENSION_SET:
+                            if sidecars is not None and ext in SIDECAR_EXTENSIONS:
+                                sidecar_paths.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                        # DirEntry caches the stat result (free on Windows, one call elsewhere)
+                        entries.append((Path(entry.path), entry.stat()))
+                        videos.append(str(entries[-1][0]))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Warning: Failed to scan {current_dir}: {e}")
+        if sidecar_paths and videos:
+            match_sidecars(videos, sidecar_paths, sidecars)
+    
+    entries.sort(key=lambda item: item[0])
+    return entries
+
+
+def get_video_files(path):
+    """Get all video files recursively from path"""
+    return [file_path for file_path, _ in scan_video_files(path)]
+
+
+def diff_scan(previous_files, entries):
+    """
+    Compare the files of a previous scan with the current entries (from scan_video_files).
+    Returns a dict with 'added', 'removed' and 'modified' path strings and 'renamed' (old, new) pairs.
+    A file counts as renamed when a removed and an added file share the same file id, size and mtime.
+    """
+    current = {str(file_path): stat for file_path, stat in entries}
+    added = [path for path in current if path not in previous_files]
+    removed = [path for path in previous_files if path not in current]
+    modified = [
+        path for path, stat in current.items()
+        if path in previous_files and (previous_files[path]['size'] != stat.st_size or
+                                       previous_files[path]['mtime_ns'] != stat.st_mtime_ns)
+    ]
+    
+    # Match removed and added files. st_ino is 0 where the platform doesn't report
+    # it cheaply (Windows scandir), then size + mtime must be unique on both sides.
+    def identity(dev, ino, size, mtime_ns):
+        return (dev, ino, size, mtime_ns) if ino else (size, mtime_ns)
+    
+    removed_by_identity = {}
+    for path in removed:
+        info = previous_files[path]
+        removed_by_identity.setdefault(identity(info['dev'], info['ino'], info['size'], info['mtime_ns']), []).append(path)
+    added_by_identity = {}
+    for path in added:
+        stat = current[path]
+        added_by_identity.setdefault(identity(stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns), []).append(path)
+    
+    renamed = []
+    for key, old_paths in removed_by_identity.items():
+        new_paths = added_by_identity.get(key, [])
+        if len(old_paths) == 1 and len(new_paths) == 1:
+            renamed.append((old_paths[0], new_paths[0]))
+    
+    renamed_old = {old for old, _ in renamed}
+    renamed_new = {new for _, new in renamed}
+    return {
+        'added': [path for path in added if path not in renamed_new],
+        'removed': [path for path in removed if path not in renamed_old],
+        'modified': modified,
+        'renamed': renamed,
+    }
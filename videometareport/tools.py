@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+External tools (ffprobe/exiftool): locating them and reading ISO values with exiftool
+"""
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+
+# Define subprocess flags for Windows to suppress console window
+if sys.platform == 'win32':
+    SUBPROCESS_FLAGS = subprocess.CREATE_NO_WINDOW
+else:
+    SUBPROCESS_FLAGS = 0
+
+
+def get_external_tool_path(tool_name):
+    """
+    Get the absolute path for an external tool (ffprobe/exiftool)
+    based on the OS and whether we are running in a frozen bundle.
+    """
+    system = sys.platform
+    
+    # Determine the executable name
+    if system == 'win32':
+        filename = f"{tool_name}.exe"
+    else:
+        filename = tool_name
+
+    # 1. Determine base path
+    if getattr(sys, 'frozen', False):
+        # FROZEN (PyInstaller)
+        if system == 'darwin':
+             # macOS .app bundle
+             # sys.executable is inside /Contents/MacOS/
+             # Resources are usually in /Contents/Resources/
+             # However, simple one-file or one-dir builds might behave differently.
+             # We check standard bundle structure first:
+             bundle_dir = os.path.dirname(os.path.abspath(sys.executable))
+             
+             # Case A: Standard .app bundle (Contents/MacOS/ -> Contents/Resources/)
+             # Path to Resources from executable
+             resources_path = os.path.join(bundle_dir, '..', 'Resources')
+             possible_path = os.path.join(resources_path, filename)
+             if os.path.exists(possible_path):
+                 return os.path.abspath(possible_path)
+             
+             # Case B: Sys._MEIPASS (One-file temporary directory)
+             if hasattr(sys, '_MEIPASS'):
+                 possible_path = os.path.join(sys._MEIPASS, filename)
+                 if os.path.exists(possible_path):
+                     return os.path.abspath(possible_path)
+                     
+        elif system == 'win32':
+            # Windows Frozen
+            # Tools should be next to the executable OR in _internal (PyInstaller 6+)
+            base_dir = os.path.dirname(os.path.abspath(sys.executable))
+            
+            # Check next to executable (legacy / one-dir custom)
+            possible_path = os.path.join(base_dir, filename)
+            if os.path.exists(possible_path):
+                return os.path.abspath(possible_path)
+            
+            # Check in _internal (PyInstaller 6+ default)
+            possible_path_internal = os.path.join(base_dir, '_internal', filename)
+            if os.path.exists(possible_path_internal):
+                return os.path.abspath(possible_path_internal)
+                
+    else:
+        # DEV MODE (Running from source)
+        project_root = Path(__file__).parent.parent.absolute()
+        if system == 'win32':
+            # external/windows_x86/
+            tool_path = project_root / 'external' / 'windows_x86' / filename
+        elif system == 'darwin':
+            # external/macos/
+            tool_path = project_root / 'external' / 'macos' / filename
+        else:
+            # Linux or other? Assume system path.
+            return tool_name
+            
+        if tool_path.exists():
+            return str(tool_path)
+
+    # Fallback to system PATH
+    return tool_name
+
+
+def check_ffprobe():
+    """Check if ffprobe is available"""
+    tool_path = get_external_tool_path('ffprobe')
+    try:
+        # Increased timeout to 30s as 5s was causing issues on some Windows systems
+        # likely due to antivirus scanning or slow disk I/O on first run
+        subprocess.run([tool_path, '-version'], 
+                      capture_output=True, check=True, timeout=30, creationflags=SUBPROCESS_FLAGS)
+        return True, None
+    except Exception as e:
+        return False, f"Path: {tool_path}\nError: {str(e)}"
+
+
+def check_exiftool():
+    """Check if exiftool is available"""
+    tool_path = get_external_tool_path('exiftool')
+    try:
+        subprocess.run([tool_path, '-ver'], 
+                      capture_output=True, check=True, timeout=30, creationflags=SUBPROCESS_FLAGS)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
+        return False
+
+
+# ISO related tags, in order of preference
+EXIFTOOL_ISO_TAGS = ['ISO', 'ISOSensitivity', 'RecommendedExposureIndex']
+
+# How ISO values are read with exiftool:
+#   'session' - one persistent exiftool process per worker (-stay_open)
+#   'batch'   - one exiftool process per chunk of EXIFTOOL_BATCH_SIZE files
+# Frozen Windows builds use batch mode, where the bundled exiftool.exe is not
+# reliable as a long-running process.
+if sys.platform == 'win32' and getattr(sys, 'frozen', False):
+    DEFAULT_EXIFTOOL_MODE = 'batch'
+else:
+    DEFAULT_EXIFTOOL_MODE = 'session'
+EXIFTOOL_BATCH_SIZE = 200
+
+
+class ExifToolSession:
+    """
+    A long-lived exiftool process driven through '-stay_open True -@ -'.
+    Arguments are streamed over stdin and each response ends with a {readyN} marker.
+    Not thread-safe: use one session per worker thread (see get_exiftool_session).
+    """
+    
+    def __init__(self, tool_path=None, timeout=30):
+        self.tool_path = tool_path or get_external_tool_path('exiftool')
+        self.timeout = timeout
+        self.process = None
+        self.request_id = 0
+    
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+    
+    def start(self):
+        """Start the exiftool process"""
+        self.close()
+        self.process = subprocess.Popen(
+            [self.tool_path, '-stay_open', 'True', '-@', '-',
+             '-common_args', '-charset', 'filename=utf8'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding='utf-8', errors='replace',
+            creationflags=SUBPROCESS_FLAGS
+        )
+    
+    def execute(self, *args):
+        """
+        Run one exiftool command and return its stdout, restarting exiftool if it died.
+        Returns None when exiftool didn't answer within the timeout (it is restarted, the
+        command is not retried: a file that hangs exiftool would hang it again).
+        """
+        if any('\n' in arg or '\r' in arg for arg in args):
+            # The argument file format is one argument per line
+            raise ValueError("exiftool arguments must not contain line breaks")
+        
+        try:
+            return self._execute(args)
+        except subprocess.TimeoutExpired:
+            self.start()
+            return None
+        except (OSError, EOFError):
+            # The process died (crashed, killed from outside, ...): retry once with a fresh one
+            self.start()
+            return self._execute(args)
+    
+    def _execute(self, args):
+        if not self.is_alive():
+            self.start()
+        
+        self.request_id += 1
+        ready_marker = f'{{ready{self.request_id}}}'
+        self.process.stdin.write('\n'.join(args) + f'\n-execute{self.request_id}\n')
+        self.process.stdin.flush()
+        
+        # Kill the process if it doesn't answer in time; readline() then hits EOF
+        process = self.process
+        timed_out = threading.Event()
+        def kill():
+            timed_out.set()
+            process.kill()
+        watchdog = threading.Timer(self.timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            lines = []
+            while True:
+                line = process.stdout.readline()
+                if not line:
+                    if timed_out.is_set():
+                        raise subprocess.TimeoutExpired(self.tool_path, self.timeout)
+                    raise EOFError("exiftool exited unexpectedly")
+                if line.rstrip() == ready_marker:
+                    return ''.join(lines)
+                lines.append(line)
+        finally:
+            watchdog.cancel()
+    
+    def close(self):
+        """Ask exiftool to exit, killing it if it doesn't"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write('-stay_open\nFalse\n')
+                process.stdin.flush()
+                process.wait(timeout=5)
+        except Exception:
+            process.kill()
+            process.wait()
+        finally:
+            for pipe in (process.stdin, process.stdout):
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+
+
+_exiftool_local = threading.local()
+_exiftool_sessions = []
+_exiftool_sessions_lock = threading.Lock()
+_exiftool_session_failed = False
+
+
+def get_exiftool_session():
+    """Get the exiftool session of the calling thread, or None if exiftool can't be started"""
+    global _exiftool_session_failed
+    session = getattr(_exiftool_local, 'session', None)
+    if session is not None or _exiftool_session_failed:
+        return session
+    
+    session = ExifToolSession()
+    try:
+        session.start()
+    except OSError as e:
+        print(f"Warning: Failed to start exiftool session: {e}")
+        _exiftool_session_failed = True
+        return None
+    
+    _exiftool_local.session = session
+    with _exiftool_sessions_lock:
+        _exiftool_sessions.append((threading.current_thread(), session))
+    return session
+
+
+def close_exiftool_sessions(threads=None):
+    """
+    Shut down the exiftool sessions started by threads, or all of them when threads is None.
+    Sessions of other threads (e.g. another scan still running) are left alone.
+    """
+    global _exiftool_local, _exiftool_session_failed
+    with _exiftool_sessions_lock:
+        if threads is None:
+            sessions = [session for _, session in _exiftool_sessions]
+            _exiftool_sessions.clear()
+            # Threads that outlive this call start a fresh session on their next request
+            _exiftool_local = threading.local()
+            _exiftool_session_failed = False
+        else:
+            threads = set(threads)
+            sessions = [session for thread, session in _exiftool_sessions if thread in threads]
+            _exiftool_sessions[:] = [(thread, session) for thread, session in _exiftool_sessions
+                                     if thread not in threads]
+    
+    # A thread still using a closed session restarts its process on the next request
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_exiftool_sessions)
+
+
+def parse_exiftool_iso(output):
+    """Extract the ISO value from exiftool -json output"""
+    if not output.strip():
+        return None
+    
+    data = json.loads(output)
+    if not data:
+        return None
+    
+    return get_iso_from_metadata(data[0])
+
+
+def get_iso_from_metadata(metadata):
+    """Pick the ISO value from one exiftool -json metadata object"""
+    # Try different ISO keys in order of preference
+    for key in EXIFTOOL_ISO_TAGS:
+        if key in metadata and metadata[key]:
+            iso_value = metadata[key]
+            # Handle if it's a number or string
+            if isinstance(iso_value, (int, float)):
+                return str(int(iso_value))
+            return str(iso_value)
+    
+    return None
+
+
+def get_iso_from_exiftool(file_path):
+    """Get ISO value from video file using exiftool"""
+    try:
+        session = get_exiftool_session()
+        if session is not None:
+            try:
+                output = session.execute('-json', *[f'-{tag}' for tag in EXIFTOOL_ISO_TAGS], str(file_path))
+                if output is None:
+                    print(f"Warning: exiftool timed out on {file_path}")
+                    return None
+                return parse_exiftool_iso(output)
+            except ValueError:
+                # File name can't be passed through the argument file, use a one-off process
+                pass
+        
+        tool_path = get_external_tool_path('exiftool')
+        cmd = [tool_path, '-json'] + [f'-{tag}' for tag in EXIFTOOL_ISO_TAGS] + [str(file_path)]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30, creationflags=SUBPROCESS_FLAGS)
+        
+        if result.returncode != 0:
+            return None
+        
+        return parse_exiftool_iso(result.stdout)
+    except Exception as e:
+        print(f"Warning: Failed to get ISO from {file_path}: {e}")
+        return None
+
+
+def _source_file_key(file_path):
+    """Normalize a path so it matches the SourceFile reported by exiftool"""
+    return os.path.normcase(os.path.normpath(str(file_path)))
+
+
+def build_exiftool_batch_command():
+    """exiftool command reading the ISO tags of the files listed on stdin"""
+    # Paths are passed on stdin (-@ -) to stay clear of command line length limits
+    return [get_external_tool_path('exiftool'), '-json', '-charset', 'filename=utf8'] + \
+           [f'-{tag}' for tag in EXIFTOOL_ISO_TAGS] + ['-@', '-']
+
+
+def parse_exiftool_batch_output(file_paths, output):
+    """Map the -json output of a batch call back to file_paths through SourceFile"""
+    iso_values = {}
+    data = json.loads(output) if output.strip() else []
+    by_source = {_source_file_key(metadata.get('SourceFile', '')): metadata for metadata in data}
+    for file_path in file_paths:
+        metadata = by_source.get(_source_file_key(file_path))
+        if metadata:
+            iso_values[file_path] = get_iso_from_metadata(metadata)
+    return iso_values
+
+
+def is_batchable_path(file_path):
+    """Names with line breaks can't go through the argument file"""
+    return '\n' not in file_path and '\r' not in file_path
+
+
+def get_iso_batch_from_exiftool(file_paths, batch_size=EXIFTOOL_BATCH_SIZE):
+    """
+    Get ISO values for many files, running one exiftool -json call per chunk of batch_size files.
+    Returns a dict mapping str(file_path) to the ISO value (or None).
+    """
+    if not file_paths:
+        return {}
+    
+    iso_values = {}
+    
+    for start in range(0, len(file_paths), batch_size):
+        chunk = [str(file_path) for file_path in file_paths[start:start + batch_size]]
+        # Names that can't be batched are looked up one by one
+        batchable = [file_path for file_path in chunk if is_batchable_path(file_path)]
+        for file_path in chunk:
+            iso_values[file_path] = None
+        
+        if batchable:
+            try:
+                result = subprocess.run(build_exiftool_batch_command(), input='\n'.join(batchable) + '\n',
+                                        capture_output=True, text=True, encoding='utf-8', errors='replace',
+                                        timeout=30 + len(batchable), creationflags=SUBPROCESS_FLAGS)
+                
+                # exiftool exits with 1 if any file failed, the others are still in the output
+                iso_values.update(parse_exiftool_batch_output(batchable, result.stdout))
+            except Exception as e:
+                print(f"Warning: Failed to get ISO for {len(batchable)} files: {e}")
+        
+        for file_path in chunk:
+            if not is_batchable_path(file_path):
+                iso_values[file_path] = get_iso_from_exiftool(file_path)
+    
+    return iso_values